@@ -0,0 +1,181 @@
+"""
+Activity Service - Kullanıcı başına günlük aktivite özeti (user_daily_activity)
+İlan oluşturma, başvuru ve görüntülenme flush'larında ilgili (kullanıcı, gün) satırı
+atomik upsert ile artırılır. İstatistik sayfası ve dashboard grafikleri günlük/aylık
+seriyi tek bir (user_id, day) range sorgusu ile okur.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select, inspect as sa_inspect
+from models import db, TevkilPost, Application, UserDailyActivity
+from upsert import upsert
+
+ACTIVITY_FIELDS = ('posts', 'applications_sent', 'applications_received', 'views')
+
+_table = UserDailyActivity.__table__
+_posts = TevkilPost.__table__
+_applications = Application.__table__
+
+
+def _day_of(value):
+    return (value or datetime.utcnow()).date()
+
+
+def add_activity(connection, rows, replace=False):
+    """
+    Aktivite sayaçlarını atomik olarak artır (veya replace=True ile üzerine yaz)
+
+    Args:
+        connection: Aktif transaction bağlantısı
+        rows: {(user_id, day): {'posts': 1, ...}, ...}
+    """
+    for (user_id, day), values in rows.items():
+        values = {field: amount for field, amount in values.items() if amount or replace}
+        if not values:
+            continue
+        upsert(connection, _table, dict(
+            user_id=user_id, day=day,
+            **{field: values.get(field, 0) for field in ACTIVITY_FIELDS}
+        ), index_elements=('user_id', 'day'), set_={
+            field: amount if replace else _table.c[field] + amount
+            for field, amount in values.items()
+        })
+
+
+def record_views(connection, pending):
+    """
+    View counter flush'ından gelen artışları ilan sahiplerinin günlerine ekle
+
+    Args:
+        pending: {post_id: (artış, son görüntülenme)}
+    """
+    if not pending:
+        return
+    owners = dict(connection.execute(
+        select(_posts.c.id, _posts.c.user_id).where(_posts.c.id.in_(list(pending)))
+    ).all())
+
+    rows = {}
+    for post_id, (increment, viewed_at) in pending.items():
+        if post_id not in owners:
+            continue
+        key = (owners[post_id], _day_of(viewed_at.replace(tzinfo=None)))
+        bucket = rows.setdefault(key, {'views': 0})
+        bucket['views'] += increment
+    add_activity(connection, rows)
+
+
+def _history_rows(connection):
+    """Geçmişten (kullanıcı, gün) başına ilan ve başvuru sayıları"""
+    post_day = func.date(_posts.c.created_at, type_=db.Date)
+    application_day = func.date(_applications.c.created_at, type_=db.Date)
+
+    rows = {}
+
+    def collect(field, query):
+        for user_id, day, count in connection.execute(query):
+            if user_id is None or day is None:
+                continue
+            rows.setdefault((user_id, day), {})[field] = count
+
+    collect('posts', select(_posts.c.user_id, post_day, func.count())
+            .group_by(_posts.c.user_id, post_day))
+    collect('applications_sent', select(_applications.c.applicant_id, application_day, func.count())
+            .group_by(_applications.c.applicant_id, application_day))
+    collect('applications_received', select(_posts.c.user_id, application_day, func.count())
+            .select_from(_applications.join(_posts, _posts.c.id == _applications.c.post_id))
+            .group_by(_posts.c.user_id, application_day))
+    return rows
+
+
+def _backfill(connection):
+    """
+    İlan/başvuru sayılarını geçmişten yeniden hesapla
+
+    Görüntülenmelerin günlük geçmişi yoktur; mevcut views değerleri korunur.
+    """
+    connection.execute(_table.update().values(posts=0, applications_sent=0, applications_received=0))
+    rows = _history_rows(connection)
+    for values in rows.values():
+        for field in ('posts', 'applications_sent', 'applications_received'):
+            values.setdefault(field, 0)
+    add_activity(connection, rows, replace=True)
+    return len(rows)
+
+
+def ensure_activity_table():
+    """Özet tablosunu (yoksa) oluştur ve geçmişten doldur (migration 4)"""
+    with db.engine.begin() as connection:
+        if sa_inspect(connection).has_table(_table.name):
+            return
+        _table.create(connection)
+        count = _backfill(connection)
+        print(f'📈 Günlük aktivite özeti oluşturuldu: {count} kullanıcı-gün')
+
+
+def backfill_activity():
+    """Özet tablosunu geçmişten yeniden doldur"""
+    with db.engine.begin() as connection:
+        return _backfill(connection)
+
+
+def get_activity_range(user_id, start_day, end_day):
+    """
+    (user_id, day) index'i ile tek range sorgusu
+
+    Returns:
+        dict: {date: {'posts': .., 'applications_sent': .., 'applications_received': .., 'views': ..}}
+    """
+    rows = db.session.query(UserDailyActivity).filter(
+        UserDailyActivity.user_id == user_id,
+        UserDailyActivity.day >= start_day,
+        UserDailyActivity.day <= end_day
+    ).all()
+    return {row.day: {field: getattr(row, field) for field in ACTIVITY_FIELDS} for row in rows}
+
+
+def get_daily_activity(user_id, days=30, today=None):
+    """
+    Son `days` günün aktivite serisi (boş günler 0)
+
+    Returns:
+        list: [{'day': date, 'posts': .., 'applications_sent': .., 'applications_received': .., 'views': ..}, ...]
+    """
+    today = today or datetime.utcnow().date()
+    start_day = today - timedelta(days=days - 1)
+    activity = get_activity_range(user_id, start_day, today)
+    empty = {field: 0 for field in ACTIVITY_FIELDS}
+    return [
+        {'day': day, **activity.get(day, empty)}
+        for day in (start_day + timedelta(days=offset) for offset in range(days))
+    ]
+
+
+# ============================================
+# ORM EVENTS - Özet tablosunu ilan/başvuru oluşturma ile senkron tut
+# ============================================
+
+@event.listens_for(TevkilPost, 'after_insert')
+def _post_inserted(mapper, connection, target):
+    add_activity(connection, {(target.user_id, _day_of(target.created_at)): {'posts': 1}})
+
+
+@event.listens_for(Application, 'after_insert')
+def _application_inserted(mapper, connection, target):
+    day = _day_of(target.created_at)
+    rows = {(target.applicant_id, day): {'applications_sent': 1}}
+    owner_id = connection.execute(select(_posts.c.user_id).where(_posts.c.id == target.post_id)).scalar()
+    if owner_id is not None:
+        rows.setdefault((owner_id, day), {})['applications_received'] = 1
+    add_activity(connection, rows)
+
+
+def init_activity(app, view_counter=None):
+    """Aktivite özetini kaydet: view flush'larına bağlan + CLI komutu"""
+    if view_counter is not None:
+        view_counter.register_batch_listener(record_views)
+
+    @app.cli.command('activity-backfill')
+    def activity_backfill():
+        """Rebuild user_daily_activity post/application counts from history"""
+        count = backfill_activity()
+        print(f'✅ {count} kullanıcı-gün yeniden hesaplandı')
@@ -15,6 +15,7 @@ from dotenv import load_dotenv
 from models import db, User, TevkilPost, Application, Rating, Message, Notification, Favorite, PasswordReset, Conversation
 from models import UserSession, SecurityLog, PasswordHistory, LoginAttempt
 from sqlalchemy import or_, and_
+from sqlalchemy.orm import joinedload
 import secrets
 import json
 from constants import CITIES, COURTHOUSES
@@ -22,7 +23,28 @@ from sms_service import NetgsmSMSService
 from geocoding_service import get_coordinates
 from functools import wraps
 import security_utils
-from cache_config import init_cache
+from cache_config import init_cache, tiered_cache
+import search_service
+import pagination
+import facet_service
+import map_service
+import migrations
+from expiry_service import init_expiry
+from view_counter import init_view_counter
+from unique_viewers import init_unique_viewers
+from post_stats import get_application_stats
+from dashboard_service import get_dashboard_data
+from activity_service import init_activity, get_daily_activity
+from counter_service import init_counters
+from rating_service import init_ratings, get_rating_summary, PROFILE_RATINGS_LIMIT
+from platform_stats import init_platform_stats
+from fragment_cache import init_fragment_cache
+import chat_history
+from conversation_service import get_conversation_list
+from message_bus import init_message_bus
+from presence import init_presence, presence_room
+from typing_state import init_typing
+from message_service import init_message_service, send_message as persist_message, MessageError, MessagePending
 from database_pooling_config import DATABASE_CONFIG
 
 # Load environment variables
@@ -33,19 +55,83 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///tevkil.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['REDIS_URL'] = os.getenv('REDIS_URL')
+# Socket.IO worker'lar arası message queue - boş bırakılırsa süreç içi (testler, tek worker)
+app.config['SOCKETIO_MESSAGE_QUEUE'] = os.getenv('SOCKETIO_MESSAGE_QUEUE', app.config['REDIS_URL']) or None
 app.config['DEV_MODE'] = os.getenv('FLASK_ENV', 'production') == 'development'
 
+
+def socketio_async_mode():
+    """
+    Socket.IO async modu: SOCKETIO_ASYNC_MODE verilmezse gunicorn gevent worker'ı
+    (render.yaml / Procfile) monkey-patch yaptıysa gevent, yoksa (python app.py,
+    test betikleri) threading - patch'lenmemiş process'te greenlet'ler hiç çalışmaz
+    """
+    mode = os.getenv('SOCKETIO_ASYNC_MODE')
+    if mode:
+        return mode
+    try:
+        from gevent import monkey
+    except ImportError:
+        return 'threading'
+    return 'gevent' if monkey.is_module_patched('socket') else 'threading'
+
 # ⚡ DATABASE POOLING - High concurrency support
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = DATABASE_CONFIG
 
 # Initialize extensions
 db.init_app(app)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Message queue varsa emit'ler Redis üzerinden tüm worker'lara dağıtılır
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=socketio_async_mode(),
+                    message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'])
 
 # ⚡ REDIS CACHE - 70% faster response times
 cache = init_cache(app)
 
+# 🧱 MIGRATIONS - Versiyonlu şema/index migration'ları (bekleyenler başlangıçta uygulanır;
+# yeni kolonlar modelde tanımlı olduğundan hiçbir sorgu bundan önce çalışmamalı)
+migrations.init_migrations(app)
+
+# 🔎 FULL-TEXT SEARCH - FTS5 (SQLite) / tsvector (PostgreSQL)
+search_service.init_search(app)
+
+# 📊 FACET COUNTERS - Filtre başına ilan sayıları
+facet_service.init_facets(app)
+
+# 🗺️ MAP CLUSTERS - Viewport tabanlı harita API'si
+map_service.init_map(app)
+
+# 👁️ VIEW COUNTER - Write-behind görüntülenme sayacı
+view_counter = init_view_counter(app)
+
+# 🔢 UNIQUE VIEWERS - HyperLogLog tekil izleyici sayımı
+unique_viewers = init_unique_viewers(app, view_counter)
+
+# 📈 DAILY ACTIVITY - Kullanıcı başına günlük aktivite özeti
+init_activity(app, view_counter)
+init_counters(app, view_counter)
+init_ratings(app)
+fragment_cache = init_fragment_cache(app)
+
+# 📨 MESSAGE BUS - Long-poll bekleyicilerini yeni mesajlarla uyandırır
+message_bus = init_message_bus(app)
+
+# 🟢 PRESENCE - Worker'lar arası çevrimiçi kullanıcı kaydı (sid + heartbeat TTL)
+presence = init_presence(app, socketio)
+
+# ⌨️ TYPING - Birleştirilen, TTL ile düşen "yazıyor" durumu
+typing_state = init_typing(app, socketio)
+
+# ✉️ MESSAGE SERVICE - Tüm gönderim yollarının ortak yazma + yayın servisi (opsiyonel grup commit)
+message_service = init_message_service(app, socketio)
+
+# 🌐 PLATFORM STATS - Arka planda yenilenen platform istatistik snapshot'ı
+platform_stats = init_platform_stats(app, unique_viewers)
+
+# ⏰ POST EXPIRY - Süresi dolan ilanlar ve "süresi doluyor" bildirimleri
+init_expiry(app)
+
 # Initialize CSRF Protection
 csrf = CSRFProtect(app)
 
@@ -378,11 +464,40 @@ def index():
 @dev_login_optional
 def dashboard():
     """Kullanıcı dashboard"""
-    # Kullanıcının ilanları
-    my_posts = TevkilPost.query.filter_by(user_id=current_user.id).order_by(TevkilPost.created_at.desc()).all()
+    user_id = current_user.id
     
-    # Kullanıcının başvuruları
-    my_applications = Application.query.filter_by(applicant_id=current_user.id).order_by(Application.created_at.desc()).all()
+    # Kullanıcının ilanları: durum başına sayılar + son 3 ilan (tam liste sekmede, cache'li)
+    post_counts = {'total': 0, 'active': 0, 'completed': 0}
+    for status, count in db.session.query(TevkilPost.status, db.func.count(TevkilPost.id)).filter(
+        TevkilPost.user_id == user_id
+    ).group_by(TevkilPost.status):
+        post_counts['total'] += count
+        if status in post_counts:
+            post_counts[status] = count
+    recent_posts = TevkilPost.query.filter_by(user_id=user_id).order_by(TevkilPost.created_at.desc()).limit(3).all()
+    
+    # Kullanıcının başvuruları: sayı + son 3 başvuru
+    sent_applications_count = Application.query.filter_by(applicant_id=user_id).count()
+    recent_applications = Application.query.filter_by(applicant_id=user_id).order_by(
+        Application.created_at.desc()
+    ).limit(3).all()
+    
+    def build_my_posts():
+        my_posts = TevkilPost.query.filter_by(user_id=user_id).order_by(TevkilPost.created_at.desc()).all()
+        return render_template('partials/dashboard_my_posts.html', my_posts=my_posts)
+    
+    def build_my_applications():
+        my_applications = Application.query.options(
+            joinedload(Application.post).joinedload(TevkilPost.user)
+        ).filter_by(applicant_id=user_id).order_by(Application.created_at.desc()).all()
+        html = render_template('partials/dashboard_my_applications.html', my_applications=my_applications)
+        # Başvurulan ilanların ve sahiplerinin değişiklikleri de parçayı geçersiz kılar
+        return html, {tag for app in my_applications for tag in (f'post:{app.post_id}', f'user:{app.post.user_id}')}
+    
+    my_posts_fragment = fragment_cache.render('dashboard_my_posts', user_id, build_my_posts,
+                                              tags=[f'user:{user_id}'])
+    my_applications_fragment = fragment_cache.render('dashboard_my_applications', user_id, build_my_applications,
+                                                     tags=[f'user:{user_id}'])
     
     # Gelen başvurular (kullanıcının ilanlarına)
     incoming_applications = db.session.query(Application).join(TevkilPost).filter(
@@ -392,92 +507,23 @@ def dashboard():
     # Okunmamış bildirimler
     unread_notifications = Notification.query.filter_by(user_id=current_user.id, read_at=None).count()
     
-    # Chart Data: Son 6 ayın başvuru trendi
-    from datetime import datetime, timedelta
-    import calendar
-    
-    now = datetime.now(timezone.utc)
-    chart_months = []
-    chart_incoming = []
-    chart_outgoing = []
-    
-    for i in range(5, -1, -1):  # Son 6 ay
-        month_date = now - timedelta(days=30*i)
-        month_start = month_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        if i == 0:
-            month_end = now
-        else:
-            next_month = month_start.replace(day=28) + timedelta(days=4)
-            month_end = next_month - timedelta(days=next_month.day)
-        
-        # Ay adı (Türkçe)
-        turkish_months = ['Oca', 'Şub', 'Mar', 'Nis', 'May', 'Haz', 'Tem', 'Ağu', 'Eyl', 'Eki', 'Kas', 'Ara']
-        chart_months.append(turkish_months[month_start.month - 1])
-        
-        # Gelen başvurular (bu aydaki)
-        incoming_count = db.session.query(Application).join(TevkilPost).filter(
-            TevkilPost.user_id == current_user.id,
-            Application.created_at >= month_start,
-            Application.created_at <= month_end
-        ).count()
-        chart_incoming.append(incoming_count)
-        
-        # Yaptığım başvurular
-        outgoing_count = Application.query.filter(
-            Application.applicant_id == current_user.id,
-            Application.created_at >= month_start,
-            Application.created_at <= month_end
-        ).count()
-        chart_outgoing.append(outgoing_count)
-    
-    # Chart Data: Kategori dağılımı
-    from sqlalchemy import func
-    category_data = db.session.query(
-        TevkilPost.category, 
-        func.count(TevkilPost.id)
-    ).filter_by(user_id=current_user.id).group_by(TevkilPost.category).all()
-    
-    category_labels = [cat[0] or 'Diğer' for cat in category_data]
-    category_counts = [cat[1] for cat in category_data]
-    
-    # Performance stats
-    # Bu ay tamamlanan işler
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    monthly_completed = TevkilPost.query.filter(
-        TevkilPost.user_id == current_user.id,
-        TevkilPost.status == 'completed',
-        TevkilPost.updated_at >= month_start
-    ).count()
-    
-    # Tahmini toplam kazanç (completed işlerin price_max toplamı)
-    completed_posts = TevkilPost.query.filter_by(
-        user_id=current_user.id, 
-        status='completed'
-    ).all()
-    total_earnings = sum([p.price_max for p in completed_posts if p.price_max])
-    
-    # Ortalama rating
-    ratings = Rating.query.filter_by(reviewed_id=current_user.id).all()
-    avg_rating = sum([r.rating for r in ratings]) / len(ratings) if ratings else 0
+    # Grafik ve performans verileri (tek GROUP BY'lı seriler, kullanıcı başına cache'li)
+    dashboard_data = get_dashboard_data(current_user.id)
     
     # Kullanıcı istatistiklerini getir
     user_stats = get_user_stats(current_user.id)
     
     return render_template('dashboard.html',
-                         my_posts=my_posts,
-                         my_applications=my_applications,
+                         post_counts=post_counts,
+                         recent_posts=recent_posts,
+                         sent_applications_count=sent_applications_count,
+                         recent_applications=recent_applications,
+                         my_posts_fragment=my_posts_fragment,
+                         my_applications_fragment=my_applications_fragment,
                          incoming_applications=incoming_applications,
                          unread_notifications=unread_notifications,
-                         chart_months=chart_months,
-                         chart_incoming=chart_incoming,
-                         chart_outgoing=chart_outgoing,
-                         category_labels=category_labels,
-                         category_counts=category_counts,
-                         monthly_completed=monthly_completed,
-                         total_earnings=total_earnings,
-                         avg_rating=avg_rating,
-                         user_stats=user_stats)
+                         user_stats=user_stats,
+                         **dashboard_data.as_template_context())
 
 @app.route('/stats')
 @dev_login_optional
@@ -486,53 +532,35 @@ def stats_page():
     # Kullanıcı istatistikleri
     user_stats = get_user_stats(current_user.id)
     
-    # Platform istatistikleri (admin için tüm platform, diğerleri için özet)
-    platform_stats = get_platform_stats() if current_user.is_admin else None
-    
-    # Son 30 günlük aktivite grafiği
-    from datetime import datetime, timedelta
-    
-    now = datetime.now(timezone.utc)
-    daily_stats = []
-    
-    for i in range(29, -1, -1):  # Son 30 gün
-        day_date = now - timedelta(days=i)
-        day_start = day_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        # O günkü yeni ilanlar
-        posts_count = TevkilPost.query.filter(
-            TevkilPost.user_id == current_user.id,
-            TevkilPost.created_at >= day_start,
-            TevkilPost.created_at < day_end
-        ).count()
-        
-        # O günkü başvurular
-        applications_count = Application.query.filter(
-            Application.applicant_id == current_user.id,
-            Application.created_at >= day_start,
-            Application.created_at < day_end
-        ).count()
-        
-        # O günkü görüntülenmeler (tüm ilanların toplamı)
-        views_count = db.session.query(db.func.sum(TevkilPost.view_count)).filter(
-            TevkilPost.user_id == current_user.id,
-            TevkilPost.last_viewed_at >= day_start,
-            TevkilPost.last_viewed_at < day_end
-        ).scalar() or 0
-        
-        daily_stats.append({
-            'date': day_start.strftime('%d %b'),
-            'posts': posts_count,
-            'applications': applications_count,
-            'views': views_count
-        })
+    # Platform istatistikleri (admin için) - arka planda hesaplanan snapshot
+    platform_snapshot = platform_stats.get() if current_user.is_admin else None
+    
+    # Son 30 günlük aktivite grafiği - user_daily_activity özetinden tek range sorgusu
+    daily_stats = [{
+        'date': row['day'].strftime('%d %b'),
+        'posts': row['posts'],
+        'applications': row['applications_sent'],
+        'views': row['views']
+    } for row in get_daily_activity(current_user.id, 30)]
     
     return render_template('stats.html', 
                          user_stats=user_stats,
-                         platform_stats=platform_stats,
+                         platform_stats=platform_snapshot['stats'] if platform_snapshot else None,
+                         platform_snapshot=platform_snapshot,
                          daily_stats=daily_stats)
 
+@app.route('/admin/platform-stats/refresh', methods=['POST'])
+@login_required
+def refresh_platform_stats():
+    """Platform istatistik snapshot'ını şimdi yenile (arka planda)"""
+    if not current_user.is_admin:
+        flash('Bu işlem için yetkiniz yok', 'error')
+        return redirect(url_for('stats_page'))
+    
+    platform_stats.refresh_async()
+    flash('Platform istatistikleri yenileniyor, birkaç saniye içinde güncellenecek', 'success')
+    return redirect(url_for('stats_page'))
+
 @app.route('/applications/received')
 @dev_login_optional
 def applications_received():
@@ -557,20 +585,23 @@ def applications_sent():
 # TEVKIL POST ROUTES
 # ============================================
 
-@app.route('/posts')
-@dev_login_optional
-def list_posts():
-    """İlan listesi"""
-    from constants import CITIES
-    
-    # Filters
-    filter_type = request.args.get('filter')  # my_active, my_completed, all
-    category = request.args.get('category')
-    city = request.args.get('city')
-    urgency = request.args.get('urgency')
-    search = request.args.get('search')
+def build_posts_query(args):
+    """
+    /posts ve /api/posts için ortak filtreli ilan sorgusu
+
+    Returns:
+        tuple: (sorgu, keyset sıralama kolonları)
+    """
+    filter_type = args.get('filter')  # my_active, my_completed, all
+    category = args.get('category')
+    city = args.get('city')
+    urgency = args.get('urgency')
+    search = args.get('search')
     
     # Base query
+    if filter_type in ('my_active', 'my_completed', 'my_all') and not current_user.is_authenticated:
+        filter_type = None
+    
     if filter_type == 'my_active':
         # Kullanıcının aktif ilanları
         query = TevkilPost.query.filter_by(user_id=current_user.id, status='active')
@@ -590,54 +621,122 @@ def list_posts():
         query = query.filter_by(city=city)
     if urgency:
         query = query.filter_by(urgency_level=urgency)
+    
+    search_rank = None
     if search:
-        query = query.filter(or_(
-            TevkilPost.title.ilike(f'%{search}%'),
-            TevkilPost.description.ilike(f'%{search}%')
-        ))
+        query, search_rank = search_service.search_posts(query, search)
     
-    posts = query.order_by(TevkilPost.created_at.desc()).all()
+    # (created_at, id) keyset - id eşit tarihli ilanlarda sırayı kesinleştirir
+    order_by = [(TevkilPost.created_at, True), (TevkilPost.id, True)]
+    if search_rank is not None:
+        # Arama varsa alaka düzeyine göre, eşitlikte en yeni önce
+        query = query.add_columns(search_rank)
+        order_by.insert(0, (search_rank, False))
     
-    # Get current user's favorites
-    current_user_favorites = []
-    if current_user.is_authenticated:
-        favorites = Favorite.query.filter_by(user_id=current_user.id).all()
-        current_user_favorites = [fav.post_id for fav in favorites]
+    return query, order_by
+
+
+class InvalidLocation(ValueError):
+    """lat/lng/radius_km parametreleri geçersiz - 400 döndürülür"""
+
+
+@app.errorhandler(InvalidLocation)
+def handle_invalid_location(error):
+    return jsonify({'success': False, 'error': str(error)}), 400
+
+
+def paginate_posts(args):
+    """
+    Filtrelenmiş ilanların bir sayfası ve sonraki sayfa cursor'ı
+
+    lat, lng ve radius_km verilirse sonuçlar yarıçapla sınırlanır ve
+    mesafeye göre sıralanır (her ilanda distance_km set edilir).
+
+    Raises:
+        InvalidLocation: Koordinat aralık dışı / sonsuz veya yarıçap pozitif değil
+    """
+    query, order_by = build_posts_query(args)
+    
+    lat = args.get('lat', type=float)
+    lng = args.get('lng', type=float)
+    radius_km = args.get('radius_km', type=float)
+    if lat is not None and lng is not None and radius_km:
+        circle = map_service.parse_radius(lat, lng, radius_km)
+        if circle is None:
+            raise InvalidLocation('Geçersiz konum veya yarıçap')
+        lat, lng, radius_km = circle
+        return map_service.paginate_by_distance(
+            query, lat, lng, radius_km,
+            cursor=args.get('cursor'),
+            limit=args.get('limit', type=int)
+        )
+    
+    return pagination.paginate(
+        query, order_by,
+        cursor=args.get('cursor'),
+        limit=args.get('limit', type=int)
+    )
+
+
+def get_favorite_post_ids(post_ids):
+    """Sadece sayfadaki ilanlar için favori kontrolü (tüm favoriler yüklenmez)"""
+    if not current_user.is_authenticated or not post_ids:
+        return []
+    rows = db.session.query(Favorite.post_id).filter(
+        Favorite.user_id == current_user.id,
+        Favorite.post_id.in_(post_ids)
+    ).all()
+    return [row.post_id for row in rows]
+
+
+@app.route('/posts')
+@dev_login_optional
+def list_posts():
+    """İlan listesi (ilk sayfa, devamı /posts/page ile yüklenir)"""
+    from constants import CITIES
     
-    return render_template('posts_list.html', posts=posts, current_user_favorites=current_user_favorites, cities=CITIES, filter_type=filter_type)
+    filter_type = request.args.get('filter')
+    posts, next_cursor = paginate_posts(request.args)
+    current_user_favorites = get_favorite_post_ids([p.id for p in posts])
+    
+    # Filtre sayıları sadece genel aktif ilan listesi için (my_* filtreleri kullanıcıya özel)
+    facets = None
+    if not filter_type or filter_type == 'all':
+        facets = facet_service.get_facet_counts('active', facet_service.selected_facets(request.args))
+    
+    return render_template('posts_list.html', posts=posts, current_user_favorites=current_user_favorites,
+                         cities=CITIES, filter_type=filter_type, next_cursor=next_cursor, facets=facets)
+
+@app.route('/posts/page')
+@dev_login_optional
+def list_posts_page():
+    """Sonsuz kaydırma: sonraki ilan kartlarını HTML parçası olarak döndür"""
+    posts, next_cursor = paginate_posts(request.args)
+    current_user_favorites = get_favorite_post_ids([p.id for p in posts])
+    
+    html = render_template('posts_list_items.html', posts=posts, current_user_favorites=current_user_favorites)
+    response = app.response_class(html, mimetype='text/html')
+    response.headers['X-Next-Cursor'] = next_cursor or ''
+    return response
 
 @app.route('/map')
 @dev_login_optional
 def map_view():
-    """Harita görünümü - tüm ilanları haritada göster"""
-    # Aktif ilanları getir
-    posts = TevkilPost.query.filter_by(status='active').order_by(TevkilPost.created_at.desc()).all()
-    
-    # Haritada gösterilecek JSON verisi hazırla
-    posts_json = []
-    for post in posts:
-        if post.latitude and post.longitude:  # Koordinatları olan ilanlar
-            posts_json.append({
-                'id': post.id,
-                'title': post.title,
-                'description': post.description[:100] + '...' if len(post.description) > 100 else post.description,
-                'category': post.category,
-                'urgency_level': post.urgency_level,
-                'location': post.location,
-                'formatted_address': post.formatted_address or post.location,
-                'latitude': post.latitude,
-                'longitude': post.longitude,
-                'created_at': post.created_at.strftime('%d.%m.%Y'),
-                'user_name': post.user.full_name if post.user else 'Anonim'
-            })
-    
+    """Harita görünümü - ilanlar viewport'a göre /api/map/posts'tan yüklenir"""
     # Google Maps API anahtarı (opsiyonel, fallback var)
     google_maps_key = os.getenv('GOOGLE_MAPS_API_KEY', '')
     
-    return render_template('map.html', 
-                         posts=posts,
-                         posts_json=posts_json,
-                         google_maps_key=google_maps_key)
+    return render_template('map.html', google_maps_key=google_maps_key)
+
+@app.route('/api/map/posts', methods=['GET'])
+def api_map_posts():
+    """API: Harita viewport'undaki ilanlar veya kümeler (?bbox=minLng,minLat,maxLng,maxLat&zoom=z)"""
+    bbox = map_service.parse_bbox(request.args.get('bbox'))
+    if bbox is None:
+        return jsonify({'success': False, 'error': 'Geçersiz bbox'}), 400
+    
+    zoom = request.args.get('zoom', type=int, default=6)
+    return jsonify(map_service.get_map_data(bbox, zoom))
 
 @app.route('/posts/new', methods=['GET', 'POST'])
 @login_required
@@ -664,8 +763,8 @@ def create_post():
             price_min=float(data.get('price_min')) if data.get('price_min') else None,
             price_max=float(data.get('price_max')) if data.get('price_max') else None,
             expires_at=datetime.now(timezone.utc) + timedelta(days=30),
-            latitude=coords.get('latitude'),
-            longitude=coords.get('longitude'),
+            latitude=coords.get('lat'),
+            longitude=coords.get('lng'),
             formatted_address=coords.get('formatted_address')
         )
         
@@ -697,8 +796,20 @@ def post_detail(post_id):
     # İlan görüntüleme sayısını artır (hem eski hem yeni sistem)
     update_post_view(post_id, current_user.id if current_user.is_authenticated else None)
     
-    # Başvuruları getir - herkes sayıyı görebilir, ama detayları sadece ilan sahibi
-    applications = Application.query.filter_by(post_id=post_id).order_by(Application.created_at.desc()).all()
+    # Başvurular: detay listesi sadece ilan sahibine; diğerlerine cache'li sayı özeti
+    applications = []
+    applications_fragment = None
+    if current_user.is_authenticated and current_user.id == post.user_id:
+        applications = Application.query.options(joinedload(Application.applicant)).filter_by(
+            post_id=post_id
+        ).order_by(Application.created_at.desc()).all()
+    else:
+        applications_fragment = fragment_cache.render(
+            'post_applications_public', post_id,
+            lambda: render_template('partials/post_applications_public.html',
+                                    application_counts=get_application_stats(post_id)),
+            tags=[f'post:{post_id}']
+        )
     
     # Check if post is favorited
     is_favorited = False
@@ -706,12 +817,16 @@ def post_detail(post_id):
         is_favorited = Favorite.query.filter_by(user_id=current_user.id, post_id=post_id).first() is not None
     
     # İlan istatistiklerini getir
-    post_stats = get_post_stats(post_id)
+    post_stats = get_post_stats(post_id, post)
+    if post_stats:
+        # Henüz yazılmamış (tampondaki) görüntülemeleri de göster
+        post_stats['view_count'] += view_counter.pending_views(post_id)
     
     # Google Maps API anahtarı
     google_maps_key = os.getenv('GOOGLE_MAPS_API_KEY', '')
     
-    return render_template('post_detail.html', post=post, applications=applications, 
+    return render_template('post_detail.html', post=post, applications=applications,
+                         applications_fragment=applications_fragment,
                          is_favorited=is_favorited, post_stats=post_stats,
                          google_maps_key=google_maps_key)
 
@@ -733,8 +848,8 @@ def edit_post(post_id):
         location_str = data.get('location')
         if location_str != post.location:
             coords = get_coordinates(location_str) if location_str else {}
-            post.latitude = coords.get('latitude')
-            post.longitude = coords.get('longitude')
+            post.latitude = coords.get('lat')
+            post.longitude = coords.get('lng')
             post.formatted_address = coords.get('formatted_address')
         
         post.title = data.get('title')
@@ -806,7 +921,6 @@ def apply_to_post(post_id):
     )
     
     db.session.add(application)
-    post.applications_count += 1
     
     # Bildirim oluştur
     notification = Notification(
@@ -1074,13 +1188,29 @@ def user_profile(user_id):
     """Kullanıcı profili"""
     user = User.query.get_or_404(user_id)
     
-    # Kullanıcının tamamladığı işler
-    completed_posts = TevkilPost.query.filter_by(assigned_to=user_id, status='completed').all()
+    # Tekil profil ziyaretçisi (kendi profilini görüntüleme sayılmaz)
+    if not (current_user.is_authenticated and current_user.id == user_id):
+        viewer_key = f'user:{current_user.id}' if current_user.is_authenticated else f'ip:{request.remote_addr}'
+        unique_viewers.track_profile_view(user_id, viewer_key)
     
-    # Aldığı değerlendirmeler
-    ratings = Rating.query.filter_by(reviewed_id=user_id).order_by(Rating.created_at.desc()).all()
+    def build_profile_history():
+        # Kullanıcının tamamladığı işler
+        completed_posts = TevkilPost.query.filter_by(assigned_to=user_id, status='completed').all()
+        
+        # Aldığı değerlendirmeler: adet/ortalama özetten, liste sadece son yorumlar
+        ratings = Rating.query.options(joinedload(Rating.reviewer)).filter_by(
+            reviewed_id=user_id
+        ).order_by(Rating.created_at.desc()).limit(PROFILE_RATINGS_LIMIT).all()
+        
+        html = render_template('partials/profile_history.html', user=user, completed_posts=completed_posts,
+                               ratings=ratings, rating_summary=get_rating_summary(user_id))
+        # Yorum yapanların ad değişiklikleri de parçayı geçersiz kılar
+        return html, {f'user:{rating.reviewer_id}' for rating in ratings}
     
-    return render_template('profile.html', user=user, completed_posts=completed_posts, ratings=ratings)
+    profile_history = fragment_cache.render('profile_history', user_id, build_profile_history,
+                                            tags=[f'user:{user_id}'])
+    
+    return render_template('profile.html', user=user, profile_history=profile_history)
 
 @app.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
@@ -1452,21 +1582,13 @@ def get_user_stats(user_id):
         Application.created_at >= thirty_days_ago
     ).count()
     
-    # Rating breakdown
-    ratings = Rating.query.filter_by(reviewed_id=user_id).all()
-    rating_breakdown = {
-        5: len([r for r in ratings if r.rating == 5]),
-        4: len([r for r in ratings if r.rating == 4]),
-        3: len([r for r in ratings if r.rating == 3]),
-        2: len([r for r in ratings if r.rating == 2]),
-        1: len([r for r in ratings if r.rating == 1]),
-    }
+    # Rating breakdown (özet satırından)
+    rating_summary = get_rating_summary(user_id)
     
     # Kategori dağılımı
-    user_posts = TevkilPost.query.filter_by(user_id=user_id).all()
-    category_distribution = {}
-    for post in user_posts:
-        category_distribution[post.category] = category_distribution.get(post.category, 0) + 1
+    category_distribution = dict(db.session.query(
+        TevkilPost.category, db.func.count(TevkilPost.id)
+    ).filter(TevkilPost.user_id == user_id).group_by(TevkilPost.category).all())
     
     return {
         'total_posts': user.total_posts_created or 0,
@@ -1477,10 +1599,10 @@ def get_user_stats(user_id):
         'success_rate': round(user.success_rate or 0, 1),
         'average_response_time': round(user.average_response_time_hours or 0, 1),
         'total_views': user.total_views_received or 0,
-        'profile_views': user.profile_views or 0,
-        'rating_average': round(user.rating_average or 0, 1),
-        'rating_count': user.rating_count or 0,
-        'rating_breakdown': rating_breakdown,
+        'profile_views': max(user.profile_views or 0, unique_viewers.profile_unique_viewers(user_id)),
+        'rating_average': round(rating_summary['average'], 1),
+        'rating_count': rating_summary['count'],
+        'rating_breakdown': rating_summary['breakdown'],
         'recent_posts_30d': recent_posts,
         'recent_applications_30d': recent_applications,
         'category_distribution': category_distribution,
@@ -1490,98 +1612,51 @@ def get_user_stats(user_id):
 
 
 def get_platform_stats():
-    """Platform geneli istatistikler"""
-    # Temel sayılar
-    total_users = User.query.count()
-    total_posts = TevkilPost.query.count()
-    total_applications = Application.query.count()
-    active_posts = TevkilPost.query.filter_by(status='active').count()
-    
-    # Son 7 günlük aktivite
-    seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
-    new_users_7d = User.query.filter(User.created_at >= seven_days_ago).count()
-    new_posts_7d = TevkilPost.query.filter(TevkilPost.created_at >= seven_days_ago).count()
-    new_applications_7d = Application.query.filter(Application.created_at >= seven_days_ago).count()
-    
-    # Şehir bazlı istatistikler
-    city_stats = db.session.query(
-        TevkilPost.city,
-        db.func.count(TevkilPost.id).label('count')
-    ).group_by(TevkilPost.city).order_by(db.func.count(TevkilPost.id).desc()).limit(10).all()
-    
-    # Kategori bazlı istatistikler
-    category_stats = db.session.query(
-        TevkilPost.category,
-        db.func.count(TevkilPost.id).label('count')
-    ).group_by(TevkilPost.category).order_by(db.func.count(TevkilPost.id).desc()).all()
-    
-    # En aktif kullanıcılar
-    top_creators = User.query.order_by(User.total_posts_created.desc()).limit(5).all()
-    
-    # En çok görüntülenen ilanlar
-    top_viewed = TevkilPost.query.order_by(TevkilPost.view_count.desc()).limit(5).all()
+    """
+    Platform geneli istatistikler
     
-    return {
-        'total_users': total_users,
-        'total_posts': total_posts,
-        'total_applications': total_applications,
-        'active_posts': active_posts,
-        'new_users_7d': new_users_7d,
-        'new_posts_7d': new_posts_7d,
-        'new_applications_7d': new_applications_7d,
-        'city_stats': [(city, count) for city, count in city_stats],
-        'category_stats': [(cat, count) for cat, count in category_stats],
-        'top_creators': top_creators,
-        'top_viewed': top_viewed,
-    }
+    Arka planda hesaplanan snapshot'tan okunur (platform_stats); istek içinde
+    tablo taraması yapılmaz. Snapshot henüz yoksa None döner.
+    """
+    snapshot = platform_stats.get()
+    return snapshot['stats'] if snapshot else None
 
 
-def get_post_stats(post_id):
-    """İlan bazlı detaylı istatistikler"""
-    post = TevkilPost.query.get(post_id)
+def get_post_stats(post_id, post=None):
+    """
+    İlan bazlı detaylı istatistikler
+    
+    Başvuru sayıları tek aggregate sorgudan (post_stats, kısa TTL cache) gelir;
+    post_detail zaten yüklediği ilanı verirse tekrar yüklenmez.
+    """
+    if post is None:
+        post = db.session.get(TevkilPost, post_id)
     if not post:
         return None
     
-    # Başvuru istatistikleri
-    applications = Application.query.filter_by(post_id=post_id).all()
-    
-    accepted_count = len([a for a in applications if a.status == 'accepted'])
-    rejected_count = len([a for a in applications if a.status == 'rejected'])
-    pending_count = len([a for a in applications if a.status == 'pending'])
-    
-    # Başvuru zamanları analizi
-    if applications:
-        application_times = [(a.created_at - post.created_at).total_seconds() / 3600 for a in applications]
-        avg_time_to_apply = sum(application_times) / len(application_times)
-    else:
-        avg_time_to_apply = 0
+    application_stats = get_application_stats(post_id)
     
     return {
         'view_count': post.view_count or 0,
-        'application_count': len(applications),
-        'accepted_count': accepted_count,
-        'rejected_count': rejected_count,
-        'pending_count': pending_count,
+        'unique_viewers': max(post.unique_viewers or 0, unique_viewers.post_unique_viewers(post_id)),
+        'daily_unique_viewers': unique_viewers.cached_daily_unique_viewers(7, 'post', post_id),
+        **application_stats,
         'application_rate': round(post.application_rate or 0, 2),
-        'avg_time_to_apply_hours': round(avg_time_to_apply, 1),
-        'first_application_at': post.first_application_at,
+        'first_application_at': post.first_application_at or application_stats['first_application_at'],
         'last_viewed_at': post.last_viewed_at,
     }
 
 
 def update_post_view(post_id, user_id=None):
-    """İlan görüntüleme sayısını artır"""
-    post = TevkilPost.query.get(post_id)
-    if post:
-        post.view_count = (post.view_count or 0) + 1
-        post.last_viewed_at = datetime.now(timezone.utc)
-        
-        # Eski views alanını da güncelle (backward compatibility)
-        post.views = post.view_count
-        
-        db.session.commit()
-        return True
-    return False
+    """
+    İlan görüntüleme sayısını artır
+    
+    Artış write-behind tampona yazılır (view_counter); view_count, views ve
+    last_viewed_at arka planda toplu UPDATE ile güncellenir.
+    """
+    viewer_key = f'user:{user_id}' if user_id else f'ip:{request.remote_addr}'
+    unique_viewers.track_post_view(post_id, viewer_key)
+    return view_counter.record_view(post_id, viewer_key)
 
 # ============================================
 # NOTIFICATIONS ROUTES
@@ -1684,16 +1759,11 @@ def mark_notifications_read():
 @login_required
 def chat():
     """Modern chat ana sayfası - WhatsApp tarzı"""
-    # Kullanıcının tüm conversation'larını al, son mesaja göre sırala
-    user_convs = db.session.query(Conversation).filter(
-        or_(
-            Conversation.user1_id == current_user.id,
-            Conversation.user2_id == current_user.id
-        )
-    ).order_by(Conversation.last_message_at.desc()).all()
+    # Kullanıcının conversation listesi (tek sorgu, cache'li), son mesaja göre sıralı
+    user_convs = get_conversation_list(current_user.id)
     
-    # Toplam okunmamış mesaj sayısı
-    total_unread = sum(conv.get_unread_count(current_user.id) for conv in user_convs)
+    # Toplam okunmamış mesaj sayısı (kullanıcı sayacı)
+    total_unread = current_user.unread_messages_count or 0
     
     # Bugünün tarihi (template için)
     today = datetime.now(timezone.utc).date()
@@ -1726,24 +1796,17 @@ def chat_conversation(conversation_id):
     
     db.session.commit()
     
-    # Tüm conversation'ları al (sidebar için)
-    user_convs = db.session.query(Conversation).filter(
-        or_(
-            Conversation.user1_id == current_user.id,
-            Conversation.user2_id == current_user.id
-        )
-    ).order_by(Conversation.last_message_at.desc()).all()
+    # Conversation listesi (sidebar için)
+    user_convs = get_conversation_list(current_user.id)
     
-    # Bu conversation'ın mesajlarını al
-    messages = Message.query.filter_by(
-        conversation_id=conversation_id
-    ).order_by(Message.created_at.asc()).all()
+    # Son mesaj sayfası - daha eskiler /chat/<id>/messages?before=<id> ile yüklenir
+    messages, has_more = chat_history.get_history_page(conversation_id)
     
     # Karşı tarafı al
     other_user = conversation.get_other_user(current_user.id)
     
     # Toplam okunmamış
-    total_unread = sum(conv.get_unread_count(current_user.id) for conv in user_convs)
+    total_unread = current_user.unread_messages_count or 0
     
     # Bugünün tarihi
     today = datetime.now(timezone.utc).date()
@@ -1752,6 +1815,7 @@ def chat_conversation(conversation_id):
                          conversations=user_convs,
                          active_conversation=conversation,
                          messages=messages,
+                         has_more_messages=has_more,
                          other_user=other_user,
                          total_unread=total_unread,
                          today=today)
@@ -1780,6 +1844,23 @@ def start_chat(user_id):
     
     return redirect(url_for('chat_conversation', conversation_id=conversation.id))
 
+def notify_new_message(conversation_id, message_text):
+    """Alıcıya 'Yeni Mesaj' bildirimi - HTTP ve Socket.IO gönderim yolları ortak"""
+    try:
+        create_notification(
+            user_id=chat_history.get_other_participant(conversation_id, current_user.id),
+            notification_type='new_message',
+            title='💬 Yeni Mesaj',
+            message=f'{current_user.full_name}: {message_text[:50]}...',
+            related_user_id=current_user.id,
+            action_url=url_for('chat_conversation', conversation_id=conversation_id),
+            action_text='Mesajı Görüntüle',
+            priority='normal'
+        )
+    except Exception as e:
+        # Bildirim hatası mesaj göndermeyi engellemez
+        print(f"Notification error: {e}")
+
 @app.route('/chat/send', methods=['POST'])
 @login_required
 @limiter.limit("100 per minute")  # Chat için yüksek limit
@@ -1791,78 +1872,18 @@ def send_chat_message():
         message_text = data.get('message', '').strip()
         reply_to_id = data.get('reply_to_id')
         
-        if not message_text:
-            return jsonify({'success': False, 'error': 'Mesaj boş olamaz'}), 400
-        
-        # Conversation kontrolü
-        conversation = Conversation.query.get_or_404(conversation_id)
-        
-        if current_user.id not in [conversation.user1_id, conversation.user2_id]:
-            return jsonify({'success': False, 'error': 'Yetkiniz yok'}), 403
-        
-        # Yeni mesaj oluştur
-        message = Message(
-            conversation_id=conversation_id,
-            sender_id=current_user.id,
-            message=message_text,
-            reply_to_id=reply_to_id,
-            delivered_at=datetime.now(timezone.utc)
-        )
-        
-        # DEPRECATED alanları doldur (eski sistem uyumluluğu)
-        other_user = conversation.get_other_user(current_user.id)
-        message.receiver_id = other_user.id
-        message.post_id = conversation.post_id
-        
-        db.session.add(message)
-        
-        # Conversation'ı güncelle
-        conversation.last_message_at = datetime.now(timezone.utc)
-        conversation.last_message_text = message_text[:100]
-        conversation.last_message_sender_id = current_user.id
-        
-        # Karşı tarafın okunmamış sayısını artır
-        if current_user.id == conversation.user1_id:
-            conversation.unread_count_user2 += 1
-        else:
-            conversation.unread_count_user1 += 1
-        
-        db.session.commit()
-        
-        # ⚡ SOCKET.IO REAL-TIME EMIT - Mesajı anında gönder
-        socketio.emit('new_message', {
-            'conversation_id': conversation_id,
-            'message': {
-                'id': message.id,
-                'sender_id': current_user.id,
-                'sender_name': current_user.full_name,
-                'sender_avatar': current_user.profile_photo or '/static/default-avatar.png',
-                'message': message_text,
-                'created_at': message.created_at.strftime('%H:%M'),
-                'is_mine': False  # Frontend'de dinamik olarak ayarlanacak
-            }
-        }, room=f'conversation_{conversation_id}')
-        
-        # Bildirim gönder (asenkron - UI'ı bloklamaz)
+        # Doğrulama + kayıt + sayaçlar + Socket.IO yayını tek serviste
         try:
-            create_notification(
-                user_id=other_user.id,
-                notification_type='new_message',
-                title='💬 Yeni Mesaj',
-                message=f'{current_user.full_name}: {message_text[:50]}...',
-                related_user_id=current_user.id,
-                action_url=url_for('chat_conversation', conversation_id=conversation_id),
-                action_text='Mesajı Görüntüle',
-                priority='normal'
-            )
-        except Exception as e:
-            # Bildirim hatası mesaj göndermeyi engellemez
-            print(f"Notification error: {e}")
+            message = persist_message(conversation_id, current_user, message_text, reply_to_id=reply_to_id)
+        except MessageError as e:
+            return jsonify({'success': False, 'error': str(e)}), e.status
+        
+        notify_new_message(conversation_id, message_text)
         
         return jsonify({
             'success': True,
-            'message_id': message.id,
-            'created_at': message.created_at.strftime('%H:%M'),
+            'message_id': message['id'],
+            'created_at': message['created_at'],
             'sender_name': current_user.full_name
         })
         
@@ -1883,34 +1904,62 @@ def get_new_messages(conversation_id):
     # Son mesaj ID'sini al
     since_id = request.args.get('since_id', type=int, default=0)
     
-    # Yeni mesajları getir
-    new_messages = Message.query.filter(
-        Message.conversation_id == conversation_id,
-        Message.id > since_id
-    ).order_by(Message.created_at.asc()).all()
+    # Yeni mesajlar - okundu işareti yalnızca teslim edilen okunmamış mesaj varsa yazılır
+    messages = chat_history.deliver_new_messages(conversation, current_user.id, since_id)
     
-    # Karşı taraftan gelen mesajları okundu işaretle
-    for msg in new_messages:
-        if msg.sender_id != current_user.id and not msg.read_at:
-            msg.read_at = datetime.now(timezone.utc)
+    return jsonify({'success': True, 'messages': messages})
+
+@app.route('/chat/<int:conversation_id>/poll', methods=['GET'])
+@login_required
+@limiter.limit("120 per minute")
+def poll_messages(conversation_id):
+    """Long-poll: since_id'den yeni mesaj gelene kadar (en fazla timeout saniye) bekle"""
+    participants = chat_history.get_participants(conversation_id)
+    if not participants:
+        return jsonify({'success': False, 'error': 'Sohbet bulunamadı'}), 404
     
-    # Okunmamış sayısını güncelle
-    conversation.mark_as_read(current_user.id)
-    db.session.commit()
+    user_id = current_user.id
+    if user_id not in participants:
+        return jsonify({'success': False, 'error': 'Yetkiniz yok'}), 403
+    
+    since_id = request.args.get('since_id', type=int, default=0)
+    timeout = min(max(request.args.get('timeout', type=float, default=message_bus.max_wait), 0), message_bus.max_wait)
+    
+    def load_latest():
+        latest = chat_history.latest_message_id(conversation_id)
+        db.session.close()
+        return latest
     
+    # Beklerken veritabanı bağlantısı havuza geri verilir - boştaki istemci sorgu çalıştırmaz
+    db.session.close()
+    if not message_bus.wait(conversation_id, since_id, timeout, load_latest):
+        return jsonify({'success': True, 'messages': [], 'last_id': since_id})
+    
+    conversation = db.session.get(Conversation, conversation_id)
+    messages = chat_history.deliver_new_messages(conversation, user_id, since_id)
     return jsonify({
         'success': True,
-        'messages': [{
-            'id': msg.id,
-            'sender_id': msg.sender_id,
-            'sender_name': msg.sender.full_name,
-            'message': msg.message,
-            'created_at': msg.created_at.strftime('%H:%M'),
-            'is_mine': msg.sender_id == current_user.id,
-            'read_at': msg.read_at.strftime('%H:%M') if msg.read_at else None
-        } for msg in new_messages]
+        'messages': messages,
+        'last_id': messages[-1]['id'] if messages else since_id
     })
 
+@app.route('/chat/<int:conversation_id>/messages', methods=['GET'])
+@login_required
+@limiter.limit("200 per minute")
+def get_message_history(conversation_id):
+    """Eski mesaj sayfası (yukarı kaydırınca lazy loading)"""
+    conversation = Conversation.query.get_or_404(conversation_id)
+    
+    if current_user.id not in [conversation.user1_id, conversation.user2_id]:
+        return jsonify({'success': False, 'error': 'Yetkiniz yok'}), 403
+    
+    page = chat_history.history_page(
+        conversation_id, current_user.id,
+        before_id=request.args.get('before', type=int),
+        limit=request.args.get('limit', type=int)
+    )
+    return jsonify({'success': True, **page})
+
 @app.route('/chat/typing', methods=['POST'])
 @login_required
 def chat_typing_indicator():
@@ -1939,9 +1988,8 @@ def upload_chat_file():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'Dosya seçilmedi'}), 400
         
-        # Conversation kontrolü
-        conversation = Conversation.query.get_or_404(conversation_id)
-        if current_user.id not in [conversation.user1_id, conversation.user2_id]:
+        # Üyelik kontrolü (dosya diske yazılmadan önce)
+        if chat_history.get_other_participant(conversation_id, current_user.id) is None:
             return jsonify({'success': False, 'error': 'Yetkisiz erişim'}), 403
         
         # Dosya uzantısı kontrolü
@@ -1980,60 +2028,29 @@ def upload_chat_file():
         if file_ext in {'png', 'jpg', 'jpeg', 'gif'}:
             message_type = 'image'
         
-        # Mesaj oluştur
-        other_user = conversation.get_other_user(current_user.id)
-        message = Message(
-            conversation_id=conversation_id,
-            sender_id=current_user.id,
-            receiver_id=other_user.id,
-            message=message_text or f"📎 {filename}",
-            message_type=message_type,
-            file_name=filename,
-            file_size=file_size,
-            file_url=file_url,
-            file_type=file.content_type
-        )
-        
-        db.session.add(message)
-        
-        # Conversation güncelle
-        conversation.last_message_at = datetime.now(timezone.utc)
-        if other_user.id == conversation.user1_id:
-            conversation.unread_count_user1 += 1
-        else:
-            conversation.unread_count_user2 += 1
-        
-        db.session.commit()
-        
-        # Socket.IO ile bildirim gönder
-        socketio.emit('new_message', {
-            'conversation_id': conversation_id,
-            'message': {
-                'id': message.id,
-                'sender_id': current_user.id,
-                'message': message.message,
+        # Mesaj oluştur (kayıt + sayaçlar + Socket.IO yayını)
+        try:
+            message = persist_message(conversation_id, current_user, message_text or f"📎 {filename}", attachment={
                 'message_type': message_type,
                 'file_name': filename,
                 'file_size': file_size,
                 'file_url': file_url,
-                'created_at': message.created_at.strftime('%H:%M'),
-                'is_mine': False
-            }
-        }, room=f'user_{other_user.id}')
-        
+                'file_type': file.content_type
+            })
+        except MessagePending as e:
+            # Yazım sürüyor - mesaj dosyaya referansla kaydedilebilir, dosya silinmez
+            return jsonify({'success': False, 'pending': True, 'error': str(e)}), e.status
+        except MessageError as e:
+            # Mesaj kaydedilmedi - diske yazılan dosya sahipsiz kalmasın
+            os.remove(file_path)
+            return jsonify({'success': False, 'error': str(e)}), e.status
+        except Exception:
+            os.remove(file_path)
+            raise
+
         return jsonify({
             'success': True,
-            'message': {
-                'id': message.id,
-                'sender_id': current_user.id,
-                'message': message.message,
-                'message_type': message_type,
-                'file_name': filename,
-                'file_size': file_size,
-                'file_url': file_url,
-                'created_at': message.created_at.strftime('%H:%M'),
-                'is_mine': True
-            }
+            'message': {**message, 'is_mine': True}
         })
         
     except Exception as e:
@@ -2069,11 +2086,8 @@ def mark_message_read(message_id):
         # Conversation'daki unread count'u azalt
         if message.conversation_id:
             conv = Conversation.query.get(message.conversation_id)
-            if conv:
-                if current_user.id == conv.user1_id and conv.unread_count_user1 > 0:
-                    conv.unread_count_user1 -= 1
-                elif current_user.id == conv.user2_id and conv.unread_count_user2 > 0:
-                    conv.unread_count_user2 -= 1
+            if conv and current_user.id in (conv.user1_id, conv.user2_id):
+                conv.increment_unread(current_user.id, -1)
         
         db.session.commit()
     
@@ -2116,16 +2130,49 @@ def toggle_favorite(post_id):
 
 @app.route('/api/posts', methods=['GET'])
 def api_posts():
-    """API: İlan listesi"""
-    posts = TevkilPost.query.filter_by(status='active').order_by(TevkilPost.created_at.desc()).limit(20).all()
-    return jsonify([{
-        'id': p.id,
-        'title': p.title,
-        'category': p.category,
-        'location': p.location,
-        'urgency': p.urgency_level,
-        'created_at': p.created_at.isoformat()
-    } for p in posts])
+    """API: İlan listesi (cursor ile sayfalı, lat/lng/radius_km ile yakınımdakiler)"""
+    args = request.args.copy()
+    args.pop('filter', None)  # API sadece genel aktif ilan listesini döndürür
+    posts, next_cursor = paginate_posts(args)
+    facets = facet_service.get_facet_counts('active', facet_service.selected_facets(request.args))
+    
+    return jsonify({
+        'posts': [{
+            'id': p.id,
+            'title': p.title,
+            'category': p.category,
+            'location': p.location,
+            'urgency': p.urgency_level,
+            'created_at': p.created_at.isoformat(),
+            'distance_km': getattr(p, 'distance_km', None)
+        } for p in posts],
+        'next_cursor': next_cursor,
+        'facets': facets
+    })
+
+@app.route('/api/admin/view-metrics', methods=['GET'])
+@login_required
+def api_view_metrics():
+    """API: Görüntülenme sayacı tampon ve flush gecikmesi metrikleri (admin)"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Yetkisiz erişim'}), 403
+    return jsonify(view_counter.get_metrics())
+
+@app.route('/api/admin/fragment-metrics', methods=['GET'])
+@login_required
+def api_fragment_metrics():
+    """API: Fragment cache parça başına hit/miss metrikleri (admin)"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Yetkisiz erişim'}), 403
+    return jsonify(fragment_cache.get_metrics())
+
+@app.route('/api/admin/cache-metrics', methods=['GET'])
+@login_required
+def api_cache_metrics():
+    """API: İki katmanlı cache (L1/L2, single-flight, erken yenileme) metrikleri (admin)"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Yetkisiz erişim'}), 403
+    return jsonify(tiered_cache.get_metrics())
 
 @app.route('/api/courthouses/<city>', methods=['GET'])
 def api_courthouses(city):
@@ -2316,6 +2363,10 @@ def whatsapp_test():
 def init_db():
     """Initialize the database"""
     db.create_all()
+    migrations.run_migrations()
+    search_service.ensure_search_index()
+    facet_service.rebuild_facet_counts()
+    map_service.rebuild_clusters()
     print('Database initialized!')
 
 # ============================================================
@@ -2570,24 +2621,28 @@ def security_logs():
 # WEBSOCKET EVENTS (Real-time Chat)
 # ============================================================
 
-# Store active users {user_id: sid}
-active_users = {}
-# Store typing status {conversation_id: {user_id: timestamp}}
-typing_users = {}
+def _user_room(user_id):
+    """Kullanıcının tüm bağlantılarını (sekme/cihaz/worker) kapsayan oda"""
+    return f'user_{user_id}'
 
 @socketio.on('connect')
 def handle_connect():
     """Handle WebSocket connection"""
     if current_user.is_authenticated:
-        active_users[current_user.id] = request.sid
+        came_online = presence.connect(current_user.id, request.sid)
+        join_room(_user_room(current_user.id))
+        
+        # Socket oturumu: sık olaylar (typing) kullanıcıyı ve sohbet üyeliğini buradan okur
+        session['socket_user'] = {'id': current_user.id, 'full_name': current_user.full_name}
+        session['socket_conversations'] = set()
         print(f'✅ WebSocket: User {current_user.id} ({current_user.full_name}) connected')
         
-        # Notify others that user is online
-        emit('user_status', {
-            'user_id': current_user.id,
-            'status': 'online',
-            'full_name': current_user.full_name
-        }, broadcast=True)
+        # İstemci bağlantısını bu aralıkla yeniler (TTL dolmadan)
+        emit('presence_config', {'heartbeat_interval': presence.ttl / 3})
+        
+        # Abonelere bildir (yalnızca ilk bağlantıda, debounce ile)
+        if came_online:
+            presence.announce(current_user.id, current_user.full_name)
     else:
         print('❌ WebSocket: Unauthenticated connection attempt')
 
@@ -2595,21 +2650,23 @@ def handle_connect():
 def handle_disconnect():
     """Handle WebSocket disconnection"""
     if current_user.is_authenticated:
-        if current_user.id in active_users:
-            del active_users[current_user.id]
+        went_offline = presence.disconnect(current_user.id, request.sid)
         
         print(f'👋 WebSocket: User {current_user.id} disconnected')
         
-        # Notify others that user is offline
-        emit('user_status', {
-            'user_id': current_user.id,
-            'status': 'offline',
-            'full_name': current_user.full_name
-        }, broadcast=True)
+        # Abonelere bildir (son bağlantı da kapandıysa, debounce ile)
+        if went_offline:
+            presence.announce(current_user.id, current_user.full_name)
+
+@socketio.on('presence_heartbeat')
+def handle_presence_heartbeat():
+    """Bağlantının çevrimiçi kaydını yenile"""
+    if current_user.is_authenticated:
+        presence.heartbeat(current_user.id, request.sid)
 
 @socketio.on('join_conversation')
 def handle_join_conversation(data):
-    """Join a conversation room"""
+    """Join a conversation room - ack olarak son mesaj sayfasını döndürür"""
     conversation_id = data.get('conversation_id')
     if not conversation_id:
         return
@@ -2627,14 +2684,16 @@ def handle_join_conversation(data):
     # Join the room
     room = f'conversation_{conversation_id}'
     join_room(room)
+    session.setdefault('socket_conversations', set()).add(conversation_id)
     print(f'📥 User {current_user.id} joined conversation {conversation_id}')
     
     # Mark messages as read
-    Message.query.filter_by(
-        conversation_id=conversation_id,
-        receiver_id=current_user.id,
-        is_read=False
-    ).update({'is_read': True, 'read_at': datetime.now(timezone.utc)})
+    Message.query.filter(
+        Message.conversation_id == conversation_id,
+        Message.sender_id != current_user.id,
+        Message.read_at.is_(None)
+    ).update({'read_at': datetime.now(timezone.utc)})
+    conversation.mark_as_read(current_user.id)
     db.session.commit()
     
     # Notify about read status
@@ -2642,6 +2701,9 @@ def handle_join_conversation(data):
         'conversation_id': conversation_id,
         'user_id': current_user.id
     }, room=room)
+    
+    # HTTP geçmiş endpoint'i ile aynı sayfa yapısı
+    return chat_history.history_page(conversation_id, current_user.id)
 
 @socketio.on('leave_conversation')
 def handle_leave_conversation(data):
@@ -2656,116 +2718,68 @@ def handle_leave_conversation(data):
 
 @socketio.on('send_message')
 def handle_send_message(data):
-    """Handle sending a new message"""
-    conversation_id = data.get('conversation_id')
-    content = data.get('content', '').strip()
-    
-    if not conversation_id or not content:
-        emit('error', {'message': 'Invalid message data'})
-        return
-    
-    # Verify conversation access
-    conversation = Conversation.query.get(conversation_id)
-    if not conversation:
-        emit('error', {'message': 'Conversation not found'})
-        return
-    
-    if current_user.id not in [conversation.user1_id, conversation.user2_id]:
-        emit('error', {'message': 'Unauthorized'})
-        return
-    
-    # Determine receiver
-    receiver_id = conversation.user2_id if current_user.id == conversation.user1_id else conversation.user1_id
-    
-    # Create message
-    message = Message(
-        conversation_id=conversation_id,
-        sender_id=current_user.id,
-        receiver_id=receiver_id,
-        content=content,
-        is_read=False
-    )
-    db.session.add(message)
-    
-    # Update conversation
-    conversation.last_message_at = datetime.now(timezone.utc)
-    conversation.last_message = content[:100]
-    
-    db.session.commit()
-    
-    # Prepare message data
-    message_data = {
-        'id': message.id,
-        'conversation_id': conversation_id,
-        'sender_id': current_user.id,
-        'sender_name': current_user.full_name,
-        'receiver_id': receiver_id,
-        'content': content,
-        'timestamp': message.created_at.strftime('%H:%M'),
-        'created_at': message.created_at.isoformat(),
-        'is_read': False
-    }
-    
-    # Send to conversation room
-    room = f'conversation_{conversation_id}'
-    emit('new_message', message_data, room=room)
+    """Handle sending a new message - ack: {'success', 'message'} veya {'success': False, 'error'}"""
+    if not current_user.is_authenticated:
+        return {'success': False, 'error': 'Unauthorized'}
     
-    # Send notification to receiver if online but not in room
-    if receiver_id in active_users:
-        emit('new_message_notification', {
-            'conversation_id': conversation_id,
-            'sender_name': current_user.full_name,
-            'preview': content[:50]
-        }, room=active_users[receiver_id])
+    conversation_id = data.get('conversation_id')
+    try:
+        message = persist_message(conversation_id, current_user, data.get('message', ''),
+                                  reply_to_id=data.get('reply_to_id'))
+    except MessageError as e:
+        emit('error', {'message': str(e)})
+        return {'success': False, 'error': str(e)}
     
-    print(f'📨 Message sent: {current_user.id} → {receiver_id} in conversation {conversation_id}')
+    notify_new_message(int(conversation_id), message['message'])
+    print(f'📨 Message sent: {current_user.id} in conversation {conversation_id}')
+    return {'success': True, 'message': {**message, 'is_mine': True}}
 
 @socketio.on('typing')
 def handle_typing(data):
-    """Handle typing indicator"""
+    """Handle typing indicator - veritabanına gitmez, yayınlar birleştirilir"""
+    socket_user = session.get('socket_user')
     conversation_id = data.get('conversation_id')
-    is_typing = data.get('is_typing', False)
-    
-    if not conversation_id:
+    if not socket_user or not conversation_id:
         return
     
-    # Verify conversation access
-    conversation = Conversation.query.get(conversation_id)
-    if not conversation or current_user.id not in [conversation.user1_id, conversation.user2_id]:
-        return
+    # Sohbet üyeliği socket oturumunda tutulur (katılımcılar cache'li, ilk olayda bir kez)
+    conversations = session.setdefault('socket_conversations', set())
+    if conversation_id not in conversations:
+        if socket_user['id'] not in chat_history.get_participants(conversation_id):
+            return
+        conversations.add(conversation_id)
     
-    room = f'conversation_{conversation_id}'
-    
-    # Update typing status
-    if conversation_id not in typing_users:
-        typing_users[conversation_id] = {}
-    
-    if is_typing:
-        typing_users[conversation_id][current_user.id] = datetime.now()
-    elif current_user.id in typing_users[conversation_id]:
-        del typing_users[conversation_id][current_user.id]
+    is_typing = bool(data.get('is_typing', False))
+    if not typing_state.update(conversation_id, socket_user['id'], socket_user['full_name'], is_typing):
+        return
     
     # Broadcast typing status to room (except sender)
     emit('user_typing', {
-        'user_id': current_user.id,
-        'user_name': current_user.full_name,
+        'conversation_id': conversation_id,
+        'user_id': socket_user['id'],
+        'user_name': socket_user['full_name'],
         'is_typing': is_typing
-    }, room=room, skip_sid=request.sid)
+    }, room=f'conversation_{conversation_id}', skip_sid=request.sid)
 
 @socketio.on('mark_as_read')
 def handle_mark_as_read(data):
     """Mark messages as read"""
     conversation_id = data.get('conversation_id')
     
-    if not conversation_id:
+    if not conversation_id or not current_user.is_authenticated:
         return
     
-    # Mark all messages from other user as read
-    Message.query.filter_by(
-        conversation_id=conversation_id,
-        receiver_id=current_user.id,
-        is_read=False
-    ).update({'is_read': True, 'read_at': datetime.now(timezone.utc)})
+    conversation = db.session.get(Conversation, conversation_id)
+    if not conversation or current_user.id not in [conversation.user1_id, conversation.user2_id]:
+        return
+    
+    # Mark all messages from other user as read (+ okunmamış sayaçlarını sıfırla)
+    Message.query.filter(
+        Message.conversation_id == conversation_id,
+        Message.sender_id != current_user.id,
+        Message.read_at.is_(None)
+    ).update({'read_at': datetime.now(timezone.utc)})
+    conversation.mark_as_read(current_user.id)
     db.session.commit()
     
     room = f'conversation_{conversation_id}'
@@ -2774,19 +2788,42 @@ def handle_mark_as_read(data):
         'user_id': current_user.id
     }, room=room)
 
+def _parse_user_ids(values, limit=100):
+    user_ids = []
+    for user_id in (values or [])[:limit]:
+        try:
+            user_ids.append(int(user_id))
+        except (TypeError, ValueError):
+            continue
+    return user_ids
+
+@socketio.on('subscribe_presence')
+def handle_subscribe_presence(data):
+    """Sohbet ortaklarının durum değişikliklerine abone ol - ack: {user_id: çevrimiçi_mi}"""
+    if not current_user.is_authenticated:
+        return {}
+    
+    partners = {conv['other_user_id'] for conv in get_conversation_list(current_user.id)}
+    user_ids = [user_id for user_id in _parse_user_ids(data.get('user_ids')) if user_id in partners]
+    for user_id in user_ids:
+        join_room(presence_room(user_id))
+    return presence.online_status(user_ids)
+
+@socketio.on('unsubscribe_presence')
+def handle_unsubscribe_presence(data):
+    """Durum aboneliğini bırak"""
+    for user_id in _parse_user_ids(data.get('user_ids')):
+        leave_room(presence_room(user_id))
+
 @socketio.on('request_online_status')
 def handle_online_status_request(data):
     """Return online status of users"""
-    user_ids = data.get('user_ids', [])
-    
-    online_status = {}
-    for user_id in user_ids:
-        online_status[user_id] = user_id in active_users
-    
-    emit('online_status_response', online_status)
+    # Tek toplu sorgu (Redis'te tek pipeline)
+    emit('online_status_response', presence.online_status(_parse_user_ids(data.get('user_ids'))))
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        migrations.run_migrations()
     # Use socketio.run instead of app.run
     socketio.run(app, host='0.0.0.0', port=5000, debug=True)
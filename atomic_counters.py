@@ -0,0 +1,80 @@
+"""
+Atomic Counters - Sunucu tarafında atomik sayaç artırımı
+`obj.sayac += 1` okuma-değiştirme-yazma yapar: aynı satırı eşzamanlı güncelleyen
+worker'lardan biri diğerinin artışını ezer. Bu modül artışları session'da biriktirir
+ve flush/commit sırasında satır başına tek `UPDATE ... SET c = c + :n` ile uygular.
+
+Kullanım:
+    increment(conversation, 'unread_count_user2')      # +1
+    increment(conversation, 'unread_count_user1', -1)  # -1 (0'ın altına inmez)
+    db.session.commit()
+
+Aynı satırın aynı flush içindeki artışları tek UPDATE'te birleşir. Uygulandıktan sonra
+ilgili attribute expire edilir; sonraki okuma güncel değeri veritabanından alır.
+"""
+from sqlalchemy import event, func, case, and_, inspect as sa_inspect
+from sqlalchemy.orm import Session
+from commit_hooks import discard_on_rollback
+
+PENDING_KEY = 'pending_counter_increments'
+
+
+def increment_values(table, columns):
+    """
+    {kolon: fark} -> atomik UPDATE değerleri
+
+    Sayaçlar negatife düşmez: `c = max(coalesce(c, 0) + n, 0)` (taşınabilir CASE ile).
+    """
+    values = {}
+    for column, amount in columns.items():
+        value = func.coalesce(table.c[column], 0) + amount
+        values[column] = value if amount >= 0 else case((value < 0, 0), else_=value)
+    return values
+
+
+def apply_increments(connection, table, whereclause, columns):
+    """Verilen satır(lar)a sayaç farklarını tek atomik UPDATE ile uygula"""
+    columns = {column: amount for column, amount in columns.items() if amount}
+    if columns:
+        connection.execute(table.update().where(whereclause).values(increment_values(table, columns)))
+
+
+def increment(obj, column, amount=1):
+    """
+    ORM nesnesinin sayaç kolonunu atomik olarak artır (negatif = azalt)
+
+    Henüz INSERT edilmemiş nesnelerde değer doğrudan attribute'a yazılır.
+    """
+    state = sa_inspect(obj)
+    if not state.persistent:
+        setattr(obj, column, max((getattr(obj, column) or 0) + amount, 0))
+        return
+    pending = state.session.info.setdefault(PENDING_KEY, {})
+    _, columns = pending.setdefault((state.mapper, state.identity), (obj, {}))
+    columns[column] = columns.get(column, 0) + amount
+
+
+def apply_pending(session):
+    """Session'da biriken artışları veritabanına yaz"""
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    connection = session.connection()
+    for (mapper, identity), (obj, columns) in pending.items():
+        whereclause = and_(*[pk == value for pk, value in zip(mapper.primary_key, identity)])
+        apply_increments(connection, mapper.local_table, whereclause, columns)
+        session.expire(obj, list(columns))
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_after_flush(session, flush_context):
+    apply_pending(session)
+
+
+@event.listens_for(Session, 'before_commit')
+def _apply_before_commit(session):
+    # Başka değişiklik yoksa flush hiç çalışmaz - bekleyen artışlar commit'ten önce yazılır
+    apply_pending(session)
+
+
+discard_on_rollback(PENDING_KEY)
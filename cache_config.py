@@ -1,12 +1,299 @@
 """
 Flask-Caching Configuration
 Redis cache layer for scalability
+
+İki katmanlı cache (tiered_cache): Redis varsa önünde süreç içi sınırlı bir LRU (L1)
+bulunur; sık okunan anahtarlar ağa gitmeden döner. Diğer worker'lardaki L1 kopyaları
+Redis pub/sub ile geçersizleştirilir. Pahalı anahtarlar için get_or_set:
+    - single-flight: aynı anahtarı aynı anda tek bir thread/worker hesaplar,
+      diğerleri eski değeri alır ya da kısa süre bekler
+    - erken olasılıksal yenileme (XFetch): süre dolmadan, hesaplama süresiyle
+      orantılı bir olasılıkla tek bir istek değeri önceden yeniler
+Redis yoksa (geliştirme) SimpleCache zaten süreç içidir: L1 ve pub/sub devre dışı,
+single-flight ve erken yenileme aynen çalışır.
+
+Ayarlar (app.config / env):
+    CACHE_L1_MAX_ITEMS : L1'deki azami anahtar sayısı
+    CACHE_L1_TTL       : Bir anahtarın L1'de kalma süresi, saniye (pub/sub kaçırılırsa üst sınır)
+    CACHE_EARLY_BETA   : Erken yenileme katsayısı (0 = kapalı, 1 = önerilen)
 """
+import os
+import json
+import math
+import time
+import random
+import threading
+import uuid
+from collections import OrderedDict
 from flask_caching import Cache
 
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis opsiyonel
+    redis = None
+
 # Cache initialization
 cache = Cache()
 
+DEFAULT_L1_MAX_ITEMS = 1000
+DEFAULT_L1_TTL = 30
+DEFAULT_EARLY_BETA = 1.0
+INVALIDATION_CHANNEL = 'tevkil_cache_invalidate'
+LOCK_TIMEOUT = 30        # Worker'lar arası hesaplama kilidinin azami süresi, saniye
+LOCK_WAIT_SECONDS = 5    # Değer yokken başka worker'ın hesaplamasını bekleme süresi
+
+
+class TieredCache:
+    """Süreç içi LRU (L1) + Flask-Caching (L2) ve single-flight hesaplama"""
+
+    def __init__(self):
+        self.l1_enabled = False
+        self.l1_max_items = DEFAULT_L1_MAX_ITEMS
+        self.l1_ttl = DEFAULT_L1_TTL
+        self.beta = DEFAULT_EARLY_BETA
+        self.redis = None
+        self.origin = uuid.uuid4().hex
+        self._l1 = OrderedDict()
+        self._l1_lock = threading.Lock()
+        self._flights = {}  # anahtar -> (Lock, kullanan thread sayısı)
+        self._flights_lock = threading.Lock()
+        self._listener = None
+        self._metrics = {
+            'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'early_refreshes': 0,
+            'recomputes': 0, 'stale_served': 0, 'waited': 0, 'invalidations_received': 0,
+        }
+
+    def init_app(self, app, redis_url=None):
+        self.l1_max_items = int(app.config.get('CACHE_L1_MAX_ITEMS', os.getenv('CACHE_L1_MAX_ITEMS', DEFAULT_L1_MAX_ITEMS)))
+        self.l1_ttl = float(app.config.get('CACHE_L1_TTL', os.getenv('CACHE_L1_TTL', DEFAULT_L1_TTL)))
+        self.beta = float(app.config.get('CACHE_EARLY_BETA', os.getenv('CACHE_EARLY_BETA', DEFAULT_EARLY_BETA)))
+        if redis_url and redis is not None:
+            self.redis = redis.from_url(redis_url)
+            self.l1_enabled = self.l1_max_items > 0 and self.l1_ttl > 0
+
+    # ----- L1 (süreç içi LRU) -----
+
+    def _l1_get(self, key):
+        if not self.l1_enabled:
+            return None
+        with self._l1_lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            envelope, l1_expires = entry
+            if time.monotonic() >= l1_expires:
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return envelope
+
+    def _l1_set(self, key, envelope):
+        if not self.l1_enabled:
+            return
+        self._ensure_listener()
+        ttl = self.l1_ttl
+        if envelope['expires'] is not None:
+            ttl = min(ttl, envelope['expires'] - time.time())
+        if ttl <= 0:
+            return
+        with self._l1_lock:
+            self._l1[key] = (envelope, time.monotonic() + ttl)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_items:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, key):
+        with self._l1_lock:
+            self._l1.pop(key, None)
+
+    # ----- Pub/sub geçersizleştirme -----
+
+    def _publish(self, key):
+        if self.redis is None:
+            return
+        try:
+            self.redis.publish(INVALIDATION_CHANNEL, json.dumps({'key': key, 'origin': self.origin}))
+        except redis.RedisError as e:
+            print(f'⚠️  Cache geçersizleştirme yayınlanamadı: {e}')
+
+    def _ensure_listener(self):
+        if self._listener is not None and self._listener.is_alive():
+            return
+        with self._l1_lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Bağlantı koptuysa arada kaçan mesajlar olabilir - L1 baştan doldurulur
+                self.clear_local()
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    payload = json.loads(message['data'])
+                    if payload.get('origin') != self.origin:
+                        self._l1_delete(payload['key'])
+                        self._metrics['invalidations_received'] += 1
+            except Exception as e:
+                print(f'⚠️  Cache geçersizleştirme dinleyicisi yeniden bağlanıyor: {e}')
+                time.sleep(1)
+
+    def clear_local(self):
+        with self._l1_lock:
+            self._l1.clear()
+
+    # ----- Okuma / yazma -----
+
+    def _get_envelope(self, key):
+        envelope = self._l1_get(key)
+        if envelope is not None:
+            self._metrics['l1_hits'] += 1
+            return envelope
+        envelope = cache.get(key)
+        if isinstance(envelope, dict) and envelope.get('tiered'):
+            self._metrics['l2_hits'] += 1
+            self._l1_set(key, envelope)
+            return envelope
+        return None
+
+    def get(self, key, default=None):
+        envelope = self._get_envelope(key)
+        return envelope['value'] if envelope is not None else default
+
+    def set(self, key, value, timeout=None, delta=0.0):
+        """
+        Değeri iki katmana yaz ve diğer worker'ların L1 kopyalarını düşür
+
+        Args:
+            timeout: Saniye (0 = süresiz)
+            delta: Değerin hesaplanma süresi (erken yenileme olasılığı için)
+        """
+        timeout = cache.cache.default_timeout if timeout is None else timeout
+        envelope = {
+            'tiered': True,
+            'value': value,
+            'expires': time.time() + timeout if timeout else None,
+            'delta': delta,
+        }
+        cache.set(key, envelope, timeout=timeout)
+        self._l1_set(key, envelope)
+        self._publish(key)
+
+    def delete(self, key):
+        cache.delete(key)
+        self._l1_delete(key)
+        self._publish(key)
+
+    def _refresh_early(self, envelope):
+        """XFetch: kalan süre azaldıkça ve hesaplama uzadıkça yenileme olasılığı artar"""
+        if envelope['expires'] is None or self.beta <= 0 or not envelope['delta']:
+            return False
+        return time.time() - envelope['delta'] * self.beta * math.log(random.random() or 1e-12) >= envelope['expires']
+
+    def get_or_set(self, key, builder, timeout=None):
+        """
+        Değeri cache'ten döndür; yoksa (veya erken yenileme sırası geldiyse) tek seferde hesapla
+
+        Args:
+            builder: Parametresiz hesaplama fonksiyonu
+        """
+        envelope = self._get_envelope(key)
+        if envelope is not None:
+            if not self._refresh_early(envelope):
+                return envelope['value']
+            self._metrics['early_refreshes'] += 1
+        else:
+            self._metrics['misses'] += 1
+        return self._recompute(key, builder, timeout, envelope)
+
+    def _join_flight(self, key):
+        # Kilit, onu bekleyen/tutan thread kalmayınca silinir (bkz. message_bus koşulları);
+        # erken silinirse yeni gelen ayrı bir kilitle ikinci bir hesaplama başlatırdı
+        with self._flights_lock:
+            lock, users = self._flights.get(key) or (threading.Lock(), 0)
+            self._flights[key] = (lock, users + 1)
+            return lock
+
+    def _leave_flight(self, key):
+        with self._flights_lock:
+            lock, users = self._flights[key]
+            if users <= 1:
+                del self._flights[key]
+            else:
+                self._flights[key] = (lock, users - 1)
+
+    def _recompute(self, key, builder, timeout, stale):
+        lock = self._join_flight(key)
+        try:
+            # Aynı süreçte hesaplama sürüyorsa: eski değer varsa hemen dön, yoksa kısa süre bekle
+            if stale is not None:
+                acquired = lock.acquire(blocking=False)
+            else:
+                acquired = lock.acquire(timeout=LOCK_WAIT_SECONDS)
+            if not acquired:
+                if stale is not None:
+                    self._metrics['stale_served'] += 1
+                    return stale['value']
+                return self._build(key, builder, timeout)
+            try:
+                if stale is None:
+                    # Beklerken başka thread doldurmuş olabilir
+                    envelope = self._get_envelope(key)
+                    if envelope is not None:
+                        return envelope['value']
+                return self._recompute_across_workers(key, builder, timeout, stale)
+            finally:
+                lock.release()
+        finally:
+            self._leave_flight(key)
+
+    def _recompute_across_workers(self, key, builder, timeout, stale):
+        lock_key = f'{key}:computing'
+        if not cache.add(lock_key, self.origin, timeout=LOCK_TIMEOUT):
+            if stale is not None:
+                self._metrics['stale_served'] += 1
+                return stale['value']
+            # Başka worker hesaplıyor: kısa süre sonucu bekle, gelmezse kendin hesapla
+            deadline = time.monotonic() + LOCK_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                envelope = cache.get(key)
+                if isinstance(envelope, dict) and envelope.get('tiered'):
+                    self._metrics['waited'] += 1
+                    self._l1_set(key, envelope)
+                    return envelope['value']
+            return self._build(key, builder, timeout)
+        try:
+            return self._build(key, builder, timeout)
+        finally:
+            cache.delete(lock_key)
+
+    def _build(self, key, builder, timeout):
+        started = time.perf_counter()
+        value = builder()
+        self._metrics['recomputes'] += 1
+        self.set(key, value, timeout, delta=time.perf_counter() - started)
+        return value
+
+    def get_metrics(self):
+        with self._l1_lock:
+            l1_size = len(self._l1)
+        return {
+            **self._metrics,
+            'l1_enabled': self.l1_enabled,
+            'l1_size': l1_size,
+            'l1_max_items': self.l1_max_items,
+            'pubsub': self.redis is not None,
+        }
+
+
+tiered_cache = TieredCache()
+
 def init_cache(app):
     """Initialize cache with app"""
     
@@ -32,6 +319,7 @@ def init_cache(app):
     
     cache.init_app(app, config=cache_config)
     app.cache = cache
+    tiered_cache.init_app(app, redis_url)
     
     return cache
 
@@ -0,0 +1,160 @@
+"""
+Chat History - Sayfalı sohbet geçmişi
+Sohbet açılırken yalnızca son N mesaj yüklenir; daha eskiler `before=<mesaj_id>`
+ile sayfa sayfa istenir. Sorgu (conversation_id, id) index'i üzerinde geriye doğru
+taranır - sayfa maliyeti sohbetin uzunluğundan bağımsızdır.
+
+Sayfa biçimi (HTTP endpoint'i ve Socket.IO join_conversation aynı yapıyı döndürür):
+    {'conversation_id', 'messages': [eskiden yeniye], 'has_more', 'next_before'}
+
+Yeni mesaj teslimi (long-poll ve eski polling endpoint'i) `deliver_new_messages` ile
+yapılır: okundu işareti yalnızca karşı taraftan okunmamış mesaj teslim edildiğinde yazılır.
+
+Ayarlar (app.config / env):
+    CHAT_HISTORY_PAGE_SIZE : Sayfa başına mesaj (varsayılan 50, en fazla 200)
+"""
+import os
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from models import db, Message, Conversation
+from cache_config import tiered_cache
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+PARTICIPANTS_CACHE_TIMEOUT = 3600  # Sohbet katılımcıları değişmez
+
+
+def page_size(requested=None):
+    """İstenen sayfa boyutunu ayar ve üst sınırla sınırla"""
+    default = int(current_app.config.get('CHAT_HISTORY_PAGE_SIZE', os.getenv('CHAT_HISTORY_PAGE_SIZE', DEFAULT_PAGE_SIZE)))
+    return max(1, min(requested or default, MAX_PAGE_SIZE))
+
+
+def _with_senders(query):
+    return query.options(
+        joinedload(Message.sender),
+        joinedload(Message.reply_to).joinedload(Message.sender),
+    )
+
+
+def get_history_page(conversation_id, before_id=None, limit=None):
+    """
+    Sohbetin `before_id`'den önceki son `limit` mesajı
+
+    Args:
+        conversation_id: Sohbet ID
+        before_id: Bu ID'den eski mesajlar (None = en yeniler)
+        limit: Sayfa boyutu
+
+    Returns:
+        tuple: (mesajlar - eskiden yeniye, daha_eski_var_mı)
+    """
+    limit = page_size(limit)
+    query = _with_senders(Message.query).filter(Message.conversation_id == conversation_id)
+    if before_id:
+        query = query.filter(Message.id < before_id)
+
+    # Bir fazla satır: sonraki sayfanın varlığını ayrı COUNT olmadan anla
+    rows = query.order_by(Message.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    return list(reversed(rows[:limit])), has_more
+
+
+def serialize_message(message, viewer_id=None):
+    """
+    Mesajı istemcinin addMessageToUI biçimine çevir
+
+    viewer_id verilmezse (odaya yayın) is_mine eklenmez - istemci sender_id'den hesaplar
+    """
+    data = {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'sender_name': message.sender.full_name if message.sender else None,
+        'message': message.message,
+        'message_type': message.message_type or 'text',
+        'created_at': message.created_at.strftime('%H:%M') if message.created_at else None,
+        'read_at': message.read_at.strftime('%H:%M') if message.read_at else None,
+    }
+    if viewer_id is not None:
+        data['is_mine'] = message.sender_id == viewer_id
+    if message.file_url:
+        data.update({
+            'file_name': message.file_name,
+            'file_size': message.file_size,
+            'file_url': message.file_url,
+            'file_type': message.file_type,
+        })
+    if message.reply_to is not None:
+        data['reply_to'] = {
+            'id': message.reply_to.id,
+            'sender_name': message.reply_to.sender.full_name if message.reply_to.sender else None,
+            'message': message.reply_to.message[:50],
+        }
+    return data
+
+
+def history_page(conversation_id, viewer_id, before_id=None, limit=None):
+    """Sayfayı JSON/Socket.IO yanıtı olarak döndür"""
+    messages, has_more = get_history_page(conversation_id, before_id, limit)
+    return {
+        'conversation_id': conversation_id,
+        'messages': [serialize_message(message, viewer_id) for message in messages],
+        'has_more': has_more,
+        'next_before': messages[0].id if messages and has_more else None,
+    }
+
+
+def get_participants(conversation_id):
+    """Sohbetin iki katılımcısının ID'leri (cache'li) - sohbet yoksa boş liste"""
+    def load():
+        row = db.session.query(Conversation.user1_id, Conversation.user2_id).filter(
+            Conversation.id == conversation_id
+        ).first()
+        return list(row) if row else []
+    return tiered_cache.get_or_set(
+        f'conversation_participants_{conversation_id}', load, timeout=PARTICIPANTS_CACHE_TIMEOUT
+    )
+
+
+def get_other_participant(conversation_id, user_id):
+    """Sohbetteki karşı kullanıcının ID'si (cache'li) - kullanıcı katılımcı değilse None"""
+    participants = get_participants(conversation_id)
+    if user_id not in participants:
+        return None
+    return participants[1] if user_id == participants[0] else participants[0]
+
+
+def latest_message_id(conversation_id):
+    """Sohbetin son mesaj ID'si (yoksa 0)"""
+    return db.session.query(func.max(Message.id)).filter(
+        Message.conversation_id == conversation_id
+    ).scalar() or 0
+
+
+def deliver_new_messages(conversation, viewer_id, since_id):
+    """
+    since_id'den sonraki mesajları teslim et
+
+    Karşı taraftan gelen okunmamış mesajlar okundu işaretlenir ve commit edilir;
+    teslim edilecek okunmamış mesaj yoksa hiçbir şey yazılmaz.
+
+    Returns:
+        list: Serileştirilmiş mesajlar (eskiden yeniye, en fazla MAX_PAGE_SIZE)
+    """
+    messages = _with_senders(Message.query).filter(
+        Message.conversation_id == conversation.id,
+        Message.id > since_id
+    ).order_by(Message.id.asc()).limit(MAX_PAGE_SIZE).all()
+
+    unread = [message for message in messages if message.sender_id != viewer_id and message.read_at is None]
+    now = datetime.now(timezone.utc)
+    for message in unread:
+        message.read_at = now
+    # Commit nesneleri expire eder - yanıt commit'ten önce hazırlanır
+    payload = [serialize_message(message, viewer_id) for message in messages]
+    if unread:
+        conversation.mark_as_read(viewer_id)
+        db.session.commit()
+    return payload
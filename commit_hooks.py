@@ -0,0 +1,66 @@
+"""
+Commit Hooks - İşi transaction commit edilene kadar ertele
+Cache silme ve realtime yayın commit'ten önce yapılırsa eşzamanlı bir okuyucu commit
+edilmemiş değişiklikten önceki veriyi TTL boyunca yeniden cache'leyebilir (veya istemci
+henüz görünmeyen satırı ister). Modüller ORM event'lerinde yapılacak işi session
+üzerinde biriktirir:
+
+    defer_until_commit(object_session(target), 'stale_post_stats', [post_id], _invalidate)
+
+Commit sonrası her anahtarın callback'i biriken öğe kümesiyle bir kez çağrılır; dış
+transaction rollback olursa biriken iş atılır. Session listener'ları yalnızca burada
+kayıtlıdır.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+DEFERRED_KEY = 'deferred_until_commit'
+
+_rollback_keys = {DEFERRED_KEY}
+
+
+def defer_until_commit(session, key, items, callback):
+    """
+    Öğeleri `key` altında biriktir; commit sonrası callback(öğeler) bir kez çağrılır
+
+    Args:
+        session: ORM Session - None ise (ör. session'a bağlı olmayan nesne) atlanır
+        key: Biriktirme anahtarı (modül başına sabit)
+        items: Eklenecek öğeler (kümeye eklenir, tekrarlar birleşir)
+        callback: Commit sonrası çağrılacak fonksiyon - argüman: öğe kümesi
+
+    Returns:
+        set: Anahtarın biriken öğeleri (Core ile yazan çağıranlar doğrudan ekleyebilir)
+    """
+    if session is None:
+        return set()
+    deferred = session.info.setdefault(DEFERRED_KEY, {})
+    if key not in deferred:
+        deferred[key] = (callback, set())
+    pending = deferred[key][1]
+    pending.update(items)
+    return pending
+
+
+def discard_on_rollback(key):
+    """Commit'ten önce uygulanan işler için: session.info[key] rollback'te atılsın"""
+    _rollback_keys.add(key)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_after_commit(session):
+    for key, (callback, items) in session.info.pop(DEFERRED_KEY, {}).items():
+        if not items:
+            continue
+        # Veri zaten commit edildi - bir modülün hatası diğerlerinin işini engellemesin
+        try:
+            callback(items)
+        except Exception as e:
+            print(f'⚠️  Commit sonrası iş başarısız ({key}): {e}')
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_after_rollback(session, previous_transaction):
+    if not session.in_transaction():
+        for key in _rollback_keys:
+            session.info.pop(key, None)
@@ -0,0 +1,106 @@
+"""
+Conversation Service - Sohbet kenar çubuğu (sidebar) listesi
+Kullanıcının sohbetleri katılımcılar ve ilan eager-load edilerek tek sorguda okunur,
+şablonun ihtiyaç duyduğu alanlara indirgenip kullanıcı başına cache'lenir
+(`cache_conversation_list` anahtarı). Mesaj gönderilince/okununca veya sohbet
+güncellenince iki katılımcının listesi commit sonrası silinir.
+
+Toplam okunmamış mesaj sayısı sohbetler üzerinden toplanmaz; User.unread_messages_count
+sayacı Conversation.increment_unread / mark_as_read ile tutulur.
+
+Ayarlar (app.config / env):
+    CONVERSATION_LIST_TIMEOUT : Liste cache ömrü, saniye (katılımcı adı/ilan başlığı
+                                değişiklikleri en fazla bu kadar gecikir)
+"""
+import os
+from flask import current_app
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import joinedload, object_session
+from models import Conversation, Message
+from cache_config import tiered_cache, cache_conversation_list
+from commit_hooks import defer_until_commit
+
+DEFAULT_TIMEOUT = 120
+STALE_KEY = 'stale_conversation_lists'
+
+_conversations = Conversation.__table__
+
+
+def _build_list(user_id):
+    conversations = Conversation.query.options(
+        joinedload(Conversation.user1),
+        joinedload(Conversation.user2),
+        joinedload(Conversation.post),
+    ).filter(
+        or_(Conversation.user1_id == user_id, Conversation.user2_id == user_id)
+    ).order_by(Conversation.last_message_at.desc()).all()
+
+    items = []
+    for conversation in conversations:
+        other = conversation.get_other_user(user_id)
+        items.append({
+            'id': conversation.id,
+            'other_user_id': other.id,
+            'other_name': other.full_name,
+            'other_avatar': other.avatar_url,
+            'post_id': conversation.post_id,
+            'post_title': conversation.post.title if conversation.post else None,
+            'last_message_at': conversation.last_message_at,
+            'last_message_text': conversation.last_message_text,
+            'last_message_sender_id': conversation.last_message_sender_id,
+            'unread': conversation.get_unread_count(user_id) or 0,
+        })
+    return items
+
+
+def get_conversation_list(user_id):
+    """
+    Kullanıcının sohbet listesi (son mesaja göre sıralı, cache'li)
+
+    Returns:
+        list: [{'id', 'other_user_id', 'other_name', 'other_avatar', 'post_id', 'post_title',
+                'last_message_at', 'last_message_text', 'last_message_sender_id', 'unread'}, ...]
+    """
+    timeout = int(current_app.config.get('CONVERSATION_LIST_TIMEOUT', os.getenv('CONVERSATION_LIST_TIMEOUT', DEFAULT_TIMEOUT)))
+    return tiered_cache.get_or_set(
+        cache_conversation_list(user_id), lambda: _build_list(user_id), timeout=timeout
+    )
+
+
+def invalidate_conversation_list(*user_ids):
+    for user_id in user_ids:
+        if user_id is not None:
+            tiered_cache.delete(cache_conversation_list(user_id))
+
+
+# ============================================
+# CACHE INVALIDATION - Mesaj/sohbet değişince
+# ============================================
+
+def _mark_stale(target, *user_ids):
+    # Listeler commit sonrası silinir (bkz. commit_hooks)
+    defer_until_commit(object_session(target), STALE_KEY,
+                       [user_id for user_id in user_ids if user_id is not None],
+                       lambda stale: invalidate_conversation_list(*stale))
+
+
+def _conversation_changed(mapper, connection, target):
+    _mark_stale(target, target.user1_id, target.user2_id)
+
+
+def _message_changed(mapper, connection, target):
+    if target.receiver_id is not None:
+        _mark_stale(target, target.sender_id, target.receiver_id)
+        return
+    row = connection.execute(
+        select(_conversations.c.user1_id, _conversations.c.user2_id).where(_conversations.c.id == target.conversation_id)
+    ).first()
+    if row is not None:
+        _mark_stale(target, *row)
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Conversation, _event, _conversation_changed)
+    event.listen(Message, _event, _message_changed)
+
+
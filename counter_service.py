@@ -0,0 +1,409 @@
+"""
+Counter Service - User ve TevkilPost üzerindeki denormalize sayaçlar
+Session after_flush hook'u flush edilen ilan/başvuru/değerlendirme değişikliklerinden
+sayaç farklarını toplar ve aynı transaction'da atomik `kolon = kolon + fark` UPDATE'leri
+uygular. Türetilmiş değerler (başarı oranı, başvuru oranı, ortalamalar) etkilenen
+satırlar için SQL'de yeniden hesaplanır. `flask counters-reconcile` tüm sayaçları
+set tabanlı SQL ile baştan hesaplar.
+
+Sayaçlar:
+    User: total_posts_created, last_post_date, total_applications_sent, last_application_date,
+          total_applications_received, accepted_applications, rejected_applications (gönderdiği
+          başvurular), success_rate, total_jobs, completed_jobs, rating_count, rating_average,
+          average_response_time_hours, total_views_received, unread_messages_count
+          (Conversation.increment_unread / mark_as_read ile tutulur; burada yalnızca uzlaştırılır)
+    TevkilPost: applications_count, application_rate, first_application_at
+"""
+from datetime import datetime
+from sqlalchemy import event, func, select, case, and_, inspect as sa_inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history, PASSIVE_NO_INITIALIZE
+from models import db, User, TevkilPost, Application, Rating, Conversation
+from atomic_counters import apply_increments
+
+_users = User.__table__
+_posts = TevkilPost.__table__
+_applications = Application.__table__
+_ratings = Rating.__table__
+_conversations = Conversation.__table__
+
+# Application.response_time dakika cinsinden
+_MINUTES_PER_HOUR = 60.0
+
+
+class CounterDeltas:
+    """Bir flush içinde biriken sayaç farkları"""
+
+    def __init__(self):
+        self.users = {}          # user_id -> {kolon: fark}
+        self.posts = {}          # post_id -> {kolon: fark}
+        self.user_dates = {}     # user_id -> {kolon: en yeni tarih}
+        self.post_first = {}     # post_id -> en eski başvuru tarihi
+        self.ratings = {}        # user_id -> [puanlar (negatif = silinen)]
+        self.responses = set()   # Yanıt süresi ortalaması yeniden hesaplanacak ilan sahipleri
+        self.responded = []      # (application_id, dakika)
+        self.stale_dates = set() # Silinen en yeni kayıt nedeniyle tarihi yeniden hesaplanacak kullanıcılar
+        self.stale_first = set() # Silinen başvuru nedeniyle first_application_at yeniden hesaplanacak ilanlar
+
+    def user(self, user_id, column, delta=1):
+        if user_id is not None and delta:
+            bucket = self.users.setdefault(user_id, {})
+            bucket[column] = bucket.get(column, 0) + delta
+
+    def post(self, post_id, column, delta=1):
+        if post_id is not None and delta:
+            bucket = self.posts.setdefault(post_id, {})
+            bucket[column] = bucket.get(column, 0) + delta
+
+    def user_date(self, user_id, column, value):
+        if user_id is None or value is None:
+            return
+        bucket = self.user_dates.setdefault(user_id, {})
+        if bucket.get(column) is None or value > bucket[column]:
+            bucket[column] = value
+
+    def first_application(self, post_id, value):
+        if value is not None and (post_id not in self.post_first or value < self.post_first[post_id]):
+            self.post_first[post_id] = value
+
+    def __bool__(self):
+        return bool(self.users or self.posts or self.user_dates or self.post_first or self.ratings
+                    or self.responded or self.stale_dates or self.stale_first)
+
+
+def _old_value(target, field):
+    history = get_history(target, field, passive=PASSIVE_NO_INITIALIZE)
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        return None
+    return getattr(target, field)
+
+
+def _changed(target, field):
+    return get_history(target, field, passive=PASSIVE_NO_INITIALIZE).has_changes()
+
+
+def _post_owners(connection, post_ids, deleted_posts):
+    """İlan ID -> sahip; bu flush'ta silinen ilanlar session'daki nesneden okunur"""
+    owners = {post_id: deleted_posts[post_id] for post_id in post_ids if post_id in deleted_posts}
+    missing = [post_id for post_id in post_ids if post_id not in owners]
+    if missing:
+        owners.update(connection.execute(
+            select(_posts.c.id, _posts.c.user_id).where(_posts.c.id.in_(missing))
+        ).all())
+    return owners
+
+
+def _collect(session, connection):
+    deltas = CounterDeltas()
+    deleted_posts = {obj.id: obj.user_id for obj in session.deleted if isinstance(obj, TevkilPost)}
+    now = datetime.utcnow()
+
+    # --- İlanlar ---
+    for obj in session.new:
+        if isinstance(obj, TevkilPost):
+            deltas.user(obj.user_id, 'total_posts_created')
+            deltas.user_date(obj.user_id, 'last_post_date', obj.created_at)
+            deltas.user(obj.assigned_to, 'total_jobs')
+            if obj.status == 'completed':
+                deltas.user(obj.assigned_to, 'completed_jobs')
+    for obj in session.deleted:
+        if isinstance(obj, TevkilPost):
+            deltas.user(obj.user_id, 'total_posts_created', -1)
+            deltas.stale_dates.add(obj.user_id)
+            deltas.user(obj.assigned_to, 'total_jobs', -1)
+            if obj.status == 'completed':
+                deltas.user(obj.assigned_to, 'completed_jobs', -1)
+    for obj in session.dirty:
+        if isinstance(obj, TevkilPost) and (_changed(obj, 'assigned_to') or _changed(obj, 'status')):
+            old_assignee, old_status = _old_value(obj, 'assigned_to'), _old_value(obj, 'status')
+            deltas.user(old_assignee, 'total_jobs', -1)
+            deltas.user(obj.assigned_to, 'total_jobs')
+            if old_status == 'completed':
+                deltas.user(old_assignee, 'completed_jobs', -1)
+            if obj.status == 'completed':
+                deltas.user(obj.assigned_to, 'completed_jobs')
+
+    # --- Başvurular ---
+    new_apps = [obj for obj in session.new if isinstance(obj, Application)]
+    deleted_apps = [obj for obj in session.deleted if isinstance(obj, Application)]
+    changed_apps = [obj for obj in session.dirty if isinstance(obj, Application) and _changed(obj, 'status')]
+    post_ids = {obj.post_id for obj in new_apps + deleted_apps + changed_apps}
+    owners = _post_owners(connection, post_ids, deleted_posts) if post_ids else {}
+
+    status_columns = {'accepted': 'accepted_applications', 'rejected': 'rejected_applications'}
+    for obj, sign in [(obj, 1) for obj in new_apps] + [(obj, -1) for obj in deleted_apps]:
+        deltas.user(obj.applicant_id, 'total_applications_sent', sign)
+        deltas.user(owners.get(obj.post_id), 'total_applications_received', sign)
+        if obj.status in status_columns:
+            deltas.user(obj.applicant_id, status_columns[obj.status], sign)
+        if obj.post_id not in deleted_posts:
+            deltas.post(obj.post_id, 'applications_count', sign)
+        if sign > 0:
+            deltas.user_date(obj.applicant_id, 'last_application_date', obj.created_at)
+            deltas.first_application(obj.post_id, obj.created_at)
+        else:
+            deltas.stale_dates.add(obj.applicant_id)
+            if obj.post_id not in deleted_posts:
+                deltas.stale_first.add(obj.post_id)
+            if obj.response_time is not None:
+                deltas.responses.add(owners.get(obj.post_id))
+
+    for obj in changed_apps:
+        old_status = _old_value(obj, 'status')
+        if old_status in status_columns:
+            deltas.user(obj.applicant_id, status_columns[old_status], -1)
+        if obj.status in status_columns:
+            deltas.user(obj.applicant_id, status_columns[obj.status])
+        # İlk yanıt: bekleyen başvuru kabul/ret edildi
+        if old_status == 'pending' and obj.status in status_columns and obj.response_time is None and obj.created_at:
+            minutes = int((now - obj.created_at).total_seconds() // 60)
+            deltas.responded.append((obj.id, max(minutes, 0)))
+            deltas.responses.add(owners.get(obj.post_id))
+
+    # --- Değerlendirmeler ---
+    for obj in session.new:
+        if isinstance(obj, Rating) and obj.rating is not None:
+            deltas.ratings.setdefault(obj.reviewed_id, []).append(obj.rating)
+    for obj in session.deleted:
+        if isinstance(obj, Rating) and obj.rating is not None:
+            deltas.ratings.setdefault(obj.reviewed_id, []).append(-obj.rating)
+    for obj in session.dirty:
+        # Düzenlenen değerlendirme: eski puan çıkar, yeni puan eklenir
+        if isinstance(obj, Rating) and (_changed(obj, 'rating') or _changed(obj, 'reviewed_id')):
+            old_reviewed, old_rating = _old_value(obj, 'reviewed_id'), _old_value(obj, 'rating')
+            if old_rating is not None:
+                deltas.ratings.setdefault(old_reviewed, []).append(-old_rating)
+            if obj.rating is not None:
+                deltas.ratings.setdefault(obj.reviewed_id, []).append(obj.rating)
+
+    deltas.responses.discard(None)
+    return deltas
+
+
+def _apply(connection, deltas):
+    affected_users = set(deltas.users) | set(deltas.user_dates) | set(deltas.ratings) | deltas.responses
+    affected_posts = set(deltas.posts) | set(deltas.post_first)
+
+    # Silme sonrası en yeni/en eski tarih azalmış olabilir - sadece etkilenen satırlar için alt sorgu
+    if deltas.stale_dates:
+        connection.execute(_users.update().where(_users.c.id.in_(list(deltas.stale_dates))).values(_user_dates()))
+    if deltas.stale_first:
+        connection.execute(_posts.update().where(_posts.c.id.in_(list(deltas.stale_first))).values(
+            first_application_at=_first_application(), updated_at=_posts.c.updated_at
+        ))
+
+    for user_id, columns in deltas.users.items():
+        apply_increments(connection, _users, _users.c.id == user_id, columns)
+
+    for user_id, columns in deltas.user_dates.items():
+        connection.execute(_users.update().where(_users.c.id == user_id).values({
+            column: case(
+                (and_(_users.c[column].isnot(None), _users.c[column] >= value), _users.c[column]),
+                else_=value
+            ) for column, value in columns.items()
+        }))
+
+    # Ortalama puan: yeni_ort = (ort * adet + eklenen - silinen) / (adet + fark) - tek atomik UPDATE
+    for user_id, ratings in deltas.ratings.items():
+        count_delta = sum(1 if rating > 0 else -1 for rating in ratings)
+        sum_delta = sum(ratings)
+        count = func.coalesce(_users.c.rating_count, 0)
+        average = func.coalesce(_users.c.rating_average, 0.0)
+        connection.execute(_users.update().where(_users.c.id == user_id).values(
+            rating_count=count + count_delta,
+            rating_average=case(
+                (count + count_delta > 0, (average * count + sum_delta) / (count + count_delta)),
+                else_=0.0
+            )
+        ))
+
+    for post_id, columns in deltas.posts.items():
+        apply_increments(connection, _posts, _posts.c.id == post_id, columns)
+
+    for post_id, value in deltas.post_first.items():
+        first = _posts.c.first_application_at
+        connection.execute(_posts.update().where(_posts.c.id == post_id).values(
+            first_application_at=case((and_(first.isnot(None), first <= value), first), else_=value),
+            updated_at=_posts.c.updated_at
+        ))
+
+    for application_id, minutes in deltas.responded:
+        connection.execute(_applications.update().where(
+            _applications.c.id == application_id,
+            _applications.c.response_time.is_(None)
+        ).values(response_time=minutes, updated_at=_applications.c.updated_at))
+
+    refresh_derived(connection, user_ids=affected_users, post_ids=affected_posts, response_user_ids=deltas.responses)
+
+
+def _response_hours(user_column):
+    """İlan sahibinin başvurulara ortalama yanıt süresi (saat) - ilişkili alt sorgu"""
+    return select(
+        func.coalesce(func.avg(_applications.c.response_time), 0) / _MINUTES_PER_HOUR
+    ).select_from(
+        _applications.join(_posts, _posts.c.id == _applications.c.post_id)
+    ).where(
+        _posts.c.user_id == user_column,
+        _applications.c.response_time.isnot(None)
+    ).scalar_subquery()
+
+
+def _user_dates():
+    return {
+        'last_post_date': select(func.max(_posts.c.created_at)).where(
+            _posts.c.user_id == _users.c.id
+        ).scalar_subquery(),
+        'last_application_date': select(func.max(_applications.c.created_at)).where(
+            _applications.c.applicant_id == _users.c.id
+        ).scalar_subquery(),
+    }
+
+
+def _first_application():
+    return select(func.min(_applications.c.created_at)).where(
+        _applications.c.post_id == _posts.c.id
+    ).scalar_subquery()
+
+
+def _derived_user_values():
+    sent = func.coalesce(_users.c.total_applications_sent, 0)
+    return {
+        # Eski `rating` kolonu rating_average ile aynı tutulur
+        'rating': func.coalesce(_users.c.rating_average, 0.0),
+        'success_rate': case(
+            (sent > 0, 100.0 * func.coalesce(_users.c.accepted_applications, 0) / sent),
+            else_=0.0
+        ),
+    }
+
+
+def _derived_post_values():
+    views = func.coalesce(_posts.c.view_count, 0)
+    return {
+        # Başvuru oranı: görüntülenme başına başvuru (%)
+        'application_rate': case(
+            (views > 0, 100.0 * func.coalesce(_posts.c.applications_count, 0) / views),
+            else_=0.0
+        ),
+        'updated_at': _posts.c.updated_at,
+    }
+
+
+def refresh_derived(connection, user_ids=(), post_ids=(), response_user_ids=()):
+    """Türetilmiş oranları verilen satırlar için sayaç kolonlarından yeniden hesapla"""
+    if user_ids:
+        connection.execute(_users.update().where(_users.c.id.in_(list(user_ids))).values(_derived_user_values()))
+    if response_user_ids:
+        connection.execute(_users.update().where(_users.c.id.in_(list(response_user_ids))).values(
+            average_response_time_hours=_response_hours(_users.c.id)
+        ))
+    if post_ids:
+        connection.execute(_posts.update().where(_posts.c.id.in_(list(post_ids))).values(_derived_post_values()))
+
+
+def record_views(connection, pending):
+    """View counter flush'ı: ilan sahiplerinin total_views_received sayacı + başvuru oranı"""
+    if not pending:
+        return
+    owners = dict(connection.execute(
+        select(_posts.c.id, _posts.c.user_id).where(_posts.c.id.in_(list(pending)))
+    ).all())
+    per_user = {}
+    for post_id, (increment, _) in pending.items():
+        if post_id in owners:
+            per_user[owners[post_id]] = per_user.get(owners[post_id], 0) + increment
+    for user_id, increment in per_user.items():
+        apply_increments(connection, _users, _users.c.id == user_id, {'total_views_received': increment})
+    refresh_derived(connection, post_ids=list(owners))
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_counters(session, flush_context):
+    connection = session.connection()
+    deltas = _collect(session, connection)
+    if deltas:
+        _apply(connection, deltas)
+
+
+# ============================================
+# RECONCILE - Tüm sayaçları set tabanlı SQL ile baştan hesapla
+# ============================================
+
+def _count(table, *conditions):
+    return select(func.count()).select_from(table).where(*conditions).scalar_subquery()
+
+
+def _unread_messages():
+    """Kullanıcının tüm sohbetlerindeki okunmamış mesaj toplamı"""
+    return select(func.coalesce(func.sum(case(
+        (_conversations.c.user1_id == _users.c.id, func.coalesce(_conversations.c.unread_count_user1, 0)),
+        else_=func.coalesce(_conversations.c.unread_count_user2, 0),
+    )), 0)).where(
+        (_conversations.c.user1_id == _users.c.id) | (_conversations.c.user2_id == _users.c.id)
+    ).scalar_subquery()
+
+
+def reconcile_unread_messages(connection):
+    """users.unread_messages_count'u sohbet sayaçlarından yeniden hesapla"""
+    return connection.execute(_users.update().values(unread_messages_count=_unread_messages())).rowcount
+
+
+def reconcile_counters():
+    """
+    Tüm sayaçları tek geçişte yeniden hesapla (ilişkili alt sorgulu UPDATE'ler)
+
+    Returns:
+        tuple: (güncellenen kullanıcı, güncellenen ilan)
+    """
+    received = select(func.count()).select_from(
+        _applications.join(_posts, _posts.c.id == _applications.c.post_id)
+    ).where(_posts.c.user_id == _users.c.id).scalar_subquery()
+
+    with db.engine.begin() as connection:
+        posts_result = connection.execute(_posts.update().values(
+            applications_count=_count(_applications, _applications.c.post_id == _posts.c.id),
+            first_application_at=_first_application(),
+            updated_at=_posts.c.updated_at,
+        ))
+        connection.execute(_posts.update().values(_derived_post_values()))
+
+        users_result = connection.execute(_users.update().values(
+            total_posts_created=_count(_posts, _posts.c.user_id == _users.c.id),
+            total_jobs=_count(_posts, _posts.c.assigned_to == _users.c.id),
+            completed_jobs=_count(_posts, _posts.c.assigned_to == _users.c.id, _posts.c.status == 'completed'),
+            total_applications_sent=_count(_applications, _applications.c.applicant_id == _users.c.id),
+            total_applications_received=received,
+            accepted_applications=_count(_applications, _applications.c.applicant_id == _users.c.id,
+                                         _applications.c.status == 'accepted'),
+            rejected_applications=_count(_applications, _applications.c.applicant_id == _users.c.id,
+                                         _applications.c.status == 'rejected'),
+            rating_count=_count(_ratings, _ratings.c.reviewed_id == _users.c.id),
+            rating_average=select(func.coalesce(func.avg(_ratings.c.rating), 0)).where(
+                _ratings.c.reviewed_id == _users.c.id
+            ).scalar_subquery(),
+            average_response_time_hours=_response_hours(_users.c.id),
+            total_views_received=select(func.coalesce(func.sum(_posts.c.view_count), 0)).where(
+                _posts.c.user_id == _users.c.id
+            ).scalar_subquery(),
+            **_user_dates(),
+        ))
+        connection.execute(_users.update().values(_derived_user_values()))
+        # Kolon migration 8 ile eklenir; daha eski şemada (migration 5) atlanır
+        user_columns = {column['name'] for column in sa_inspect(connection).get_columns(_users.name)}
+        if 'unread_messages_count' in user_columns:
+            reconcile_unread_messages(connection)
+    return users_result.rowcount, posts_result.rowcount
+
+
+def init_counters(app, view_counter=None):
+    """Sayaç bakımını kaydet: view flush'larına bağlan + CLI komutu"""
+    if view_counter is not None:
+        view_counter.register_batch_listener(record_views)
+
+    @app.cli.command('counters-reconcile')
+    def counters_reconcile():
+        """Recompute denormalized User/TevkilPost counters from source tables"""
+        users, posts = reconcile_counters()
+        print(f'✅ Sayaçlar yeniden hesaplandı: {users} kullanıcı, {posts} ilan')
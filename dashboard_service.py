@@ -0,0 +1,144 @@
+"""
+Dashboard Service - Dashboard grafik ve performans verileri
+Altı aylık gelen/giden başvuru serileri user_daily_activity özetinden tek range sorgusu ile,
+toplam kazanç SQL SUM ile hesaplanır, ortalama puan rating_summaries satırından okunur. Sonuç tek bir
+DashboardData nesnesidir ve kullanıcı başına kısa süre cache'lenir; ilan, başvuru ve değerlendirme
+yazımlarında etkilenen kullanıcıların cache'i commit sonrası silinir.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy import event, func, case, select
+from sqlalchemy.orm import object_session
+from models import db, TevkilPost, Application, Rating
+from cache_config import tiered_cache
+from commit_hooks import defer_until_commit
+from activity_service import get_activity_range
+from rating_service import get_rating_summary
+
+DASHBOARD_CACHE_TIMEOUT = 60  # saniye
+CHART_MONTHS = 6
+TURKISH_MONTHS = ['Oca', 'Şub', 'Mar', 'Nis', 'May', 'Haz', 'Tem', 'Ağu', 'Eyl', 'Eki', 'Kas', 'Ara']
+STALE_USERS_KEY = 'stale_dashboard_users'
+
+_posts = TevkilPost.__table__
+
+
+@dataclass(frozen=True)
+class DashboardData:
+    """Dashboard şablonunun ihtiyaç duyduğu grafik ve performans değerleri"""
+    chart_months: list = field(default_factory=list)
+    chart_incoming: list = field(default_factory=list)
+    chart_outgoing: list = field(default_factory=list)
+    category_labels: list = field(default_factory=list)
+    category_counts: list = field(default_factory=list)
+    monthly_completed: int = 0
+    total_earnings: float = 0.0
+    avg_rating: float = 0.0
+
+    def as_template_context(self):
+        return {
+            'chart_months': self.chart_months,
+            'chart_incoming': self.chart_incoming,
+            'chart_outgoing': self.chart_outgoing,
+            'category_labels': self.category_labels,
+            'category_counts': self.category_counts,
+            'monthly_completed': self.monthly_completed,
+            'total_earnings': self.total_earnings,
+            'avg_rating': self.avg_rating,
+        }
+
+
+def _last_months(now, count):
+    """Son `count` takvim ayı: [(yıl, ay), ...] eskiden yeniye"""
+    months = []
+    year, month = now.year, now.month
+    for _ in range(count):
+        months.append((year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return list(reversed(months))
+
+
+def build_dashboard_data(user_id, now=None):
+    """Dashboard verisini hesapla (cache'siz)"""
+    now = now or datetime.utcnow()
+    months = _last_months(now, CHART_MONTHS)
+    since = datetime(months[0][0], months[0][1], 1)
+    month_start = datetime(now.year, now.month, 1)
+
+    # Günlük özet satırlarını aylara topla (en fazla ~186 satır)
+    incoming, outgoing = {}, {}
+    for day, activity in get_activity_range(user_id, since.date(), now.date()).items():
+        key = (day.year, day.month)
+        incoming[key] = incoming.get(key, 0) + activity['applications_received']
+        outgoing[key] = outgoing.get(key, 0) + activity['applications_sent']
+
+    category_data = db.session.query(
+        TevkilPost.category, func.count(TevkilPost.id)
+    ).filter(TevkilPost.user_id == user_id).group_by(TevkilPost.category).all()
+
+    # Tamamlanan işler: bu ayki adet + toplam kazanç tek sorguda
+    monthly_completed, total_earnings = db.session.query(
+        func.count(case((TevkilPost.updated_at >= month_start, 1))),
+        func.coalesce(func.sum(TevkilPost.price_max), 0)
+    ).filter(
+        TevkilPost.user_id == user_id,
+        TevkilPost.status == 'completed'
+    ).one()
+
+    rating_summary = get_rating_summary(user_id)
+
+    return DashboardData(
+        chart_months=[TURKISH_MONTHS[month - 1] for _, month in months],
+        chart_incoming=[incoming.get(key, 0) for key in months],
+        chart_outgoing=[outgoing.get(key, 0) for key in months],
+        category_labels=[category or 'Diğer' for category, _ in category_data],
+        category_counts=[count for _, count in category_data],
+        monthly_completed=monthly_completed,
+        total_earnings=float(total_earnings),
+        avg_rating=float(rating_summary['average']),
+    )
+
+
+def get_dashboard_data(user_id):
+    """Dashboard verisi (kullanıcı başına cache'li)"""
+    return tiered_cache.get_or_set(
+        f'dashboard_data_{user_id}', lambda: build_dashboard_data(user_id), timeout=DASHBOARD_CACHE_TIMEOUT
+    )
+
+
+def invalidate_dashboard(*user_ids):
+    for user_id in user_ids:
+        tiered_cache.delete(f'dashboard_data_{user_id}')
+
+
+# ============================================
+# ORM EVENTS - Etkilenen kullanıcıların cache'ini commit sonrası sil
+# ============================================
+
+def _mark_stale(target, *user_ids):
+    defer_until_commit(object_session(target), STALE_USERS_KEY,
+                       [user_id for user_id in user_ids if user_id is not None],
+                       lambda stale: invalidate_dashboard(*stale))
+
+
+@event.listens_for(TevkilPost, 'after_insert')
+@event.listens_for(TevkilPost, 'after_update')
+@event.listens_for(TevkilPost, 'after_delete')
+def _post_written(mapper, connection, target):
+    # Kategori dağılımı, tamamlanan işler ve kazanç ilan sahibinin dashboard'unda
+    _mark_stale(target, target.user_id)
+
+
+@event.listens_for(Application, 'after_insert')
+@event.listens_for(Application, 'after_delete')
+def _application_written(mapper, connection, target):
+    # Giden seri başvuranın, gelen seri ilan sahibinin dashboard'unda
+    owner_id = connection.execute(select(_posts.c.user_id).where(_posts.c.id == target.post_id)).scalar()
+    _mark_stale(target, target.applicant_id, owner_id)
+
+
+@event.listens_for(Rating, 'after_insert')
+@event.listens_for(Rating, 'after_update')
+@event.listens_for(Rating, 'after_delete')
+def _rating_written(mapper, connection, target):
+    _mark_stale(target, target.reviewed_id)
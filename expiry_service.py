@@ -0,0 +1,245 @@
+"""
+Expiry Service - İlan süre dolumu taraması
+Süresi dolan aktif ilanlar (status, expires_at) index'i ile parça parça bulunur ve
+ORM yüklemesi olmadan toplu UPDATE ile 'expired' durumuna alınır. Süresi yaklaşan
+ilanların sahiplerine "süresi doluyor" bildirimleri toplu INSERT ile gönderilir.
+Birden fazla worker'da güvenli: tarama sadece job_leases kilidini alan worker'da çalışır.
+
+Ayarlar (app.config / env):
+    EXPIRY_SWEEP_INTERVAL : Tarama aralığı, saniye (0 = arka plan thread'i yok, sadece CLI)
+    EXPIRY_NOTICE_HOURS   : Süre dolumundan kaç saat önce bildirim gönderilir
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from models import db, User, TevkilPost, Notification
+from job_lease import acquire_lease, release_lease, worker_id
+from fragment_cache import bump_tags
+import facet_service
+import map_service
+
+LEASE_NAME = 'post_expiry_sweeper'
+CHUNK_SIZE = 500
+DEFAULT_SWEEP_INTERVAL = 600
+DEFAULT_NOTICE_HOURS = 24
+
+_posts = TevkilPost.__table__
+_notifications = Notification.__table__
+_users = User.__table__
+
+
+def _expire_chunk(connection, now, chunk_size, stale_tags=None, stale_statuses=None):
+    """
+    Bir parça süresi dolmuş ilanı 'expired' yap
+
+    Args:
+        stale_tags: Verilirse durumu değişen ilanların fragment cache etiketleri eklenir
+            (commit sonrası yenilenmek üzere)
+        stale_statuses: Verilirse facet sayacı değişen durumlar eklenir (commit sonrası silinmek üzere)
+
+    Returns:
+        int: Bu parçada durumu değişen ilan sayısı
+    """
+    ids = connection.execute(
+        select(_posts.c.id).where(
+            _posts.c.status == 'active',
+            _posts.c.expires_at <= now
+        ).order_by(_posts.c.expires_at).limit(chunk_size)
+    ).scalars().all()
+    if not ids:
+        return 0
+
+    # RETURNING: gerçekten değişen satırların facet/harita alanları (arada durumu değişenler hariç)
+    changed = connection.execute(
+        _posts.update().where(
+            _posts.c.id.in_(ids),
+            _posts.c.status == 'active'
+        ).values(
+            status='expired',
+            updated_at=now
+        ).returning(
+            _posts.c.id, _posts.c.user_id,
+            _posts.c.category, _posts.c.city, _posts.c.urgency_level,
+            _posts.c.latitude, _posts.c.longitude
+        )
+    ).all()
+
+    if stale_tags is not None:
+        for row in changed:
+            stale_tags.update((f'post:{row.id}', f'user:{row.user_id}'))
+
+    # Facet sayaçları: aynı kombinasyonlar tek upsert ile
+    groups = {}
+    for row in changed:
+        key = (row.category, row.city, row.urgency_level)
+        groups[key] = groups.get(key, 0) + 1
+    facet_service.adjust_facets_bulk(connection, [('active', *key, count) for key, count in groups.items()], -1,
+                                      stale_statuses=stale_statuses)
+    facet_service.adjust_facets_bulk(connection, [('expired', *key, count) for key, count in groups.items()], 1,
+                                      stale_statuses=stale_statuses)
+
+    for row in changed:
+        if row.latitude is not None and row.longitude is not None:
+            map_service.adjust_clusters(connection, row.latitude, row.longitude, -1)
+
+    return len(changed)
+
+
+def expire_posts(now=None, chunk_size=CHUNK_SIZE):
+    """
+    Süresi dolmuş tüm aktif ilanları parça parça 'expired' yap
+
+    Her parça ayrı transaction - uzun süreli yazma kilidi tutulmaz.
+
+    Returns:
+        int: Toplam süresi dolan ilan sayısı
+    """
+    now = now or datetime.utcnow()
+    total = 0
+    while True:
+        stale_tags, stale_statuses = set(), set()
+        with db.engine.begin() as connection:
+            count = _expire_chunk(connection, now, chunk_size, stale_tags, stale_statuses)
+        bump_tags(*stale_tags)
+        facet_service.invalidate_facets(stale_statuses)
+        total += count
+        if count < chunk_size:
+            return total
+
+
+def _notify_chunk(connection, now, until, chunk_size):
+    rows = connection.execute(
+        select(
+            _posts.c.id, _posts.c.user_id, _posts.c.title, _posts.c.expires_at,
+            _users.c.notify_post_expiring
+        ).select_from(
+            _posts.join(_users, _users.c.id == _posts.c.user_id)
+        ).where(
+            _posts.c.status == 'active',
+            _posts.c.expires_at > now,
+            _posts.c.expires_at <= until,
+            _posts.c.expiry_notified_at.is_(None)
+        ).order_by(_posts.c.expires_at).limit(chunk_size)
+    ).all()
+    if not rows:
+        return 0, 0
+
+    notifications = [{
+        'user_id': row.user_id,
+        'type': 'post_expiring',
+        'title': 'İlanınızın süresi doluyor',
+        'message': f'"{row.title}" ilanınızın süresi {row.expires_at.strftime("%d.%m.%Y %H:%M")} tarihinde dolacak.',
+        'related_post_id': row.id,
+        'priority': 'normal',
+        'category': 'warning',
+        'action_url': f'/posts/{row.id}',
+        'action_text': 'İlana Git',
+        'created_at': now,
+    } for row in rows if row.notify_post_expiring is not False]
+    if notifications:
+        connection.execute(_notifications.insert(), notifications)
+
+    # Bildirim tercihi kapalı olanlar da işaretlenir - bir sonraki taramada tekrar bakılmaz
+    connection.execute(
+        _posts.update().where(
+            _posts.c.id.in_([row.id for row in rows])
+        ).values(expiry_notified_at=now, updated_at=_posts.c.updated_at)
+    )
+    return len(rows), len(notifications)
+
+
+def notify_expiring_posts(hours=DEFAULT_NOTICE_HOURS, now=None, chunk_size=CHUNK_SIZE):
+    """
+    Süresi önümüzdeki `hours` saat içinde dolacak ilanlar için toplu bildirim
+
+    Returns:
+        int: Gönderilen bildirim sayısı
+    """
+    now = now or datetime.utcnow()
+    until = now + timedelta(hours=hours)
+    sent = 0
+    while True:
+        with db.engine.begin() as connection:
+            scanned, created = _notify_chunk(connection, now, until, chunk_size)
+        sent += created
+        if scanned < chunk_size:
+            return sent
+
+
+def sweep(notice_hours=DEFAULT_NOTICE_HOURS, lease_seconds=None):
+    """
+    Tek tarama turu: lease alınabilirse önce bildirimler, sonra süre dolumları
+
+    Returns:
+        dict veya None (lease başka bir worker'daysa)
+    """
+    owner = worker_id()
+    if not acquire_lease(LEASE_NAME, owner, lease_seconds or DEFAULT_SWEEP_INTERVAL):
+        return None
+    try:
+        notified = notify_expiring_posts(notice_hours)
+        expired = expire_posts()
+    finally:
+        release_lease(LEASE_NAME, owner)
+    if notified or expired:
+        print(f'⏰ İlan süre taraması: {expired} ilan süresi doldu, {notified} bildirim gönderildi')
+    return {'expired': expired, 'notified': notified}
+
+
+class ExpirySweeper:
+    """Periyodik tarama thread'i (her worker'da çalışır, işi lease sahibi yapar)"""
+
+    def __init__(self):
+        self.app = None
+        self.interval = DEFAULT_SWEEP_INTERVAL
+        self.notice_hours = DEFAULT_NOTICE_HOURS
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = float(app.config.get('EXPIRY_SWEEP_INTERVAL', os.getenv('EXPIRY_SWEEP_INTERVAL', DEFAULT_SWEEP_INTERVAL)))
+        self.notice_hours = float(app.config.get('EXPIRY_NOTICE_HOURS', os.getenv('EXPIRY_NOTICE_HOURS', DEFAULT_NOTICE_HOURS)))
+
+    def start(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='post-expiry-sweeper', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    sweep(self.notice_hours, lease_seconds=self.interval)
+            except Exception as e:
+                print(f'❌ İlan süre taraması hatası: {e}')
+
+
+expiry_sweeper = ExpirySweeper()
+
+
+def init_expiry(app):
+    """Süre dolumu taramasını kaydet: ilk istekte arka plan thread'i + CLI komutu"""
+    expiry_sweeper.init_app(app)
+
+    @app.before_request
+    def _start_expiry_sweeper():
+        if not app.config.get('TESTING'):
+            expiry_sweeper.start()
+
+    @app.cli.command('expire-posts')
+    def expire_posts_command():
+        """Expire overdue posts and send post-expiring notifications"""
+        result = sweep(expiry_sweeper.notice_hours)
+        if result is None:
+            print('⏭️  Tarama başka bir worker tarafından çalıştırılıyor')
+        else:
+            print(f'✅ {result["expired"]} ilan süresi doldu, {result["notified"]} bildirim gönderildi')
+
+    return expiry_sweeper
@@ -0,0 +1,216 @@
+"""
+Facet Service - İlan filtre sayaçları
+(durum, kategori, şehir, aciliyet) başına ilan sayısı ORM event'leri ile
+artımlı tutulur; filtre sayıları ilan sayısından bağımsız O(facet) okunur.
+Sayaç satırları iki katmanlı cache'te tutulur (tüm worker'lar aynı anda yeniden
+okumaz); sayacı değişen durumun cache'i transaction commit edildikten sonra silinir
+(ORM yazmalarında Session after_commit, Core toplu güncellemelerinde çağıran taraf).
+"""
+from sqlalchemy import event, func, inspect as sa_inspect
+from sqlalchemy.orm import object_session
+from models import db, TevkilPost, PostFacetCount
+from cache_config import tiered_cache
+from upsert import upsert
+from commit_hooks import defer_until_commit
+from model_history import track_previous_values, previous_values
+
+FACET_FIELDS = ('status', 'category', 'city', 'urgency_level')
+FACET_CACHE_TIMEOUT = 30  # saniye - yalnızca geçersizleştirme kaçarsa üst sınır
+STALE_STATUSES_KEY = 'stale_facet_statuses'
+
+# Filtre parametresi → facet alanı (/posts query string ile aynı isimler)
+FACET_PARAMS = {
+    'category': 'category',
+    'city': 'city',
+    'urgency': 'urgency_level',
+}
+
+_table = PostFacetCount.__table__
+
+
+def _facet_key(values):
+    """NULL değerleri '' olarak sakla (unique constraint için)"""
+    return {field: values.get(field) or '' for field in FACET_FIELDS}
+
+
+def adjust_facet(connection, values, delta):
+    """
+    Bir facet sayacını atomik olarak artır/azalt (satır yoksa oluştur)
+
+    Args:
+        connection: Aktif transaction bağlantısı
+        values: {'status': ..., 'category': ..., 'city': ..., 'urgency_level': ...}
+        delta: Eklenecek miktar (negatif olabilir)
+    """
+    if not delta:
+        return
+    upsert(connection, _table, dict(count=delta, **_facet_key(values)),
+           index_elements=FACET_FIELDS, set_={'count': _table.c.count + delta})
+
+
+def adjust_facets_bulk(connection, rows, delta_sign=1, stale_statuses=None):
+    """
+    Toplu durum geçişleri için sayaçları güncelle
+
+    Args:
+        rows: [(status, category, city, urgency_level, adet), ...] - GROUP BY sonucu
+        delta_sign: 1 ekle, -1 çıkar
+        stale_statuses: Verilirse değişen durumlar eklenir - çağıran commit sonrası
+            invalidate_facets ile cache'i siler
+    """
+    for status, category, city, urgency_level, count in rows:
+        if stale_statuses is not None:
+            stale_statuses.add(status or '')
+        adjust_facet(connection, {
+            'status': status,
+            'category': category,
+            'city': city,
+            'urgency_level': urgency_level,
+        }, delta_sign * count)
+
+
+def rebuild_facet_counts():
+    """Sayaçları tek bir GROUP BY ile baştan hesapla"""
+    connection = db.session.connection()
+    stale = defer_until_commit(db.session, STALE_STATUSES_KEY, (), invalidate_facets)
+    stale.update(connection.execute(db.select(_table.c.status).distinct()).scalars())
+    connection.execute(_table.delete())
+
+    rows = db.session.query(
+        TevkilPost.status, TevkilPost.category, TevkilPost.city, TevkilPost.urgency_level,
+        func.count(TevkilPost.id)
+    ).group_by(
+        TevkilPost.status, TevkilPost.category, TevkilPost.city, TevkilPost.urgency_level
+    ).all()
+    adjust_facets_bulk(connection, rows, stale_statuses=stale)
+
+    db.session.commit()
+    return len(rows)
+
+
+def ensure_facet_table():
+    """Sayaç tablosunu (yoksa) oluştur ve mevcut ilanlardan doldur (migration 1)"""
+    with db.engine.begin() as connection:
+        if sa_inspect(connection).has_table(_table.name):
+            return
+        _table.create(connection)
+
+        rows = connection.execute(
+            db.select(
+                TevkilPost.status, TevkilPost.category, TevkilPost.city, TevkilPost.urgency_level,
+                func.count(TevkilPost.id)
+            ).group_by(
+                TevkilPost.status, TevkilPost.category, TevkilPost.city, TevkilPost.urgency_level
+            )
+        ).all()
+        adjust_facets_bulk(connection, rows)
+        print(f'📊 Facet sayaçları oluşturuldu: {len(rows)} kombinasyon')
+
+
+def _facet_cache_key(status):
+    return f'facet_rows_{status}'
+
+
+def invalidate_facets(statuses):
+    """Durumların cache'lenmiş facet satırlarını sil (commit sonrası çağrılır)"""
+    for status in statuses:
+        tiered_cache.delete(_facet_cache_key(status))
+
+
+def _facet_rows(status):
+    """Durumun sıfırdan büyük tüm facet kombinasyonları: [(kategori, şehir, aciliyet, adet), ...]"""
+    return [tuple(row) for row in db.session.query(
+        PostFacetCount.category, PostFacetCount.city, PostFacetCount.urgency_level, PostFacetCount.count
+    ).filter(
+        PostFacetCount.status == status,
+        PostFacetCount.count > 0
+    )]
+
+
+def get_facet_counts(status='active', selected=None):
+    """
+    Filtre değerlerine göre ilan sayıları
+
+    Her boyutun sayıları diğer boyutlarda seçili filtreler uygulanarak hesaplanır
+    (örn. şehir=Ankara seçiliyken kategori sayıları sadece Ankara ilanlarını sayar).
+
+    Args:
+        status: İlan durumu (genel liste için 'active')
+        selected: {'category': ..., 'city': ..., 'urgency_level': ...} seçili filtreler
+
+    Returns:
+        dict: {'category': {değer: adet}, 'city': {...}, 'urgency_level': {...}, 'total': adet}
+    """
+    selected = {field: value for field, value in (selected or {}).items() if value}
+    rows = tiered_cache.get_or_set(_facet_cache_key(status), lambda: _facet_rows(status), timeout=FACET_CACHE_TIMEOUT)
+
+    dimensions = ('category', 'city', 'urgency_level')
+    facets = {dimension: {} for dimension in dimensions}
+    total = 0
+
+    for *row_values, count in rows:
+        values = dict(zip(dimensions, row_values))
+        for dimension in dimensions:
+            others_match = all(
+                values[other] == selected[other]
+                for other in selected if other != dimension
+            )
+            if others_match and values[dimension]:
+                bucket = facets[dimension]
+                bucket[values[dimension]] = bucket.get(values[dimension], 0) + count
+        if all(values[field] == value for field, value in selected.items()):
+            total += count
+
+    facets['total'] = total
+    return facets
+
+
+def selected_facets(args):
+    """Request argümanlarından seçili facet filtrelerini çıkar"""
+    return {field: args.get(param) for param, field in FACET_PARAMS.items() if args.get(param)}
+
+
+# ============================================
+# ORM EVENTS - Sayaçları TevkilPost ile senkron tut
+# ============================================
+
+def _mark_stale(target, *statuses):
+    # Cache commit sonrası silinir (bkz. commit_hooks)
+    defer_until_commit(object_session(target), STALE_STATUSES_KEY,
+                       [status or '' for status in statuses], invalidate_facets)
+
+
+# Güncellemede hangi sayacın azaltılacağı her zaman bilinsin
+track_previous_values(TevkilPost, FACET_FIELDS)
+
+
+@event.listens_for(TevkilPost, 'after_insert')
+def _post_inserted(mapper, connection, target):
+    adjust_facet(connection, {field: getattr(target, field) for field in FACET_FIELDS}, 1)
+    _mark_stale(target, target.status)
+
+
+@event.listens_for(TevkilPost, 'after_update')
+def _post_updated(mapper, connection, target):
+    old_values = previous_values(target, FACET_FIELDS)
+    if old_values is None:
+        return
+    adjust_facet(connection, old_values, -1)
+    adjust_facet(connection, {field: getattr(target, field) for field in FACET_FIELDS}, 1)
+    _mark_stale(target, old_values['status'], target.status)
+
+
+@event.listens_for(TevkilPost, 'after_delete')
+def _post_deleted(mapper, connection, target):
+    adjust_facet(connection, {field: getattr(target, field) for field in FACET_FIELDS}, -1)
+    _mark_stale(target, target.status)
+
+
+def init_facets(app):
+    """Facet CLI komutlarını kaydet"""
+
+    @app.cli.command('facets-rebuild')
+    def facets_rebuild():
+        """Recompute post facet counters from scratch"""
+        count = rebuild_facet_counts()
+        print(f'✅ {count} facet kombinasyonu yeniden hesaplandı')
@@ -0,0 +1,200 @@
+"""
+Fragment Cache - Etiket bağımlılıklı render edilmiş parça (partial) cache'i
+Dashboard listeleri, profil geçmişi ve ilan başvuru özeti gibi parçalar Flask-Caching
+üzerinde saklanır. Her parça bağlı olduğu etiketlerin (ör. `user:42`, `post:17`) o anki
+sürümleriyle birlikte yazılır; okunurken etiketlerden birinin sürümü değişmişse parça
+geçersizdir ve yeniden üretilir.
+
+Geçersizleştirme: kayıtlı modellerdeki (ilan, başvuru, değerlendirme, kullanıcı)
+değişiklikler flush sırasında toplanır ve commit sonrası etiket sürümleri yenilenir.
+ORM dışı toplu yazmalar `bump_tags(...)` ile etiketleri kendileri yeniler.
+
+Ayarlar (app.config / env):
+    FRAGMENT_CACHE_TIMEOUT : Parçaların azami ömrü, saniye (ORM dışı güncellemeler - ör.
+                             görüntülenme sayıları - en fazla bu kadar gecikir)
+    FRAGMENT_CACHE_ENABLED : 0 ise parçalar her istekte yeniden üretilir
+"""
+import os
+import time
+import threading
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from commit_hooks import defer_until_commit
+from models import User, TevkilPost, Application, Rating
+from cache_config import cache
+
+DEFAULT_TIMEOUT = 300
+TAG_KEY_PREFIX = 'fragment_tag:'
+FRAGMENT_KEY_PREFIX = 'fragment:'
+PENDING_TAGS_KEY = 'stale_fragment_tags'
+
+
+def _new_version():
+    # Sayaç değil, benzersiz token: etiket cache'ten düşüp yeniden oluşsa bile eski sürümle çakışmaz
+    return f'{time.time_ns():x}'
+
+
+class FragmentCache:
+    """Parça okuma/yazma, etiket sürümleri ve parça başına hit/miss metrikleri"""
+
+    def __init__(self):
+        self.timeout = DEFAULT_TIMEOUT
+        self.enabled = True
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.timeout = int(app.config.get('FRAGMENT_CACHE_TIMEOUT', os.getenv('FRAGMENT_CACHE_TIMEOUT', DEFAULT_TIMEOUT)))
+        self.enabled = str(app.config.get('FRAGMENT_CACHE_ENABLED', os.getenv('FRAGMENT_CACHE_ENABLED', '1'))) != '0'
+
+    # ----- Etiket sürümleri -----
+
+    def tag_versions(self, tags):
+        """Etiketlerin güncel sürümleri; hiç yazılmamış etiketlere yeni sürüm verilir"""
+        tags = list(tags)
+        if not tags:
+            return {}
+        keys = [TAG_KEY_PREFIX + tag for tag in tags]
+        versions = dict(zip(tags, cache.get_many(*keys)))
+        for tag, key in zip(tags, keys):
+            if versions[tag] is None:
+                cache.add(key, _new_version(), timeout=0)
+                versions[tag] = cache.get(key)
+        return versions
+
+    def bump(self, *tags):
+        """Etiketlerin sürümünü yenile - bu etiketlere bağlı tüm parçalar geçersiz olur"""
+        tags = {tag for tag in tags if tag}
+        if tags:
+            cache.set_many({TAG_KEY_PREFIX + tag: _new_version() for tag in tags}, timeout=0)
+
+    # ----- Parçalar -----
+
+    def render(self, name, vary, builder, tags=(), timeout=None):
+        """
+        Parçayı cache'ten döndür ya da üretip sakla
+
+        Args:
+            name: Parça adı (metrikler bu ada göre tutulur)
+            vary: Parçayı ayıran değer (ör. kullanıcı veya ilan ID)
+            builder: Parçayı üreten fonksiyon; HTML veya (HTML, ek_etiketler) döndürür.
+                Ek etiketler içerikten doğan bağımlılıklardır (ör. listelenen ilanlar).
+            tags: Parçanın baştan bilinen etiketleri
+
+        Returns:
+            Markup: Render edilmiş HTML
+        """
+        key = f'{FRAGMENT_KEY_PREFIX}{name}:{vary}'
+        if self.enabled:
+            entry = cache.get(key)
+            if entry is not None and self.tag_versions(entry['tags']) == entry['tags']:
+                self._record(name, hit=True)
+                return Markup(entry['html'])
+
+        # Bilinen etiketlerin sürümü üretimden önce okunur: üretim sırasında gelen bir bump
+        # parçayı eski sürümle yazdırır ve sonraki okumada geçersiz sayılır
+        versions = self.tag_versions(tags) if self.enabled else {}
+        started = time.perf_counter()
+        result = builder()
+        html, extra_tags = result if isinstance(result, tuple) else (result, ())
+        build_ms = (time.perf_counter() - started) * 1000
+        self._record(name, hit=False, build_ms=build_ms)
+
+        if self.enabled:
+            versions.update(self.tag_versions(set(extra_tags) - set(versions)))
+            cache.set(key, {'html': str(html), 'tags': versions}, timeout=timeout or self.timeout)
+        return Markup(html)
+
+    # ----- Metrikler -----
+
+    def _record(self, name, hit, build_ms=0.0):
+        with self._lock:
+            stats = self._metrics.setdefault(name, {'hits': 0, 'misses': 0, 'build_ms_total': 0.0})
+            if hit:
+                stats['hits'] += 1
+            else:
+                stats['misses'] += 1
+                stats['build_ms_total'] += build_ms
+
+    def get_metrics(self):
+        """
+        Parça başına hit/miss ve tahmini kazanç (bu worker için)
+
+        saved_ms_estimate = hit sayısı x ortalama üretim süresi
+        """
+        with self._lock:
+            metrics = {}
+            for name, stats in self._metrics.items():
+                requests = stats['hits'] + stats['misses']
+                avg_build = stats['build_ms_total'] / stats['misses'] if stats['misses'] else 0.0
+                metrics[name] = {
+                    'hits': stats['hits'],
+                    'misses': stats['misses'],
+                    'hit_rate': round(stats['hits'] / requests, 3) if requests else 0.0,
+                    'avg_build_ms': round(avg_build, 2),
+                    'saved_ms_estimate': round(stats['hits'] * avg_build, 1),
+                }
+            return {'enabled': self.enabled, 'timeout': self.timeout, 'fragments': metrics}
+
+
+fragment_cache = FragmentCache()
+
+
+def bump_tags(*tags):
+    fragment_cache.bump(*tags)
+
+
+# ============================================
+# INVALIDATION BUS - Model değişikliklerinden etiket yenileme
+# ============================================
+
+_model_tags = {}
+
+
+def register_model_tags(model, tags_for):
+    """Model nesnesi değiştiğinde yenilenecek etiketleri döndüren fonksiyonu kaydet"""
+    _model_tags[model] = tags_for
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_tags(session, flush_context):
+    if not _model_tags:
+        return
+    stale = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tags_for = _model_tags.get(type(obj))
+        if tags_for is not None:
+            stale.update(tag for tag in tags_for(obj) if tag)
+    defer_until_commit(session, PENDING_TAGS_KEY, stale, lambda tags: bump_tags(*tags))
+
+
+def _user_tag(user_id):
+    return f'user:{user_id}' if user_id is not None else None
+
+
+def _post_tags(post):
+    return [f'post:{post.id}', _user_tag(post.user_id), _user_tag(post.assigned_to)]
+
+
+def _application_tags(application):
+    owner_id = application.post.user_id if application.post is not None else None
+    return [f'post:{application.post_id}', _user_tag(application.applicant_id), _user_tag(owner_id)]
+
+
+def _rating_tags(rating):
+    return [_user_tag(rating.reviewed_id)]
+
+
+def _user_tags(user):
+    return [_user_tag(user.id)]
+
+
+def init_fragment_cache(app):
+    """Fragment cache'i kaydet: model etiketleri"""
+    fragment_cache.init_app(app)
+    register_model_tags(TevkilPost, _post_tags)
+    register_model_tags(Application, _application_tags)
+    register_model_tags(Rating, _rating_tags)
+    register_model_tags(User, _user_tags)
+    return fragment_cache
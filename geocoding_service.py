@@ -3,7 +3,9 @@ Geocoding Service - Google Maps API
 Adres → Koordinat (lat/lng) dönüşümü
 """
 import os
+import math
 import requests
+import numpy as np
 from dotenv import load_dotenv
 import time
 
@@ -116,6 +118,42 @@ def calculate_distance(lat1, lng1, lat2, lng2):
     distance = R * c
     return round(distance, 2)
 
+def calculate_distances(lat, lng, lats, lngs):
+    """
+    Bir noktadan çok sayıda koordinata mesafe (km) - vektörel Haversine
+
+    calculate_distance() ile aynı formül, tek NumPy geçişinde tüm adaylar için.
+
+    Args:
+        lat, lng: Merkez nokta
+        lats, lngs: Aday koordinat dizileri
+
+    Returns:
+        numpy.ndarray: Mesafeler (km)
+    """
+    R = 6371.0
+    
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(lngs, dtype=np.float64)) - np.radians(lng)
+    
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Yarıçapı kapsayan enlem/boylam kutusu (index'li ön filtre için)
+    
+    Returns:
+        tuple: (min_lat, max_lat, min_lng, max_lng)
+    """
+    # 1 derece enlem ≈ 111.32 km, boylam enlemle birlikte daralır
+    dlat = radius_km / 111.32
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(radius_km / (111.32 * cos_lat), 180.0)
+    return (max(lat - dlat, -90.0), min(lat + dlat, 90.0), lng - dlng, lng + dlng)
+
 def get_directions_url(origin_lat, origin_lng, dest_lat, dest_lng):
     """
     Google Maps'te rota için URL oluştur
@@ -0,0 +1,45 @@
+"""
+Job Lease - Veritabanı tabanlı iş kilidi (SQLite + PostgreSQL)
+Birden fazla worker aynı periyodik işi çalıştırdığında sadece lease sahibi çalışır.
+Lease süresi dolarsa (sahip process öldüyse) başka bir worker devralır.
+"""
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from models import db, JobLease
+from upsert import upsert
+
+_table = JobLease.__table__
+
+
+def worker_id():
+    """Bu process/thread için benzersiz lease sahibi kimliği"""
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def acquire_lease(name, owner, ttl_seconds):
+    """
+    Lease'i al veya yenile
+
+    Tek bir atomik upsert: satır yoksa eklenir; varsa sadece süresi dolmuşsa
+    veya zaten bu sahibe aitse güncellenir.
+
+    Returns:
+        bool: Lease bu sahipteyse True
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    with db.engine.begin() as connection:
+        upsert(connection, _table, {'name': name, 'owner': owner, 'expires_at': expires_at},
+               index_elements=('name',), set_={'owner': owner, 'expires_at': expires_at},
+               where=(_table.c.expires_at < now) | (_table.c.owner == owner))
+        current = connection.execute(select(_table.c.owner).where(_table.c.name == name)).scalar()
+    return current == owner
+
+
+def release_lease(name, owner):
+    """Lease'i bırak (sadece sahibi bırakabilir)"""
+    with db.engine.begin() as connection:
+        connection.execute(_table.delete().where(_table.c.name == name, _table.c.owner == owner))
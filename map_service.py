@@ -0,0 +1,329 @@
+"""
+Map Service - Viewport (bbox) tabanlı harita API'si
+Düşük zoom'da önceden hesaplanmış grid hücresi kümeleri,
+yüksek zoom'da (status, latitude, longitude) index'i ile sadece görünen ilanlar
+"""
+import math
+import numpy as np
+from sqlalchemy import event, inspect as sa_inspect
+from models import db, User, TevkilPost, MapClusterCell
+from geocoding_service import bounding_box, calculate_distances
+import pagination
+from upsert import upsert
+from model_history import track_previous_values, previous_values
+
+# (maksimum zoom, hücre boyutu derece) - zoom bu değere kadar ise bu seviye kullanılır
+CLUSTER_LEVELS = (
+    (5, 2.0),    # Ülke görünümü
+    (8, 0.5),    # Bölge / il
+    (10, 0.1),   # İl merkezi / ilçe
+)
+# Bu zoom ve üstünde tekil marker döner
+MARKER_MIN_ZOOM = CLUSTER_LEVELS[-1][0] + 1
+# Tek yanıtta en fazla marker - aşılırsa en ince küme seviyesine düşülür
+MAX_MARKERS = 500
+# Yakınımdaki ilanlar araması için üst sınır
+MAX_RADIUS_KM = 500.0
+
+_table = MapClusterCell.__table__
+_POST_FIELDS = ('status', 'latitude', 'longitude')
+
+
+def parse_bbox(value):
+    """
+    'minLng,minLat,maxLng,maxLat' string'ini parse et
+
+    Returns:
+        tuple veya None (geçersizse)
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    # float() 'nan' / 'inf' kabul eder - hücre hesabında int() patlar
+    if not all(math.isfinite(part) for part in (min_lng, min_lat, max_lng, max_lat)):
+        return None
+    if min_lat > max_lat or min_lng > max_lng:
+        return None
+    return (max(min_lng, -180.0), max(min_lat, -90.0), min(max_lng, 180.0), min(max_lat, 90.0))
+
+
+def parse_radius(lat, lng, radius_km):
+    """
+    Yakınımdakiler araması için merkez ve yarıçapı doğrula
+
+    Returns:
+        tuple (lat, lng, radius_km) veya None (geçersizse)
+    """
+    # float() 'nan' / 'inf' kabul eder - kutu hesabında math.cos patlar, nan boş sayfa döndürür
+    if not all(math.isfinite(value) for value in (lat, lng, radius_km)):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0) or radius_km <= 0:
+        return None
+    return lat, lng, radius_km
+
+
+def level_for_zoom(zoom):
+    """Zoom seviyesine karşılık gelen küme seviyesi (None = tekil marker)"""
+    for level, (max_zoom, _) in enumerate(CLUSTER_LEVELS):
+        if zoom <= max_zoom:
+            return level
+    return None
+
+
+def cell_for(level, lat, lng):
+    size = CLUSTER_LEVELS[level][1]
+    return int(math.floor(lng / size)), int(math.floor(lat / size))
+
+
+def _is_mappable(status, lat, lng):
+    return status == 'active' and lat is not None and lng is not None
+
+
+def adjust_clusters(connection, lat, lng, sign):
+    """Bir ilanın tüm küme seviyelerindeki hücrelerini güncelle (sign: +1 / -1)"""
+    for level in range(len(CLUSTER_LEVELS)):
+        cell_x, cell_y = cell_for(level, lat, lng)
+        upsert(connection, _table, {
+            'level': level, 'cell_x': cell_x, 'cell_y': cell_y,
+            'count': sign, 'lat_sum': sign * lat, 'lng_sum': sign * lng,
+        }, index_elements=('level', 'cell_x', 'cell_y'), set_={
+            'count': _table.c.count + sign,
+            'lat_sum': _table.c.lat_sum + sign * lat,
+            'lng_sum': _table.c.lng_sum + sign * lng,
+        })
+
+
+def _backfill(connection):
+    rows = connection.execute(
+        db.select(TevkilPost.latitude, TevkilPost.longitude).where(
+            TevkilPost.status == 'active',
+            TevkilPost.latitude.isnot(None),
+            TevkilPost.longitude.isnot(None)
+        )
+    ).all()
+
+    # Hücreleri Python'da topla, her hücre için tek INSERT
+    cells = {}
+    for lat, lng in rows:
+        for level in range(len(CLUSTER_LEVELS)):
+            key = (level,) + cell_for(level, lat, lng)
+            count, lat_sum, lng_sum = cells.get(key, (0, 0.0, 0.0))
+            cells[key] = (count + 1, lat_sum + lat, lng_sum + lng)
+
+    if cells:
+        connection.execute(_table.insert(), [
+            {'level': level, 'cell_x': x, 'cell_y': y, 'count': c, 'lat_sum': ls, 'lng_sum': gs}
+            for (level, x, y), (c, ls, gs) in cells.items()
+        ])
+    return len(rows)
+
+
+def ensure_map_index():
+    """Küme tablosunu ve viewport index'ini (yoksa) oluştur, kümeleri doldur (migration 1)"""
+    with db.engine.begin() as connection:
+        for index in TevkilPost.__table__.indexes:
+            if index.name == 'idx_tevkil_posts_status_lat_lng':
+                index.create(connection, checkfirst=True)
+
+        if sa_inspect(connection).has_table(_table.name):
+            return
+        _table.create(connection)
+        count = _backfill(connection)
+        print(f'🗺️ Harita kümeleri oluşturuldu: {count} ilan')
+
+
+def rebuild_clusters():
+    """Küme tablosunu baştan hesapla"""
+    connection = db.session.connection()
+    connection.execute(_table.delete())
+    count = _backfill(connection)
+    db.session.commit()
+    return count
+
+
+def get_clusters(bbox, level):
+    """Viewport içindeki küme hücreleri"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    min_x, min_y = cell_for(level, min_lat, min_lng)
+    max_x, max_y = cell_for(level, max_lat, max_lng)
+
+    cells = MapClusterCell.query.filter(
+        MapClusterCell.level == level,
+        MapClusterCell.cell_x.between(min_x, max_x),
+        MapClusterCell.cell_y.between(min_y, max_y),
+        MapClusterCell.count > 0
+    ).all()
+
+    return [{
+        'lat': round(cell.lat_sum / cell.count, 6),
+        'lng': round(cell.lng_sum / cell.count, 6),
+        'count': cell.count,
+    } for cell in cells]
+
+
+def get_markers(bbox, limit=MAX_MARKERS):
+    """
+    Viewport içindeki aktif ilanlar (tek sorgu, ORM nesnesi ve lazy load yok)
+
+    Returns:
+        list veya None (limit aşıldıysa)
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    rows = db.session.query(
+        TevkilPost.id, TevkilPost.title, TevkilPost.description, TevkilPost.category,
+        TevkilPost.urgency_level, TevkilPost.location, TevkilPost.formatted_address,
+        TevkilPost.city, TevkilPost.courthouse,
+        TevkilPost.latitude, TevkilPost.longitude, TevkilPost.created_at,
+        User.full_name
+    ).outerjoin(User, User.id == TevkilPost.user_id).filter(
+        TevkilPost.status == 'active',
+        TevkilPost.latitude.between(min_lat, max_lat),
+        TevkilPost.longitude.between(min_lng, max_lng)
+    ).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        return None
+
+    return [{
+        'id': row.id,
+        'title': row.title,
+        'description': row.description[:100] + '...' if len(row.description) > 100 else row.description,
+        'category': row.category,
+        'urgency_level': row.urgency_level,
+        'location': row.location,
+        'formatted_address': row.formatted_address or row.location,
+        'city': row.city,
+        'courthouse': row.courthouse,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        'created_at': row.created_at.strftime('%d.%m.%Y') if row.created_at else '',
+        'user_name': row.full_name or 'Anonim',
+    } for row in rows]
+
+
+def get_map_data(bbox, zoom):
+    """
+    Viewport için harita verisi
+
+    Returns:
+        dict: {'mode': 'clusters', 'clusters': [...]} veya {'mode': 'markers', 'posts': [...]}
+    """
+    level = level_for_zoom(zoom)
+    if level is None:
+        markers = get_markers(bbox)
+        if markers is not None:
+            return {'mode': 'markers', 'posts': markers, 'total': len(markers)}
+        # Çok yoğun viewport: en ince küme seviyesine düş
+        level = len(CLUSTER_LEVELS) - 1
+
+    clusters = get_clusters(bbox, level)
+    return {
+        'mode': 'clusters',
+        'clusters': clusters,
+        'total': sum(cluster['count'] for cluster in clusters),
+    }
+
+
+def paginate_by_distance(query, lat, lng, radius_km, cursor=None, limit=pagination.DEFAULT_PAGE_SIZE):
+    """
+    Yarıçap içindeki ilanları mesafeye göre sıralı sayfala
+
+    1. (status, latitude, longitude) index'i ile kutu ön filtresi - sadece id ve koordinat çekilir
+    2. Adayların mesafesi tek NumPy geçişinde hesaplanır
+    3. Sadece istenen sayfanın ilanları yüklenir
+
+    Args:
+        query: Filtreleri uygulanmış TevkilPost sorgusu
+        lat, lng: Merkez nokta
+        radius_km: Yarıçap (km)
+        cursor: Önceki sayfanın next_cursor değeri ([mesafe, id])
+
+    Returns:
+        tuple: (ilanlar, next_cursor) - her ilanda distance_km niteliği set edilir
+    """
+    radius_km = min(max(radius_km, 0.0), MAX_RADIUS_KM)
+    limit = max(1, min(limit or pagination.DEFAULT_PAGE_SIZE, pagination.MAX_PAGE_SIZE))
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+
+    candidates = query.with_entities(
+        TevkilPost.id, TevkilPost.latitude, TevkilPost.longitude
+    ).filter(
+        TevkilPost.latitude.between(min_lat, max_lat),
+        TevkilPost.longitude.between(min_lng, max_lng)
+    ).all()
+    if not candidates:
+        return [], None
+
+    ids = np.fromiter((row[0] for row in candidates), dtype=np.int64, count=len(candidates))
+    lats = np.fromiter((row[1] for row in candidates), dtype=np.float64, count=len(candidates))
+    lngs = np.fromiter((row[2] for row in candidates), dtype=np.float64, count=len(candidates))
+    distances = calculate_distances(lat, lng, lats, lngs)
+
+    # Kutu köşelerindeki adayları at, kalanları (mesafe, id) sırasına diz
+    mask = distances <= radius_km
+    # Tipi/uzunluğu uymayan (elle değiştirilmiş) cursor ilk sayfaya döner
+    values = pagination.decode_cursor(cursor, (float, int))
+    if values is not None and None not in values:
+        after_distance, after_id = float(values[0]), int(values[1])
+        mask &= (distances > after_distance) | ((distances == after_distance) & (ids > after_id))
+    ids, distances = ids[mask], distances[mask]
+    order = np.lexsort((ids, distances))
+
+    page = order[:limit]
+    next_cursor = None
+    if len(order) > limit:
+        last = page[-1]
+        next_cursor = pagination.encode_cursor([float(distances[last]), int(ids[last])])
+
+    page_ids = [int(ids[i]) for i in page]
+    posts_by_id = {post.id: post for post in TevkilPost.query.filter(TevkilPost.id.in_(page_ids)).all()}
+
+    posts = []
+    for i in page:
+        post = posts_by_id.get(int(ids[i]))
+        if post is not None:
+            post.distance_km = round(float(distances[i]), 2)
+            posts.append(post)
+    return posts, next_cursor
+
+
+# ============================================
+# ORM EVENTS - Kümeleri TevkilPost ile senkron tut
+# ============================================
+
+track_previous_values(TevkilPost, _POST_FIELDS)
+
+
+@event.listens_for(TevkilPost, 'after_insert')
+def _post_inserted(mapper, connection, target):
+    if _is_mappable(target.status, target.latitude, target.longitude):
+        adjust_clusters(connection, target.latitude, target.longitude, 1)
+
+
+@event.listens_for(TevkilPost, 'after_update')
+def _post_updated(mapper, connection, target):
+    old = previous_values(target, _POST_FIELDS)
+    if old is None:
+        return
+
+    if _is_mappable(old['status'], old['latitude'], old['longitude']):
+        adjust_clusters(connection, old['latitude'], old['longitude'], -1)
+    if _is_mappable(target.status, target.latitude, target.longitude):
+        adjust_clusters(connection, target.latitude, target.longitude, 1)
+
+
+@event.listens_for(TevkilPost, 'after_delete')
+def _post_deleted(mapper, connection, target):
+    if _is_mappable(target.status, target.latitude, target.longitude):
+        adjust_clusters(connection, target.latitude, target.longitude, -1)
+
+
+def init_map(app):
+    """Harita CLI komutlarını kaydet"""
+
+    @app.cli.command('map-rebuild')
+    def map_rebuild():
+        """Recompute map cluster cells from scratch"""
+        count = rebuild_clusters()
+        print(f'✅ {count} ilan harita kümelerine yazıldı')
@@ -0,0 +1,205 @@
+"""
+Message Bus - Sohbet mesajları için süreç içi pub/sub (long-poll bekleyicileri)
+Commit edilen her yeni mesaj sohbetin "son mesaj ID"sini ilerletir ve o sohbeti
+bekleyen long-poll isteklerini uyandırır. Bekleyen istek veritabanına dokunmaz:
+yeni mesaj yoksa zaman aşımına kadar Condition üzerinde uyur.
+
+REDIS_URL ayarlıysa yayınlar Redis kanalına da gönderilir; diğer worker'lardaki
+bekleyiciler de uyanır. Redis bağlantısı kopup yeniden kurulursa bilinen ID'ler
+silinir ve bekleyiciler uyandırılır (arada kaçan mesajlar veritabanından okunur).
+
+Long-poll istekleri bekledikleri süre boyunca isteği tutar. Deploy'da gunicorn gevent
+worker'ı kullanılır (render.yaml / Procfile: --worker-class gevent): threading
+monkey-patch'lendiği için bekleyen istek yalnızca bir greenlet tutar; Socket.IO da bu
+durumda gevent modunda çalışır (bkz. app.socketio_async_mode). Senkron worker'da her
+bekleyen istek bir worker'ı kilitler - gevent yoksa gthread (--threads) kullanılmalıdır.
+
+Bilinen son ID'ler LRU ile MAX_KNOWN_CONVERSATIONS sohbetle sınırlıdır; bekleyicisi
+olan sohbet atılmaz, atılan sohbet bir sonraki beklemede veritabanından yeniden okunur.
+
+Ayarlar (app.config / env):
+    CHAT_LONG_POLL_TIMEOUT : Bir long-poll isteğinin azami bekleme süresi, saniye
+"""
+import os
+import json
+import time
+import threading
+import uuid
+from collections import OrderedDict
+from itertools import islice
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from models import Message
+from commit_hooks import defer_until_commit
+
+try:
+    import redis
+except ImportError:  # Redis opsiyonel - yoksa yalnızca süreç içi
+    redis = None
+
+CHANNEL = 'tevkil_chat_messages'
+DEFAULT_MAX_WAIT = 25  # saniye - proxy zaman aşımlarının altında kalır
+PENDING_KEY = 'published_chat_messages'
+MAX_KNOWN_CONVERSATIONS = 10000
+
+
+class MessageBus:
+    """Sohbet başına son mesaj ID'si + bekleyen isteklerin uyandırılması"""
+
+    def __init__(self):
+        self.redis = None
+        self.max_wait = DEFAULT_MAX_WAIT
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._latest = OrderedDict()  # conversation_id -> bilinen son mesaj ID (LRU sırasıyla)
+        self._conditions = {}  # conversation_id -> (Condition, bekleyen sayısı)
+        self._listener = None
+        self._metrics = {'published': 0, 'received': 0, 'wakeups': 0, 'timeouts': 0}
+
+    def init_app(self, app, redis_url=None):
+        self.max_wait = float(app.config.get('CHAT_LONG_POLL_TIMEOUT', os.getenv('CHAT_LONG_POLL_TIMEOUT', DEFAULT_MAX_WAIT)))
+        if redis_url and redis is not None:
+            self.redis = redis.from_url(redis_url)
+
+    # ----- Yayın -----
+
+    def publish(self, conversation_id, message_id):
+        """Yeni mesajı duyur (commit sonrası çağrılır)"""
+        self._advance(conversation_id, message_id)
+        self._metrics['published'] += 1
+        if self.redis is None:
+            return
+        try:
+            self.redis.publish(CHANNEL, json.dumps({
+                'conversation_id': conversation_id, 'message_id': message_id, 'origin': self.origin
+            }))
+        except redis.RedisError as e:
+            print(f'⚠️  Mesaj yayını Redis\'e gönderilemedi: {e}')
+
+    def _advance(self, conversation_id, message_id):
+        with self._lock:
+            if message_id <= self._latest.get(conversation_id, 0):
+                return
+            self._remember(conversation_id, message_id)
+            entry = self._conditions.get(conversation_id)
+            if entry is not None:
+                entry[0].notify_all()
+
+    def _remember(self, conversation_id, message_id):
+        # self._lock tutulurken çağrılır
+        self._latest[conversation_id] = message_id
+        self._latest.move_to_end(conversation_id)
+        overflow = len(self._latest) - MAX_KNOWN_CONVERSATIONS
+        if overflow <= 0:
+            return
+        # En eski overflow + bekleyen sayısı kadar kayıttan en az overflow tanesi bekleyicisizdir
+        for key in list(islice(self._latest, overflow + len(self._conditions))):
+            if overflow <= 0:
+                break
+            if key not in self._conditions:
+                del self._latest[key]
+                overflow -= 1
+
+    def _reset(self):
+        # Redis'ten kopuldu: bilinen ID'ler güvenilmez, bekleyiciler veritabanına bakmalı
+        with self._lock:
+            self._latest.clear()
+            for condition, _ in self._conditions.values():
+                condition.notify_all()
+
+    # ----- Bekleme -----
+
+    def wait(self, conversation_id, since_id, timeout, load_latest):
+        """
+        since_id'den yeni bir mesaj olana kadar bekle
+
+        Args:
+            load_latest: Sohbetin son mesaj ID'sini veritabanından okuyan fonksiyon
+                (yalnızca bu süreçte sohbet henüz bilinmiyorsa çağrılır)
+
+        Returns:
+            bool: Yeni mesaj var (veya durum bilinmiyor) - False ise zaman aşımı
+        """
+        self._ensure_listener()
+        with self._lock:
+            known = conversation_id in self._latest
+            if known:
+                self._latest.move_to_end(conversation_id)
+        if not known:
+            latest = load_latest() or 0
+            with self._lock:
+                if conversation_id not in self._latest:
+                    self._remember(conversation_id, latest)
+
+        with self._lock:
+            condition, waiters = self._conditions.get(conversation_id) or (threading.Condition(self._lock), 0)
+            self._conditions[conversation_id] = (condition, waiters + 1)
+            try:
+                ready = condition.wait_for(
+                    lambda: self._latest.get(conversation_id, since_id + 1) > since_id, timeout
+                )
+            finally:
+                condition, waiters = self._conditions[conversation_id]
+                if waiters <= 1:
+                    del self._conditions[conversation_id]
+                else:
+                    self._conditions[conversation_id] = (condition, waiters - 1)
+        self._metrics['wakeups' if ready else 'timeouts'] += 1
+        return ready
+
+    # ----- Redis dinleyicisi -----
+
+    def _ensure_listener(self):
+        if self.redis is None or (self._listener is not None and self._listener.is_alive()):
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='chat-message-bus', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                self._reset()
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    payload = json.loads(message['data'])
+                    if payload.get('origin') != self.origin:
+                        self._advance(payload['conversation_id'], payload['message_id'])
+                        self._metrics['received'] += 1
+            except Exception as e:
+                print(f'⚠️  Mesaj yayını dinleyicisi yeniden bağlanıyor: {e}')
+                time.sleep(1)
+
+    def get_metrics(self):
+        with self._lock:
+            waiting = sum(waiters for _, waiters in self._conditions.values())
+        return {**self._metrics, 'waiting': waiting, 'known_conversations': len(self._latest),
+                'redis': self.redis is not None}
+
+
+message_bus = MessageBus()
+
+
+# ============================================
+# ORM EVENTS - Commit edilen mesajları yayınla
+# ============================================
+
+def _publish_all(messages):
+    for conversation_id, message_id in sorted(messages, key=lambda item: item[1]):
+        message_bus.publish(conversation_id, message_id)
+
+
+@event.listens_for(Message, 'after_insert')
+def _message_inserted(mapper, connection, target):
+    defer_until_commit(object_session(target), PENDING_KEY, [(target.conversation_id, target.id)], _publish_all)
+
+
+def init_message_bus(app):
+    """Mesaj yayınını kaydet (REDIS_URL varsa worker'lar arası)"""
+    message_bus.init_app(app, app.config.get('REDIS_URL'))
+    return message_bus
@@ -0,0 +1,290 @@
+"""
+Message Service - Sohbet mesajı yazma (HTTP, dosya yükleme ve Socket.IO ortak yolu)
+Tüm gönderim yolları `send_message` üzerinden geçer:
+    1. Üyelik kontrolü (katılımcılar cache'li - bkz. chat_history.get_participants)
+    2. Mesaj satırı + sohbet özeti (last_message_at/text/sender) aynı transaction'da
+    3. Alıcının okunmamış sayaçları atomik artışla (Conversation.increment_unread)
+    4. Commit sonrası `new_message` sohbet odasına, çevrimiçi alıcıya bildirim kendi odasına
+
+Grup commit (MESSAGE_GROUP_COMMIT açıksa): mesajlar tek bir yazıcı thread'inin kuyruğuna
+eklenir; yazıcı kuyruktakileri (en fazla MESSAGE_BATCH_SIZE, ilk mesajdan sonra en fazla
+MESSAGE_BATCH_WINDOW saniye bekleyerek) tek transaction'da yazar. Yoğun anlarda commit
+sayısı mesaj sayısına değil batch sayısına bağlıdır. Gönderen istek kendi mesajının
+commit'ini bekler, yanıt biçimi değişmez. Batch'te hata olursa mesajlar tek tek yeniden
+yazılır - hatalı mesaj yalnızca kendi gönderenine hata döndürür. Yazıcı WRITE_TIMEOUT
+içinde yanıt vermezse kuyruktaki mesaj iptal edilir (MessageError 503); yazımı başlamışsa
+iptal edilemez ve MessagePending (503) döner - mesaj yine de kaydedilebilir, istemci
+tekrar göndermeden önce sohbeti yenilemelidir.
+
+Ayarlar (app.config / env):
+    MESSAGE_GROUP_COMMIT : Grup commit açık mı (varsayılan kapalı - mesaj başına commit)
+    MESSAGE_BATCH_SIZE   : Bir transaction'daki azami mesaj
+    MESSAGE_BATCH_WINDOW : Batch'i doldurmak için azami bekleme, saniye
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+from sqlalchemy.orm import joinedload
+from models import db, Conversation, Message
+from chat_history import get_participants, get_other_participant, serialize_message
+from presence import presence
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_BATCH_WINDOW = 0.005
+WRITE_TIMEOUT = 30  # saniye - yazıcı yanıt vermezse istek hata döner
+DEFAULT_AVATAR = '/static/default-avatar.png'
+
+
+class MessageError(Exception):
+    """Mesaj gönderilemedi - `status` HTTP durum kodu olarak döndürülür"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class MessagePending(MessageError):
+    """Yazım zaman aşımına uğradı ama başladı - mesaj sonradan kaydedilebilir"""
+
+    def __init__(self, message='Mesaj henüz kaydedilmedi, birazdan görünebilir - tekrar göndermeden önce sohbeti yenileyin'):
+        super().__init__(message, 503)
+
+
+def _write(drafts):
+    """Taslakları geçerli session'da tek transaction ile yaz; serileştirilmiş mesajları döndür"""
+    conversations = {
+        conversation.id: conversation
+        for conversation in Conversation.query.options(
+            joinedload(Conversation.user1), joinedload(Conversation.user2)
+        ).filter(Conversation.id.in_({draft['conversation_id'] for draft in drafts}))
+    }
+
+    now = datetime.now(timezone.utc)
+    messages = []
+    for draft in drafts:
+        conversation = conversations.get(draft['conversation_id'])
+        if conversation is None:
+            raise MessageError('Sohbet bulunamadı', 404)
+        message = Message(
+            conversation_id=conversation.id,
+            sender_id=draft['sender_id'],
+            receiver_id=draft['receiver_id'],
+            post_id=conversation.post_id,  # DEPRECATED alan (eski sistem uyumluluğu)
+            message=draft['text'],
+            reply_to_id=draft['reply_to_id'],
+            delivered_at=now,
+            **draft['attachment']
+        )
+        db.session.add(message)
+        messages.append(message)
+
+        conversation.last_message_at = now
+        conversation.last_message_text = draft['text'][:100]
+        conversation.last_message_sender_id = draft['sender_id']
+        conversation.increment_unread(draft['receiver_id'])
+
+    # Commit nesneleri expire eder - ID/created_at flush'ta atanır, yanıt commit'ten önce hazırlanır
+    db.session.flush()
+    payloads = []
+    for message, draft in zip(messages, drafts):
+        payload = serialize_message(message)  # Yayın tüm sekmelere gider - is_mine istemcide
+        payload['sender_avatar'] = draft['sender_avatar']
+        payloads.append(payload)
+    db.session.commit()
+    return payloads
+
+
+class MessageWriter:
+    """Kuyruktaki mesajları tek thread'de, batch başına tek commit ile yazar"""
+
+    def __init__(self):
+        self.app = None
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self.window = DEFAULT_BATCH_WINDOW
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = {'batches': 0, 'messages': 0, 'max_batch': 0, 'retried_batches': 0}
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = int(app.config.get('MESSAGE_BATCH_SIZE', os.getenv('MESSAGE_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+        self.window = float(app.config.get('MESSAGE_BATCH_WINDOW', os.getenv('MESSAGE_BATCH_WINDOW', DEFAULT_BATCH_WINDOW)))
+
+    def submit(self, draft):
+        """Taslağı kuyruğa ekle - Future sonucu serileştirilmiş mesajdır"""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((draft, future))
+        return future
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='chat-message-writer', daemon=True)
+            self._thread.start()
+
+    def _collect(self):
+        # İlk mesajı bekle; sonra kuyrukta biriken + pencere içinde gelenleri topla
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Bekleyen tarafın zaman aşımıyla iptal ettiği mesajlar yazılmaz
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            with self.app.app_context():
+                try:
+                    self._write_batch(batch)
+                finally:
+                    db.session.remove()
+
+    def _write_batch(self, batch):
+        try:
+            payloads = _write([draft for draft, _ in batch])
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            self._metrics['retried_batches'] += 1
+            for item in batch:
+                self._write_batch([item])
+            return
+
+        self._metrics['batches'] += 1
+        self._metrics['messages'] += len(batch)
+        self._metrics['max_batch'] = max(self._metrics['max_batch'], len(batch))
+        for (_, future), payload in zip(batch, payloads):
+            future.set_result(payload)
+
+    def get_metrics(self):
+        return {**self._metrics, 'queued': self._queue.qsize(), 'batch_size': self.batch_size,
+                'window': self.window}
+
+
+class MessageService:
+    """Doğrulama + yazma (doğrudan veya grup commit) + realtime yayın"""
+
+    def __init__(self):
+        self.socketio = None
+        self.group_commit = False
+        self.writer = MessageWriter()
+
+    def init_app(self, app, socketio=None):
+        value = app.config.get('MESSAGE_GROUP_COMMIT', os.getenv('MESSAGE_GROUP_COMMIT', False))
+        self.group_commit = str(value).lower() in ('1', 'true', 'yes', 'on')
+        self.socketio = socketio
+        self.writer.init_app(app)
+
+    def send_message(self, conversation_id, sender, text, reply_to_id=None, attachment=None):
+        """
+        Mesajı kaydet ve yayınla
+
+        Args:
+            conversation_id: Sohbet ID
+            sender: Gönderen kullanıcı (User / current_user)
+            text: Mesaj metni
+            reply_to_id: Yanıtlanan mesaj ID
+            attachment: Dosya alanları - {'message_type', 'file_name', 'file_size', 'file_url', 'file_type'}
+
+        Returns:
+            dict: Serileştirilmiş mesaj (chat_history.serialize_message biçimi + sender_avatar)
+
+        Raises:
+            MessageError: Boş mesaj (400), sohbet yok (404), sohbet üyesi değil (403),
+                yazıcı zaman aşımı - mesaj yazılmadı (503)
+            MessagePending: Yazıcı zaman aşımı - mesaj sonradan kaydedilebilir (503)
+        """
+        text = (text or '').strip()
+        if not text:
+            raise MessageError('Mesaj boş olamaz', 400)
+        try:
+            conversation_id = int(conversation_id)
+        except (TypeError, ValueError):
+            raise MessageError('Conversation ID eksik', 400)
+
+        if not get_participants(conversation_id):
+            raise MessageError('Sohbet bulunamadı', 404)
+        receiver_id = get_other_participant(conversation_id, sender.id)
+        if receiver_id is None:
+            raise MessageError('Yetkiniz yok', 403)
+
+        draft = {
+            'conversation_id': conversation_id,
+            'sender_id': sender.id,
+            'receiver_id': receiver_id,
+            'text': text,
+            'reply_to_id': reply_to_id,
+            'attachment': attachment or {},
+            'sender_avatar': sender.avatar_url or DEFAULT_AVATAR,
+        }
+
+        if self.group_commit:
+            future = self.writer.submit(draft)
+            try:
+                payload = future.result(timeout=WRITE_TIMEOUT)
+            except FutureTimeoutError:
+                if future.cancel():
+                    raise MessageError('Mesaj gönderilemedi (zaman aşımı), tekrar deneyin', 503)
+                raise MessagePending()
+        else:
+            try:
+                payload, = _write([draft])
+            except Exception:
+                db.session.rollback()
+                raise
+
+        # Mesaj commit edildi - yayın hatası gönderimi başarısız saydırmasın
+        try:
+            self.publish(conversation_id, receiver_id, payload)
+        except Exception as e:
+            print(f'⚠️  Mesaj yayını başarısız (conversation {conversation_id}): {e}')
+        return payload
+
+    def publish(self, conversation_id, receiver_id, payload):
+        """Commit edilmiş mesajı sohbet odasına, alıcı çevrimiçiyse bildirimini kendi odasına yayınla"""
+        if self.socketio is None:
+            return
+        self.socketio.emit('new_message', {
+            'conversation_id': conversation_id,
+            'message': payload
+        }, room=f'conversation_{conversation_id}')
+
+        if presence.is_online(receiver_id):
+            self.socketio.emit('new_message_notification', {
+                'conversation_id': conversation_id,
+                'sender_name': payload['sender_name'],
+                'preview': payload['message'][:50]
+            }, room=f'user_{receiver_id}')
+
+    def get_metrics(self):
+        return {'group_commit': self.group_commit, **self.writer.get_metrics()}
+
+
+message_service = MessageService()
+
+
+def send_message(conversation_id, sender, text, reply_to_id=None, attachment=None):
+    return message_service.send_message(conversation_id, sender, text, reply_to_id, attachment)
+
+
+def init_message_service(app, socketio=None):
+    """Mesaj yazma servisini başlat (grup commit ayarları + realtime yayın)"""
+    message_service.init_app(app, socketio)
+    return message_service
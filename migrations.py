@@ -0,0 +1,339 @@
+"""
+Migrations - Versiyonlu şema migration'ları (SQLite + PostgreSQL)
+Uygulanan versiyonlar schema_migrations tablosunda tutulur; her migration kendi
+transaction'ında çalışır ve bir kez uygulanır. Index tanımları models.py'deki
+__table_args__ ile aynı nesnelerdir (create_all ile kurulan yeni veritabanları
+da aynı index'lere sahip olur).
+
+Deploy'da migration'lar worker'lar başlamadan tek process'te uygulanır (Procfile
+release adımı / render.yaml startCommand: flask --app app db-migrate); yeni kolonlar
+modelde tanımlı olduğundan şeması geride kalan veritabanında her sorgu hata verir.
+PostgreSQL'de runner advisory lock tutar - aynı anda iki db-migrate çalışmaz.
+
+AUTO_MIGRATE açıksa (varsayılan kapalı) bekleyenler `import app` sırasında da uygulanır;
+her worker, her flask komutu ve test betiği bunu tetikler, SQLite'ta kilit yoktur -
+yalnızca tek process'li yerel geliştirme içindir. Boş veritabanında atlanır (tablolar
+create_all / flask init-db ile kurulur).
+
+Komutlar:
+    flask db-migrate          Bekleyen migration'ları uygula
+    flask db-migrate-status   Uygulanan/bekleyen migration'lar
+    flask db-perf-check       Sık kullanılan sorguları EXPLAIN ile kontrol et
+"""
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, text, inspect as sa_inspect
+from models import db, User, TevkilPost, Application, Notification, Favorite, Message, PostFacetCount, MapClusterCell, JobLease
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+ADVISORY_LOCK_KEY = 730001  # PostgreSQL pg_advisory_lock anahtarı (migration runner'a özel)
+
+
+def migration(version, name, transactional=True):
+    """
+    Migration kaydet
+
+    transactional=False: fonksiyon bağlantı almaz, kendi transaction'larını yönetir
+    (örn. kendi engine.begin() bloğunu açan ensure_* fonksiyonları)
+    """
+    def decorator(fn):
+        MIGRATIONS.append((version, name, fn, transactional))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return fn
+    return decorator
+
+
+def _model_index(model, name):
+    for index in model.__table__.indexes:
+        if index.name == name:
+            return index
+    raise KeyError(f'{model.__tablename__} tablosunda {name} index tanımı yok')
+
+
+def create_indexes(connection, model, *names):
+    """Model üzerinde tanımlı index'leri (yoksa) oluştur"""
+    for name in names:
+        _model_index(model, name).create(connection, checkfirst=True)
+
+
+def add_column(connection, model, column_name):
+    """Model kolonunu tabloya (yoksa) ekle - tip modeldeki tanımdan derlenir"""
+    table = model.__table__
+    existing = {column['name'] for column in sa_inspect(connection).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column_type = table.c[column_name].type.compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column_name} {column_type}'))
+
+
+# ============================================
+# MIGRATION'LAR
+# ============================================
+
+@migration(1, 'search, facet ve harita tabloları', transactional=False)
+def _0001_subsystem_tables():
+    # Bu tablolar ilk kullanımda da oluşturulur; burada açıkça ve backfill ile kurulur
+    import search_service
+    import facet_service
+    import map_service
+    search_service.ensure_search_index()
+    facet_service.ensure_facet_table()
+    map_service.ensure_map_index()
+
+
+@migration(2, 'sık sorgular için composite index paketi')
+def _0002_composite_indexes(connection):
+    create_indexes(connection, TevkilPost, 'idx_tevkil_posts_status_created', 'idx_tevkil_posts_user_status')
+    create_indexes(connection, Application, 'idx_applications_applicant_created', 'idx_applications_post_status')
+    create_indexes(connection, Notification, 'idx_notifications_user_read')
+    create_indexes(connection, Message, 'idx_messages_conversation_created')
+    # Favorite(user_id, post_id): unique_user_post_favorite constraint'i zaten index sağlar
+
+
+@migration(3, 'ilan süre dolumu taraması')
+def _0003_post_expiry(connection):
+    add_column(connection, TevkilPost, 'expiry_notified_at')
+    create_indexes(connection, TevkilPost, 'idx_tevkil_posts_status_expires')
+    JobLease.__table__.create(connection, checkfirst=True)
+
+
+@migration(4, 'kullanıcı günlük aktivite özeti', transactional=False)
+def _0004_user_daily_activity():
+    import activity_service
+    activity_service.ensure_activity_table()
+
+
+@migration(5, 'denormalize sayaçların ilk hesaplanması', transactional=False)
+def _0005_reconcile_counters():
+    import counter_service
+    counter_service.reconcile_counters()
+
+
+@migration(6, 'kullanıcı değerlendirme özeti', transactional=False)
+def _0006_rating_summaries():
+    import rating_service
+    rating_service.ensure_rating_summary_table()
+
+
+@migration(7, 'sayfalı sohbet geçmişi index')
+def _0007_message_history_index(connection):
+    create_indexes(connection, Message, 'idx_messages_conversation_id')
+
+
+@migration(8, 'kullanıcı toplam okunmamış mesaj sayacı')
+def _0008_unread_messages_count(connection):
+    import counter_service
+    add_column(connection, User, 'unread_messages_count')
+    counter_service.reconcile_unread_messages(connection)
+
+
+# ============================================
+# RUNNER
+# ============================================
+
+def _ensure_migrations_table():
+    with db.engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+
+
+def applied_versions():
+    _ensure_migrations_table()
+    with db.engine.connect() as connection:
+        return {row.version for row in connection.execute(select(schema_migrations.c.version))}
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [item for item in MIGRATIONS if item[0] not in applied]
+
+
+def _record(connection, version, name):
+    connection.execute(schema_migrations.insert().values(
+        version=version, name=name, applied_at=datetime.utcnow()
+    ))
+
+
+@contextmanager
+def _migration_lock():
+    # PostgreSQL: aynı anda başlayan worker'lar sırayla girer; sonra gelen bekleyen listeyi boş bulur.
+    # SQLite'ta yazmalar zaten dosya kilidiyle sıralanır.
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect() as connection:
+        connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': ADVISORY_LOCK_KEY})
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': ADVISORY_LOCK_KEY})
+            connection.commit()
+
+
+def run_migrations():
+    """
+    Bekleyen migration'ları sırayla uygula
+
+    Returns:
+        list: Uygulanan (versiyon, isim) listesi
+    """
+    applied = []
+    with _migration_lock():
+        for version, name, fn, transactional in pending_migrations():
+            if transactional:
+                with db.engine.begin() as connection:
+                    fn(connection)
+                    _record(connection, version, name)
+            else:
+                fn()
+                with db.engine.begin() as connection:
+                    _record(connection, version, name)
+            print(f'   ✅ {version:04d} {name}')
+            applied.append((version, name))
+    return applied
+
+
+def migrate_on_startup(app):
+    """Şeması kurulu veritabanında bekleyen migration'ları uygula (boş veritabanında atlanır)"""
+    with app.app_context():
+        try:
+            if not sa_inspect(db.engine).has_table(User.__tablename__):
+                return []
+            if not pending_migrations():
+                return []
+            print('🔄 Bekleyen migration\'lar uygulanıyor...')
+            return run_migrations()
+        except SQLAlchemyError as e:
+            print(f'⚠️  Başlangıç migration\'ları uygulanamadı (flask db-migrate ile tekrar deneyin): {e}')
+            return []
+
+
+# ============================================
+# PERFORMANCE CHECK - EXPLAIN ile full scan tespiti
+# ============================================
+
+def _hot_queries():
+    """app.py'deki sık çalışan sorgu şekilleri (örnek parametrelerle)"""
+    return [
+        ('Aktif ilan listesi', TevkilPost.query.filter_by(status='active')
+            .order_by(TevkilPost.created_at.desc(), TevkilPost.id.desc()).limit(20)),
+        ('İlanlarım (duruma göre)', TevkilPost.query.filter_by(user_id=1, status='active')
+            .order_by(TevkilPost.created_at.desc())),
+        ('Harita viewport', TevkilPost.query.filter(
+            TevkilPost.status == 'active',
+            TevkilPost.latitude.between(39.0, 40.0),
+            TevkilPost.longitude.between(32.0, 33.0))),
+        ('Başvurularım', Application.query.filter_by(applicant_id=1)
+            .order_by(Application.created_at.desc())),
+        ('İlan başvuruları (duruma göre)', Application.query.filter_by(post_id=1, status='pending')),
+        ('Okunmamış bildirimler', Notification.query.filter_by(user_id=1, read_at=None)),
+        ('Favori kontrolü', Favorite.query.filter_by(user_id=1, post_id=1)),
+        ('Sohbet geçmişi', Message.query.filter_by(conversation_id=1)
+            .order_by(Message.created_at.desc()).limit(50)),
+        ('Sohbet geçmişi (eski sayfa)', Message.query.filter(
+            Message.conversation_id == 1, Message.id < 1000)
+            .order_by(Message.id.desc()).limit(51)),
+        ('Facet sayaçları', PostFacetCount.query.filter(PostFacetCount.status == 'active')),
+        ('Harita kümeleri', MapClusterCell.query.filter(
+            MapClusterCell.level == 1, MapClusterCell.cell_x.between(0, 10))),
+        ('Kullanıcı e-posta ile', User.query.filter_by(email='ornek@tevkil.com')),
+    ]
+
+
+def _explain(connection, statement):
+    """
+    Sorgu planını al
+
+    Returns:
+        tuple: (plan satırları, full scan yapılan tablolar)
+    """
+    dialect = connection.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+    if dialect.name == 'postgresql':
+        lines = [row[0] for row in connection.execute(text('EXPLAIN ' + sql))]
+        scans = [line.split(' on ')[1].split()[0] for line in lines if 'Seq Scan on ' in line]
+    else:
+        rows = connection.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+        lines = [row[-1] for row in rows]
+        # "SCAN tablo" = full scan; "SCAN tablo USING INDEX ..." index üzerinden taranır
+        scans = [line.split()[1] for line in lines if line.startswith('SCAN ') and ' USING ' not in line]
+    return lines, scans
+
+
+def perf_check():
+    """
+    Sık sorguları EXPLAIN ile çalıştır
+
+    Returns:
+        list: [(isim, plan satırları, full scan tabloları), ...] - kontrol edilemeyen sorgularda None
+    """
+    inspector = sa_inspect(db.engine)
+    results = []
+    with db.engine.connect() as connection:
+        for name, query in _hot_queries():
+            table = query.column_descriptions[0]['entity'].__tablename__
+            if not inspector.has_table(table):
+                results.append((name, [f'{table} tablosu yok'], None))
+                continue
+            try:
+                lines, scans = _explain(connection, query.statement)
+            except SQLAlchemyError as e:
+                # Şeması modelden geride kalmış veritabanları (eksik kolon vb.)
+                connection.rollback()
+                lines, scans = [f'EXPLAIN çalıştırılamadı: {e.orig if hasattr(e, "orig") else e}'], None
+            results.append((name, lines, scans))
+    return results
+
+
+def init_migrations(app):
+    """Migration CLI komutlarını kaydet ve (AUTO_MIGRATE açıksa) bekleyenleri uygula"""
+    auto_migrate = app.config.get('AUTO_MIGRATE', os.getenv('AUTO_MIGRATE', 'false'))
+    if str(auto_migrate).lower() in ('1', 'true', 'yes', 'on'):
+        migrate_on_startup(app)
+
+    @app.cli.command('db-migrate')
+    def db_migrate():
+        """Apply pending schema migrations"""
+        print('🔄 Migration\'lar uygulanıyor...')
+        applied = run_migrations()
+        print(f'✅ {len(applied)} migration uygulandı' if applied else '✅ Veritabanı güncel')
+
+    @app.cli.command('db-migrate-status')
+    def db_migrate_status():
+        """Show applied and pending schema migrations"""
+        applied = applied_versions()
+        for version, name, _, _ in MIGRATIONS:
+            mark = '✅' if version in applied else '⏳'
+            print(f'{mark} {version:04d} {name}')
+
+    @app.cli.command('db-perf-check')
+    def db_perf_check():
+        """EXPLAIN hot queries and report full table scans"""
+        problems = 0
+        for name, lines, scans in perf_check():
+            if scans is None:
+                print(f'⏭️  {name}')
+            elif scans:
+                problems += 1
+                print(f'❌ {name}: full scan ({", ".join(scans)})')
+            else:
+                print(f'✅ {name}')
+            for line in lines:
+                print(f'      {line}')
+        if problems:
+            print(f'\n⚠️  {problems} sorgu full scan yapıyor - index eksik olabilir (flask db-migrate)')
+        else:
+            print('\n✨ Tüm sık sorgular index kullanıyor')
+        if db.engine.dialect.name == 'postgresql':
+            print('💡 PostgreSQL küçük tablolarda index olsa da Seq Scan seçebilir; ANALYZE sonrası tekrar kontrol edin')
@@ -0,0 +1,51 @@
+"""
+Model History - after_update'te alanların önceki değerleri
+Sayaç/özet tabloları (facet sayaçları, harita kümeleri) bir satır güncellenince eski
+kombinasyonu azaltıp yenisini artırır; bunun için güncellemeden önceki değerler gerekir.
+
+    track_previous_values(TevkilPost, ('status', 'city'))   # modül yüklenirken bir kez
+    old = previous_values(target, ('status', 'city'))       # after_update içinde
+"""
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import get_history, PASSIVE_NO_INITIALIZE
+
+_tracked = set()
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+def track_previous_values(model, fields):
+    """
+    Alanlarda active_history aç: süresi dolmuş (expired) alana atama yapılırsa eski değer
+    önce yüklenir, böylece after_update'te önceki değer her zaman bilinir
+    """
+    for field in fields:
+        if (model, field) in _tracked:
+            continue
+        _tracked.add((model, field))
+        event.listen(getattr(model, field), 'set', _load_previous_value, active_history=True, retval=True)
+
+
+def previous_values(target, fields):
+    """
+    Flush edilen güncellemeden önceki değerler
+
+    Yüklenmemiş alanlar yüklenmeden kontrol edilir (view_count gibi ilgisiz güncellemelerde
+    ek sorgu yok).
+
+    Returns:
+        dict {alan: önceki değer} veya None (alanların hiçbiri değişmediyse)
+    """
+    histories = {field: get_history(target, field, passive=PASSIVE_NO_INITIALIZE) for field in fields}
+    if not any(history.has_changes() for history in histories.values()):
+        return None
+
+    old = {}
+    for field, history in histories.items():
+        if history.has_changes():
+            old[field] = history.deleted[0] if history.deleted else None
+        else:
+            old[field] = getattr(target, field)
+    return old
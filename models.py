@@ -5,6 +5,7 @@ from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from atomic_counters import increment
 
 db = SQLAlchemy()
 
@@ -64,6 +65,7 @@ class User(UserMixin, db.Model):
     average_response_time_hours = db.Column(db.Float, default=0.0)
     total_views_received = db.Column(db.Integer, default=0)
     profile_views = db.Column(db.Integer, default=0)
+    unread_messages_count = db.Column(db.Integer, default=0)  # Tüm sohbetlerdeki okunmamış mesaj toplamı
     last_post_date = db.Column(db.DateTime)
     last_application_date = db.Column(db.DateTime)
     
@@ -168,7 +170,7 @@ class TevkilPost(db.Model):
     court_date = db.Column(db.DateTime)
     
     # Status
-    status = db.Column(db.String(20), default='active')  # active, assigned, completed, cancelled
+    status = db.Column(db.String(20), default='active')  # active, assigned, completed, cancelled, expired
     assigned_to = db.Column(db.Integer, db.ForeignKey('users.id'))
     
     # Stats
@@ -185,10 +187,22 @@ class TevkilPost(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     expires_at = db.Column(db.DateTime)
+    expiry_notified_at = db.Column(db.DateTime)  # "Süresi doluyor" bildirimi gönderildi
     
     # Relationships
     applications = db.relationship('Application', backref='post', lazy='dynamic', cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # Harita viewport sorguları: status='active' AND latitude BETWEEN ... AND longitude BETWEEN ...
+        db.Index('idx_tevkil_posts_status_lat_lng', 'status', 'latitude', 'longitude'),
+        # Genel liste: status='active' ORDER BY created_at DESC
+        db.Index('idx_tevkil_posts_status_created', 'status', 'created_at'),
+        # İlanlarım: user_id=? AND status=?
+        db.Index('idx_tevkil_posts_user_status', 'user_id', 'status'),
+        # Süre dolumu taraması: status='active' AND expires_at <= ?
+        db.Index('idx_tevkil_posts_status_expires', 'status', 'expires_at'),
+    )
+    
     def __repr__(self):
         return f'<TevkilPost {self.title}>'
 
@@ -214,6 +228,13 @@ class Application(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Başvurularım: applicant_id=? ORDER BY created_at DESC
+        db.Index('idx_applications_applicant_created', 'applicant_id', 'created_at'),
+        # İlan başvuru sayıları: post_id=? GROUP/FILTER BY status
+        db.Index('idx_applications_post_status', 'post_id', 'status'),
+    )
+    
     def __repr__(self):
         return f'<Application {self.id} for Post {self.post_id}>'
 
@@ -289,12 +310,36 @@ class Conversation(db.Model):
         """Belirli bir kullanıcı için okunmamış mesaj sayısı"""
         return self.unread_count_user1 if user_id == self.user1_id else self.unread_count_user2
     
+    def _unread_column(self, user_id):
+        return 'unread_count_user1' if user_id == self.user1_id else 'unread_count_user2'
+    
+    def _participant(self, user_id):
+        return self.user1 if user_id == self.user1_id else self.user2
+    
+    def increment_unread(self, user_id, amount=1):
+        """
+        Kullanıcının okunmamış sayısını atomik olarak artır/azalt (flush'ta tek UPDATE)
+        Kullanıcının toplam okunmamış sayacı (User.unread_messages_count) aynı farkla güncellenir.
+        """
+        increment(self, self._unread_column(user_id), amount)
+        increment(self._participant(user_id), 'unread_messages_count', amount)
+    
     def mark_as_read(self, user_id):
         """Kullanıcı için tüm mesajları okundu işaretle"""
-        if user_id == self.user1_id:
-            self.unread_count_user1 = 0
-        else:
-            self.unread_count_user2 = 0
+        column = self._unread_column(user_id)
+        if self.id is None:
+            setattr(self, column, 0)
+            return
+        # Satır kilitlenerek okunur: eşzamanlı gelen mesajın artışı toplamdan düşülmez
+        table = Conversation.__table__
+        unread = db.session.execute(
+            db.select(table.c[column]).where(table.c.id == self.id).with_for_update()
+        ).scalar() or 0
+        if unread:
+            # Yüklü değer eski olabilir (ör. 0): expire edilince atama her durumda UPDATE üretir
+            db.session.expire(self, [column])
+            setattr(self, column, 0)
+            increment(self._participant(user_id), 'unread_messages_count', -unread)
     
     @staticmethod
     def get_or_create(user1_id, user2_id, post_id=None):
@@ -375,6 +420,13 @@ class Message(db.Model):
     reply_to = db.relationship('Message', remote_side=[id], backref='replies')
     pinned_by_user = db.relationship('User', foreign_keys=[pinned_by])
     
+    __table_args__ = (
+        # Sohbet geçmişi: conversation_id=? ORDER BY created_at
+        db.Index('idx_messages_conversation_created', 'conversation_id', 'created_at'),
+        # Sayfalı geçmiş: conversation_id=? AND id < ? ORDER BY id DESC LIMIT n
+        db.Index('idx_messages_conversation_id', 'conversation_id', 'id'),
+    )
+    
     @property
     def is_read(self):
         """Mesaj okundu mu?"""
@@ -465,6 +517,11 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime)  # Bildirimin geçerlilik süresi
     
+    __table_args__ = (
+        # Okunmamış bildirimler: user_id=? AND read_at IS NULL
+        db.Index('idx_notifications_user_read', 'user_id', 'read_at'),
+    )
+    
     @property
     def is_read(self):
         """Bildirim okundu mu?"""
@@ -637,3 +694,110 @@ class LoginAttempt(db.Model):
     
     def __repr__(self):
         return f'<LoginAttempt {self.email} - {"Success" if self.success else "Failed"}>'
+
+
+class PostFacetCount(db.Model):
+    """İlan filtre sayaçları - (durum, kategori, şehir, aciliyet) başına ilan sayısı"""
+    __tablename__ = 'post_facet_counts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # Facet anahtarı (NULL yerine '' - unique constraint NULL'ları eşit saymaz)
+    status = db.Column(db.String(20), nullable=False, default='')
+    category = db.Column(db.String(50), nullable=False, default='')
+    city = db.Column(db.String(50), nullable=False, default='')
+    urgency_level = db.Column(db.String(20), nullable=False, default='')
+    
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('status', 'category', 'city', 'urgency_level', name='unique_post_facet'),
+    )
+    
+    def __repr__(self):
+        return f'<PostFacetCount {self.status}/{self.category}/{self.city}/{self.urgency_level}={self.count}>'
+
+
+class MapClusterCell(db.Model):
+    """Harita kümeleri - grid hücresi başına aktif ilan sayısı ve koordinat toplamları"""
+    __tablename__ = 'map_cluster_cells'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # Grid seviyesi ve hücre koordinatları (floor(lng / boyut), floor(lat / boyut))
+    level = db.Column(db.Integer, nullable=False)
+    cell_x = db.Column(db.Integer, nullable=False)
+    cell_y = db.Column(db.Integer, nullable=False)
+    
+    # Küme merkezi = (lat_sum / count, lng_sum / count)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    lat_sum = db.Column(db.Float, nullable=False, default=0.0)
+    lng_sum = db.Column(db.Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('level', 'cell_x', 'cell_y', name='unique_map_cluster_cell'),
+    )
+    
+    def __repr__(self):
+        return f'<MapClusterCell L{self.level} ({self.cell_x},{self.cell_y})={self.count}>'
+
+
+class JobLease(db.Model):
+    """Arka plan işi kilidi - aynı işi birden fazla worker'ın aynı anda çalıştırmasını engeller"""
+    __tablename__ = 'job_leases'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<JobLease {self.name} owner={self.owner}>'
+
+
+class UserDailyActivity(db.Model):
+    """Kullanıcı başına günlük aktivite özeti - istatistik grafikleri tek range sorgusu ile okunur"""
+    __tablename__ = 'user_daily_activity'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # UTC gün
+    
+    posts = db.Column(db.Integer, nullable=False, default=0)  # Oluşturulan ilanlar
+    applications_sent = db.Column(db.Integer, nullable=False, default=0)  # Yapılan başvurular
+    applications_received = db.Column(db.Integer, nullable=False, default=0)  # İlanlara gelen başvurular
+    views = db.Column(db.Integer, nullable=False, default=0)  # İlanların o günkü görüntülenmeleri
+    
+    __table_args__ = (
+        # (user_id, day) range sorgusu bu index'ten okunur
+        db.UniqueConstraint('user_id', 'day', name='unique_user_daily_activity'),
+    )
+    
+    def __repr__(self):
+        return f'<UserDailyActivity user={self.user_id} {self.day}>'
+
+
+class RatingSummary(db.Model):
+    """Kullanıcı başına değerlendirme özeti - yıldız histogramı ve alt puan toplamları"""
+    __tablename__ = 'rating_summaries'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Yıldız histogramı
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Alt puanlar opsiyonel - ortalama için ayrı adet tutulur
+    professionalism_sum = db.Column(db.Integer, nullable=False, default=0)
+    professionalism_count = db.Column(db.Integer, nullable=False, default=0)
+    communication_sum = db.Column(db.Integer, nullable=False, default=0)
+    communication_count = db.Column(db.Integer, nullable=False, default=0)
+    quality_sum = db.Column(db.Integer, nullable=False, default=0)
+    quality_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<RatingSummary user={self.user_id} count={self.rating_count}>'
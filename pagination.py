@@ -0,0 +1,141 @@
+"""
+Keyset (cursor) Pagination
+OFFSET yerine son görülen satırın sıralama anahtarından devam eder -
+sayfa maliyeti kaç sayfa kaydırıldığından bağımsız kalır
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(values):
+    """Sıralama anahtarı değerlerini URL-güvenli cursor string'ine çevir"""
+    payload = [
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _matches_type(value, expected):
+    # None: sıralama kolonu NULL olabilir; bool JSON'da int gibi görünür, ayrıca elenir
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return expected is bool
+    if expected is None:
+        return isinstance(value, (int, float, str))
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def column_type(column):
+    """Kolonun Python tipi (tipi bilinmeyen ifadelerde None)"""
+    try:
+        return column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def decode_cursor(cursor, types=None):
+    """
+    Cursor string'ini değer listesine çevir
+
+    Args:
+        types: Beklenen Python tipleri (her değer için bir tane) - verilirse eleman
+            sayısı veya tipi uymayan cursor bozuk sayılır (değerler sorguya bind edilir)
+
+    Returns:
+        list veya None (cursor boş ya da bozuksa)
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, list):
+        return None
+
+    values = []
+    for value in payload:
+        if isinstance(value, dict) and 'dt' in value:
+            try:
+                value = datetime.fromisoformat(value['dt'])
+            except (TypeError, ValueError):
+                return None
+        values.append(value)
+
+    if types is not None:
+        if len(values) != len(types):
+            return None
+        if not all(_matches_type(value, expected) for value, expected in zip(values, types)):
+            return None
+    return values
+
+
+def _after_cursor(order_by, values):
+    """
+    (a, b, c) > (x, y, z) karşılaştırmasını her kolonun yönüne göre kur:
+    a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(order_by):
+        equal_prefix = [order_by[j][0] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def paginate(query, order_by, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Sorguyu keyset yöntemiyle sayfala
+
+    Args:
+        query: SQLAlchemy sorgusu (filtreler uygulanmış, sıralamasız)
+        order_by: [(kolon ifadesi, azalan_mı), ...] - son kolon benzersiz olmalı (örn. id)
+        cursor: Önceki sayfanın next_cursor değeri
+        limit: Sayfa boyutu
+
+    Returns:
+        tuple: (kayıtlar, next_cursor) - son sayfada next_cursor None
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+    values = decode_cursor(cursor, [column_type(column) for column, _ in order_by])
+    if values is not None:
+        query = query.filter(_after_cursor(order_by, values))
+
+    ordering = [column.desc() if descending else column.asc() for column, descending in order_by]
+    # Sonraki sayfa var mı anlamak için bir fazlasını çek (COUNT sorgusu yok)
+    rows = query.order_by(*ordering).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(_row_key(rows[-1], order_by))
+
+    # (entity, ek kolon...) satırlarında sadece entity döndürülür
+    items = [row[0] if hasattr(row, '_mapping') else row for row in rows]
+    return items, next_cursor
+
+
+def _row_key(row, order_by):
+    """Satırdan sıralama anahtarı değerlerini çıkar"""
+    # Sorgu add_columns() ile ek kolon (örn. arama rank'i) seçtiyse Row döner
+    is_row = hasattr(row, '_mapping')
+    entity = row[0] if is_row else row
+    key = []
+    for column, _ in order_by:
+        if hasattr(entity, column.key):
+            key.append(getattr(entity, column.key))
+        else:
+            key.append(row._mapping[column.key])
+    return key
@@ -0,0 +1,210 @@
+"""
+Platform Stats - Platform geneli istatistik snapshot'ı
+Ağır COUNT / GROUP BY sorguları istek içinde çalışmaz: arka plan thread'i snapshot'ı
+periyodik olarak hesaplayıp cache katmanına (Redis veya SimpleCache) hesaplama
+zamanı ile birlikte yazar. Okuma stale-while-revalidate: snapshot eskiyse eski değer
+hemen döner ve yenileme arka planda tetiklenir. Snapshot iki katmanlı cache'ten okunur:
+Redis varsa her istek ağa gitmez, yenilenince diğer worker'ların kopyası pub/sub ile düşer.
+
+Ayarlar (app.config / env):
+    PLATFORM_STATS_REFRESH_INTERVAL : Periyodik yenileme aralığı, saniye (0 = kapalı)
+    PLATFORM_STATS_STALE_SECONDS    : Bu yaştan eski snapshot okunurken yenileme tetiklenir
+"""
+import os
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, case
+from models import db, User, TevkilPost, Application
+from cache_config import cache, tiered_cache
+
+SNAPSHOT_KEY = 'platform_stats_snapshot'
+REFRESH_LOCK_KEY = 'platform_stats_refreshing'
+REFRESH_LOCK_TIMEOUT = 120
+DEFAULT_REFRESH_INTERVAL = 300
+DEFAULT_STALE_SECONDS = 300
+
+
+def _counts(model, since):
+    """Toplam ve son 7 gün sayısı tek sorguda"""
+    return db.session.query(
+        func.count(model.id),
+        func.count(case((model.created_at >= since, 1)))
+    ).one()
+
+
+def compute_platform_stats(unique_viewers=None):
+    """
+    Platform istatistiklerini hesapla (ağır - sadece arka planda çağrılır)
+
+    Sonuç sadece düz Python değerleri içerir; cache'e güvenle yazılabilir.
+    """
+    seven_days_ago = datetime.utcnow() - timedelta(days=7)
+
+    total_users, new_users_7d = _counts(User, seven_days_ago)
+    total_applications, new_applications_7d = _counts(Application, seven_days_ago)
+    total_posts, new_posts_7d, active_posts = db.session.query(
+        func.count(TevkilPost.id),
+        func.count(case((TevkilPost.created_at >= seven_days_ago, 1))),
+        func.count(case((TevkilPost.status == 'active', 1)))
+    ).one()
+
+    post_count = func.count(TevkilPost.id)
+    city_stats = db.session.query(TevkilPost.city, post_count).group_by(
+        TevkilPost.city
+    ).order_by(post_count.desc()).limit(10).all()
+    category_stats = db.session.query(TevkilPost.category, post_count).group_by(
+        TevkilPost.category
+    ).order_by(post_count.desc()).all()
+
+    top_creators = db.session.query(User.id, User.full_name, User.total_posts_created).order_by(
+        User.total_posts_created.desc()
+    ).limit(5).all()
+    top_viewed = db.session.query(TevkilPost.id, TevkilPost.title, TevkilPost.view_count).order_by(
+        TevkilPost.view_count.desc()
+    ).limit(5).all()
+
+    stats = {
+        'total_users': total_users,
+        'total_posts': total_posts,
+        'total_applications': total_applications,
+        'active_posts': active_posts,
+        'new_users_7d': new_users_7d,
+        'new_posts_7d': new_posts_7d,
+        'new_applications_7d': new_applications_7d,
+        'city_stats': [(city, count) for city, count in city_stats],
+        'category_stats': [(category, count) for category, count in category_stats],
+        'top_creators': [
+            {'id': id, 'full_name': full_name, 'total_posts_created': total or 0}
+            for id, full_name, total in top_creators
+        ],
+        'top_viewed': [
+            {'id': id, 'title': title, 'view_count': views or 0}
+            for id, title, views in top_viewed
+        ],
+    }
+    if unique_viewers is not None:
+        stats['daily_unique_viewers'] = unique_viewers.daily_unique_viewers(7)
+        stats['unique_viewers_7d'] = unique_viewers.unique_viewers_between(7)
+    return stats
+
+
+class PlatformStatsSnapshot:
+    """Snapshot okuma, yenileme ve periyodik yenileme thread'i"""
+
+    def __init__(self):
+        self.app = None
+        self.unique_viewers = None
+        self.refresh_interval = DEFAULT_REFRESH_INTERVAL
+        self.stale_seconds = DEFAULT_STALE_SECONDS
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, unique_viewers=None):
+        self.app = app
+        self.unique_viewers = unique_viewers
+        self.refresh_interval = float(app.config.get(
+            'PLATFORM_STATS_REFRESH_INTERVAL', os.getenv('PLATFORM_STATS_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL)))
+        self.stale_seconds = float(app.config.get(
+            'PLATFORM_STATS_STALE_SECONDS', os.getenv('PLATFORM_STATS_STALE_SECONDS', DEFAULT_STALE_SECONDS)))
+
+    def refresh(self):
+        """
+        Snapshot'ı şimdi hesapla ve cache'e yaz
+
+        Aynı anda tek yenileme: cache.add kilidi (Redis'te tüm worker'lar arasında).
+
+        Returns:
+            dict veya None (başka bir yenileme sürüyorsa)
+        """
+        if not cache.add(REFRESH_LOCK_KEY, 1, timeout=REFRESH_LOCK_TIMEOUT):
+            return None
+        try:
+            started = time.time()
+            with self.app.app_context():
+                stats = compute_platform_stats(self.unique_viewers)
+                db.session.remove()
+            snapshot = {
+                'stats': stats,
+                'computed_at': datetime.now(timezone.utc).isoformat(),
+                'computed_ts': time.time(),
+                'duration_ms': round((time.time() - started) * 1000, 1),
+            }
+            # Süresiz sakla - tazelik computed_ts ile belirlenir (stale değer yenilenene kadar sunulur)
+            tiered_cache.set(SNAPSHOT_KEY, snapshot, timeout=0)
+            return snapshot
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+
+    def refresh_async(self):
+        """Yenilemeyi arka plan thread'inde başlat (istek bekletilmez)"""
+        thread = threading.Thread(target=self._safe_refresh, name='platform-stats-refresh', daemon=True)
+        thread.start()
+        return thread
+
+    def get(self):
+        """
+        Snapshot'ı oku (stale-while-revalidate)
+
+        Returns:
+            dict: {'stats', 'computed_at', 'duration_ms', 'age_seconds', 'stale'} veya
+            None (henüz hiç hesaplanmadıysa - hesaplama arka planda başlatılır)
+        """
+        snapshot = tiered_cache.get(SNAPSHOT_KEY)
+        if snapshot is None:
+            self.refresh_async()
+            return None
+        age = time.time() - snapshot['computed_ts']
+        stale = age > self.stale_seconds
+        if stale:
+            self.refresh_async()
+        return {**snapshot, 'age_seconds': round(age, 1), 'stale': stale}
+
+    def start(self):
+        if self.refresh_interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='platform-stats-scheduler', daemon=True)
+            self._thread.start()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f'❌ Platform istatistikleri yenilenemedi: {e}')
+
+    def _run(self):
+        stop = threading.Event()
+        while True:
+            snapshot = tiered_cache.get(SNAPSHOT_KEY)
+            # Başka bir worker yakın zamanda yenilediyse tekrar hesaplama
+            if snapshot is None or time.time() - snapshot['computed_ts'] >= self.refresh_interval:
+                self._safe_refresh()
+            if stop.wait(self.refresh_interval):
+                return
+
+
+platform_stats = PlatformStatsSnapshot()
+
+
+def init_platform_stats(app, unique_viewers=None):
+    """Platform istatistik snapshot'ını kaydet: ilk istekte zamanlayıcı + CLI komutu"""
+    platform_stats.init_app(app, unique_viewers)
+
+    @app.before_request
+    def _start_platform_stats_scheduler():
+        if not app.config.get('TESTING'):
+            platform_stats.start()
+
+    @app.cli.command('platform-stats-refresh')
+    def platform_stats_refresh():
+        """Recompute the platform statistics snapshot"""
+        snapshot = platform_stats.refresh()
+        if snapshot is None:
+            print('⏭️  Yenileme zaten sürüyor')
+        else:
+            print(f'✅ Platform istatistikleri yenilendi ({snapshot["duration_ms"]} ms)')
+
+    return platform_stats
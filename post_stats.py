@@ -0,0 +1,91 @@
+"""
+Post Stats - İlan başvuru istatistikleri
+Başvuru sayıları ve ortalama başvuru süresi tek bir SQL aggregate ile hesaplanır,
+ilan başına kısa süreli cache'te tutulur. Başvuru eklenince/durumu değişince
+ilgili ilanın cache'i commit sonrası silinir.
+"""
+from sqlalchemy import event, func, case, extract
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.attributes import get_history, PASSIVE_NO_INITIALIZE
+from models import db, TevkilPost, Application
+from cache_config import tiered_cache
+from commit_hooks import defer_until_commit
+
+STATS_CACHE_TIMEOUT = 60  # saniye
+STALE_KEY = 'stale_post_stats'
+
+
+def _cache_key(post_id):
+    return f'post_stats_{post_id}'
+
+
+def _hours_between(start, end):
+    """İki DateTime kolonu arasındaki fark (saat) - dialect'e göre"""
+    if db.engine.dialect.name == 'postgresql':
+        return extract('epoch', end - start) / 3600.0
+    return (func.julianday(end) - func.julianday(start)) * 24.0
+
+
+def _application_aggregate(post_id):
+    """Başvuru sayıları + ortalama başvuru süresi: tek sorgu"""
+    row = db.session.query(
+        func.count(Application.id),
+        func.count(case((Application.status == 'accepted', 1))),
+        func.count(case((Application.status == 'rejected', 1))),
+        func.count(case((Application.status == 'pending', 1))),
+        func.avg(_hours_between(TevkilPost.created_at, Application.created_at)),
+        func.min(Application.created_at),
+    ).select_from(Application).join(
+        TevkilPost, TevkilPost.id == Application.post_id
+    ).filter(
+        Application.post_id == post_id
+    ).one()
+
+    total, accepted, rejected, pending, avg_hours, first_at = row
+    return {
+        'application_count': total,
+        'accepted_count': accepted,
+        'rejected_count': rejected,
+        'pending_count': pending,
+        'avg_time_to_apply_hours': round(float(avg_hours or 0), 1),
+        'first_application_at': first_at,
+    }
+
+
+def get_application_stats(post_id):
+    """Başvuru aggregate'i (cache'li)"""
+    return tiered_cache.get_or_set(
+        _cache_key(post_id), lambda: _application_aggregate(post_id), timeout=STATS_CACHE_TIMEOUT
+    )
+
+
+def invalidate_post_stats(*post_ids):
+    for post_id in post_ids:
+        tiered_cache.delete(_cache_key(post_id))
+
+
+# ============================================
+# CACHE INVALIDATION - Başvuru eklenince/durumu değişince
+# ============================================
+
+def _mark_stale(target):
+    # İlan ID'leri session üzerinde toplanır, commit sonrası silinir (bkz. commit_hooks)
+    defer_until_commit(object_session(target), STALE_KEY, [target.post_id],
+                       lambda post_ids: invalidate_post_stats(*post_ids))
+
+
+@event.listens_for(Application, 'after_insert')
+def _application_inserted(mapper, connection, target):
+    _mark_stale(target)
+
+
+@event.listens_for(Application, 'after_update')
+def _application_updated(mapper, connection, target):
+    if get_history(target, 'status', passive=PASSIVE_NO_INITIALIZE).has_changes():
+        _mark_stale(target)
+
+
+@event.listens_for(Application, 'after_delete')
+def _application_deleted(mapper, connection, target):
+    _mark_stale(target)
+
@@ -0,0 +1,290 @@
+"""
+Presence - Worker'lar arası çevrimiçi kullanıcı kaydı
+Kullanıcı başına birden fazla Socket.IO bağlantısı (sid) tutulur; her sid'in
+heartbeat ile yenilenen bir son kullanma zamanı vardır. Son sid'i kapanan veya
+heartbeat'i kesilen kullanıcı çevrimdışı sayılır (worker çökse bile kayıt kalmaz).
+Heartbeat'i kesilenler disconnect olayı gelmediği için hafif bir tarama ile bulunur
+ve aynı debounce'lu yayınla duyurulur.
+
+Backend'ler:
+    RedisPresenceBackend : REDIS_URL varsa - kullanıcı başına sorted set
+                           (üye = sid, skor = son kullanma zamanı); tüm worker'lar paylaşır
+    LocalPresenceBackend : Redis yoksa / testlerde - süreç içi dict
+
+Toplu durum sorgusu k kullanıcı için O(k): Redis'te tek pipeline (kullanıcı başına ZCOUNT).
+
+Durum değişiklikleri herkese yayınlanmaz: istemciler gösterdikleri kullanıcılara abone
+olur (`presence_<user_id>` odası) ve değişiklik yalnızca o odaya gider. Yayın debounce
+edilir - süre dolduğunda güncel durum son yayınlanan durumla aynıysa (hızlı bağlan/kop,
+deploy sonrası yeniden bağlanma) hiçbir şey gönderilmez.
+
+Ayarlar (app.config / env):
+    PRESENCE_TTL      : Heartbeat gelmezse sid'in düşme süresi, saniye
+    PRESENCE_DEBOUNCE : Durum değişikliğinin yayınlanmadan önce beklediği süre, saniye
+"""
+import os
+import time
+import threading
+
+from cache_config import cache
+from models import User
+
+try:
+    import redis
+except ImportError:  # Redis opsiyonel - yoksa süreç içi kayıt
+    redis = None
+
+DEFAULT_TTL = 60
+DEFAULT_DEBOUNCE = 2.0
+SWEEP_INTERVAL = 5.0
+KEY_PREFIX = 'presence:user:'
+EXPIRY_KEY = 'presence:expiry'  # kullanıcı -> son sid'inin son kullanma zamanı
+LAST_STATUS_PREFIX = 'presence_last_status_'
+LAST_STATUS_TIMEOUT = 86400
+
+
+def presence_room(user_id):
+    """Kullanıcının durumuna abone olan bağlantıların odası"""
+    return f'presence_{user_id}'
+
+
+class LocalPresenceBackend:
+    """Süreç içi kayıt: {user_id: {sid: son_kullanma}}"""
+
+    def __init__(self):
+        self._users = {}
+        self._expired = set()  # Son sid'i süre dolumuyla düşen, henüz duyurulmamış kullanıcılar
+        self._lock = threading.Lock()
+
+    def _live(self, user_id, now):
+        sids = self._users.get(user_id)
+        if not sids:
+            return {}
+        for sid in [sid for sid, expires in sids.items() if expires <= now]:
+            del sids[sid]
+        if not sids:
+            del self._users[user_id]
+            self._expired.add(user_id)
+        return sids
+
+    def add(self, user_id, sid, ttl):
+        now = time.time()
+        with self._lock:
+            was_online = bool(self._live(user_id, now))
+            self._users.setdefault(user_id, {})[sid] = now + ttl
+            self._expired.discard(user_id)
+            return not was_online
+
+    def remove(self, user_id, sid):
+        with self._lock:
+            sids = self._users.get(user_id)
+            if sids is not None:
+                sids.pop(sid, None)
+                if not sids:
+                    del self._users[user_id]
+            offline = not self._live(user_id, time.time())
+            if offline:
+                self._expired.discard(user_id)  # Çağıran disconnect'i kendisi duyurur
+            return offline
+
+    def refresh(self, user_id, sid, ttl):
+        with self._lock:
+            self._users.setdefault(user_id, {})[sid] = time.time() + ttl
+
+    def online(self, user_ids):
+        now = time.time()
+        with self._lock:
+            return {user_id: bool(self._live(user_id, now)) for user_id in user_ids}
+
+    def pop_expired(self):
+        now = time.time()
+        with self._lock:
+            for user_id in list(self._users):
+                self._live(user_id, now)
+            expired, self._expired = self._expired, set()
+        return list(expired)
+
+
+class RedisPresenceBackend:
+    """Redis kaydı: kullanıcı başına sorted set (sid -> son kullanma zamanı)"""
+
+    def __init__(self, client):
+        self.redis = client
+
+    def add(self, user_id, sid, ttl):
+        key = f'{KEY_PREFIX}{user_id}'
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.zcard(key)
+        pipe.zadd(key, {sid: now + ttl})
+        pipe.expire(key, int(ttl) + 1)
+        pipe.zadd(EXPIRY_KEY, {user_id: now + ttl})
+        _, live_before, _, _, _ = pipe.execute()
+        return live_before == 0
+
+    def remove(self, user_id, sid):
+        key = f'{KEY_PREFIX}{user_id}'
+        pipe = self.redis.pipeline()
+        pipe.zrem(key, sid)
+        pipe.zremrangebyscore(key, '-inf', time.time())
+        pipe.zcard(key)
+        offline = pipe.execute()[-1] == 0
+        if offline:
+            self.redis.zrem(EXPIRY_KEY, user_id)  # Çağıran disconnect'i kendisi duyurur
+        return offline
+
+    def refresh(self, user_id, sid, ttl):
+        key = f'{KEY_PREFIX}{user_id}'
+        expires = time.time() + ttl
+        pipe = self.redis.pipeline()
+        pipe.zadd(key, {sid: expires})
+        pipe.expire(key, int(ttl) + 1)
+        pipe.zadd(EXPIRY_KEY, {user_id: expires})
+        pipe.execute()
+
+    def online(self, user_ids):
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zcount(f'{KEY_PREFIX}{user_id}', f'({now}', '+inf')
+        return {user_id: count > 0 for user_id, count in zip(user_ids, pipe.execute())}
+
+    def pop_expired(self):
+        # Tüm sid'ler aynı TTL ile yenilendiği için skor kullanıcının en geç sid'inin süresidir.
+        # ZREM ile sahiplenilir - birden fazla worker tarıyorsa kullanıcıyı yalnızca biri duyurur
+        candidates = self.redis.zrangebyscore(EXPIRY_KEY, '-inf', time.time())
+        if not candidates:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for member in candidates:
+            pipe.zrem(EXPIRY_KEY, member)
+        return [int(member) for member, claimed in zip(candidates, pipe.execute()) if claimed]
+
+
+class PresenceRegistry:
+    """Bağlantı/heartbeat olaylarını backend'e ileten kayıt + debounce'lu durum yayını"""
+
+    def __init__(self):
+        self.ttl = DEFAULT_TTL
+        self.debounce = DEFAULT_DEBOUNCE
+        self.backend = LocalPresenceBackend()
+        self.app = None
+        self.socketio = None
+        self._pending = {}  # user_id -> full_name (yayını bekleyen kullanıcılar)
+        self._pending_lock = threading.Lock()
+        self._sweeper_running = False
+        self._metrics = {'announced': 0, 'suppressed': 0, 'expired': 0}
+
+    def init_app(self, app, redis_url=None, socketio=None):
+        self.ttl = float(app.config.get('PRESENCE_TTL', os.getenv('PRESENCE_TTL', DEFAULT_TTL)))
+        self.debounce = float(app.config.get('PRESENCE_DEBOUNCE', os.getenv('PRESENCE_DEBOUNCE', DEFAULT_DEBOUNCE)))
+        self.app = app
+        self.socketio = socketio
+        if redis_url and redis is not None:
+            self.backend = RedisPresenceBackend(redis.from_url(redis_url))
+
+    def connect(self, user_id, sid):
+        """Bağlantıyı kaydet - kullanıcı yeni çevrimiçi olduysa True"""
+        self._ensure_sweeper()
+        return self.backend.add(user_id, sid, self.ttl)
+
+    def disconnect(self, user_id, sid):
+        """Bağlantıyı sil - kullanıcının başka canlı bağlantısı kalmadıysa True"""
+        return self.backend.remove(user_id, sid)
+
+    def heartbeat(self, user_id, sid):
+        self.backend.refresh(user_id, sid, self.ttl)
+
+    def is_online(self, user_id):
+        return self.backend.online([user_id])[user_id]
+
+    def online_status(self, user_ids):
+        """{user_id: çevrimiçi_mi} - k kullanıcı için tek toplu sorgu"""
+        return self.backend.online(list(user_ids))
+
+    # ----- Durum yayını -----
+
+    def announce(self, user_id, full_name):
+        """Kullanıcının durum değişikliğini debounce süresi sonunda abonelerine yayınla"""
+        if self.socketio is None:
+            return
+        with self._pending_lock:
+            already_pending = user_id in self._pending
+            self._pending[user_id] = full_name
+        if not already_pending:
+            self.socketio.start_background_task(self._announce_later, user_id)
+
+    def _announce_later(self, user_id):
+        self.socketio.sleep(self.debounce)
+        with self._pending_lock:
+            full_name = self._pending.pop(user_id, None)
+        online = self.is_online(user_id)
+
+        # Son yayınlanan durum cache'te (Redis'te worker'lar arası ortak) tutulur
+        with self.app.app_context():
+            key = f'{LAST_STATUS_PREFIX}{user_id}'
+            if cache.get(key) == online:
+                self._metrics['suppressed'] += 1
+                return
+            cache.set(key, online, timeout=LAST_STATUS_TIMEOUT)
+
+        self._metrics['announced'] += 1
+        self.socketio.emit('user_status', {
+            'user_id': user_id,
+            'status': 'online' if online else 'offline',
+            'full_name': full_name
+        }, room=presence_room(user_id))
+
+    # ----- Heartbeat'i kesilenlerin taranması -----
+
+    def _ensure_sweeper(self):
+        if self.socketio is None or self._sweeper_running:
+            return
+        with self._pending_lock:
+            if self._sweeper_running:
+                return
+            self._sweeper_running = True
+        self.socketio.start_background_task(self._sweep)
+
+    def _sweep(self):
+        # Worker başına bir tarayıcı; Redis'te kayıt ortak olduğundan çöken worker'ın
+        # kullanıcıları da diğer worker'larca duyurulur
+        while True:
+            self.socketio.sleep(SWEEP_INTERVAL)
+            try:
+                self.sweep_expired()
+            except Exception as e:
+                print(f"⚠️ Presence taraması başarısız: {e}")
+
+    def sweep_expired(self):
+        """Son sid'i heartbeat kesilerek düşen kullanıcıları duyur - duyurulan sayısı"""
+        user_ids = self.backend.pop_expired()
+        if not user_ids:
+            return 0
+        online = self.online_status(user_ids)
+        user_ids = [user_id for user_id in user_ids if not online[user_id]]
+        if not user_ids:
+            return 0
+
+        with self.app.app_context():
+            names = dict(User.query.with_entities(User.id, User.full_name).filter(User.id.in_(user_ids)))
+        for user_id in user_ids:
+            self.announce(user_id, names.get(user_id))
+        self._metrics['expired'] += len(user_ids)
+        return len(user_ids)
+
+    def get_metrics(self):
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {**self._metrics, 'pending': pending, 'debounce': self.debounce, 'ttl': self.ttl,
+                'backend': type(self.backend).__name__}
+
+
+presence = PresenceRegistry()
+
+
+def init_presence(app, socketio=None):
+    """Presence kaydını başlat (REDIS_URL varsa worker'lar arası)"""
+    presence.init_app(app, app.config.get('REDIS_URL'), socketio)
+    return presence
@@ -0,0 +1,162 @@
+"""
+Rating Service - Kullanıcı başına değerlendirme özeti (rating_summaries)
+Rating eklenince, düzenlenince veya silinince kullanıcının özet satırı aynı
+transaction'da atomik upsert ile güncellenir: yıldız histogramı, toplam puan ve
+alt puan (profesyonellik, iletişim, kalite) toplamları. Profil, dashboard ve istatistik
+sayfaları değerlendirmeleri taramak yerine tek satırlık özeti okur.
+"""
+from sqlalchemy import event, func, select, case, inspect as sa_inspect
+from sqlalchemy.orm.attributes import get_history, PASSIVE_NO_INITIALIZE
+from models import db, Rating, RatingSummary
+from upsert import upsert
+
+STARS = (5, 4, 3, 2, 1)
+SUB_SCORES = ('professionalism', 'communication', 'quality')
+RATING_FIELDS = ('reviewed_id', 'rating') + SUB_SCORES
+PROFILE_RATINGS_LIMIT = 20  # Profilde listelenen son yorum sayısı
+
+_table = RatingSummary.__table__
+_ratings = Rating.__table__
+
+
+def _contribution(values, sign):
+    """Tek değerlendirmenin özet kolonlarına katkısı: {kolon: ±fark}"""
+    deltas = {}
+    rating = values.get('rating')
+    if rating is not None:
+        deltas['rating_count'] = sign
+        deltas['rating_sum'] = sign * rating
+        if 1 <= rating <= 5:
+            deltas[f'stars_{rating}'] = sign
+    for score in SUB_SCORES:
+        if values.get(score) is not None:
+            deltas[f'{score}_sum'] = sign * values[score]
+            deltas[f'{score}_count'] = sign
+    return deltas
+
+
+def adjust_summary(connection, user_id, deltas):
+    """Kullanıcının özet satırına farkları atomik olarak uygula (satır yoksa oluştur)"""
+    deltas = {column: amount for column, amount in deltas.items() if amount}
+    if user_id is None or not deltas:
+        return
+    upsert(connection, _table, dict(
+        user_id=user_id,
+        **{column.name: deltas.get(column.name, 0) for column in _table.c if column.name != 'user_id'}
+    ), index_elements=('user_id',), set_={
+        column: _table.c[column] + amount for column, amount in deltas.items()
+    })
+
+
+def _rebuild(connection):
+    """Özet tablosunu değerlendirmelerden set tabanlı INSERT ... SELECT ile yeniden oluştur"""
+    def total(condition, value=1):
+        return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+    columns = {
+        'user_id': _ratings.c.reviewed_id,
+        'rating_count': func.count(_ratings.c.id),
+        'rating_sum': func.coalesce(func.sum(_ratings.c.rating), 0),
+        **{f'stars_{star}': total(_ratings.c.rating == star) for star in STARS},
+    }
+    for score in SUB_SCORES:
+        columns[f'{score}_sum'] = func.coalesce(func.sum(_ratings.c[score]), 0)
+        columns[f'{score}_count'] = func.count(_ratings.c[score])
+
+    connection.execute(_table.delete())
+    query = select(*[expr.label(name) for name, expr in columns.items()]).group_by(_ratings.c.reviewed_id)
+    result = connection.execute(_table.insert().from_select(list(columns), query))
+    return result.rowcount
+
+
+def ensure_rating_summary_table():
+    """Özet tablosunu (yoksa) oluştur ve değerlendirmelerden doldur (migration 6)"""
+    with db.engine.begin() as connection:
+        if sa_inspect(connection).has_table(_table.name):
+            return
+        _table.create(connection)
+        count = _rebuild(connection)
+        print(f'⭐ Değerlendirme özeti oluşturuldu: {count} kullanıcı')
+
+
+def rebuild_rating_summaries():
+    """Özet tablosunu değerlendirmelerden yeniden hesapla"""
+    with db.engine.begin() as connection:
+        return _rebuild(connection)
+
+
+def get_rating_summary(user_id):
+    """
+    Kullanıcının değerlendirme özeti (tek satır okuma)
+
+    Returns:
+        dict: {'count', 'average', 'breakdown': {5: .., 4: .., ...},
+               'professionalism', 'communication', 'quality'} - alt puan yoksa None
+    """
+    row = db.session.get(RatingSummary, user_id)
+    if row is None:
+        return {
+            'count': 0, 'average': 0.0,
+            'breakdown': {star: 0 for star in STARS},
+            **{score: None for score in SUB_SCORES},
+        }
+    summary = {
+        'count': row.rating_count,
+        'average': row.rating_sum / row.rating_count if row.rating_count else 0.0,
+        'breakdown': {star: getattr(row, f'stars_{star}') for star in STARS},
+    }
+    for score in SUB_SCORES:
+        count = getattr(row, f'{score}_count')
+        summary[score] = getattr(row, f'{score}_sum') / count if count else None
+    return summary
+
+
+# ============================================
+# ORM EVENTS - Özeti değerlendirmelerle senkron tut
+# ============================================
+
+def _values(target):
+    return {field: getattr(target, field) for field in RATING_FIELDS}
+
+
+def _old_values(target):
+    values = {}
+    for field in RATING_FIELDS:
+        history = get_history(target, field, passive=PASSIVE_NO_INITIALIZE)
+        values[field] = history.deleted[0] if history.deleted else getattr(target, field)
+    return values
+
+
+@event.listens_for(Rating, 'after_insert')
+def _rating_inserted(mapper, connection, target):
+    adjust_summary(connection, target.reviewed_id, _contribution(_values(target), 1))
+
+
+@event.listens_for(Rating, 'after_update')
+def _rating_updated(mapper, connection, target):
+    old, new = _old_values(target), _values(target)
+    if old == new:
+        return
+    if old['reviewed_id'] == new['reviewed_id']:
+        deltas = _contribution(old, -1)
+        for column, amount in _contribution(new, 1).items():
+            deltas[column] = deltas.get(column, 0) + amount
+        adjust_summary(connection, new['reviewed_id'], deltas)
+    else:
+        adjust_summary(connection, old['reviewed_id'], _contribution(old, -1))
+        adjust_summary(connection, new['reviewed_id'], _contribution(new, 1))
+
+
+@event.listens_for(Rating, 'after_delete')
+def _rating_deleted(mapper, connection, target):
+    adjust_summary(connection, target.reviewed_id, _contribution(_old_values(target), -1))
+
+
+def init_ratings(app):
+    """Değerlendirme özetini kaydet: CLI komutu"""
+
+    @app.cli.command('rating-summary-rebuild')
+    def rating_summary_rebuild():
+        """Rebuild rating_summaries from the ratings table"""
+        count = rebuild_rating_summaries()
+        print(f'✅ {count} kullanıcının değerlendirme özeti yeniden hesaplandı')
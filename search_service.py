@@ -0,0 +1,220 @@
+"""
+Search Service - İlan tam metin arama
+SQLite: FTS5 sanal tablo, PostgreSQL: tsvector + GIN index
+Türkçe harf katlama (İ/i, I/ı) ile normalize edilmiş token'lar
+Index tablosu create_all ile tevkil_posts'la birlikte (after_create), mevcut
+veritabanlarında migration 1 ile kurulur.
+"""
+import re
+from sqlalchemy import event, text, inspect as sa_inspect
+from models import db, TevkilPost
+
+FTS_TABLE = 'tevkil_posts_fts'
+PG_TABLE = 'tevkil_posts_search'
+
+# Başlık eşleşmeleri açıklamaya göre daha değerli
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Türkçe büyük/küçük harf dönüşümü - str.lower() 'İ' için 'i̇' üretir
+_TR_UPPER_TO_LOWER = str.maketrans({'İ': 'i', 'I': 'ı'})
+# Aksan katlama - "sanliurfa" aramasının "Şanlıurfa" bulması için
+_TR_FOLD = str.maketrans({
+    'ç': 'c', 'ğ': 'g', 'ı': 'i', 'ö': 'o', 'ş': 's', 'ü': 'u',
+    'â': 'a', 'î': 'i', 'û': 'u',
+})
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_turkish(value):
+    """
+    Metni Türkçe kurallarına göre küçült ve aksanları katla
+
+    Örnek: "İSTANBUL Ağır Ceza" → "istanbul agir ceza"
+    """
+    if not value:
+        return ''
+    lowered = value.translate(_TR_UPPER_TO_LOWER).lower()
+    return lowered.translate(_TR_FOLD)
+
+
+def tokenize(value):
+    """Normalize edilmiş token listesi"""
+    return _TOKEN_RE.findall(normalize_turkish(value))
+
+
+def _dialect(bind):
+    return bind.dialect.name
+
+
+def _index_table(connection):
+    return PG_TABLE if _dialect(connection) == 'postgresql' else FTS_TABLE
+
+
+def _create_index(connection):
+    if _dialect(connection) == 'postgresql':
+        connection.execute(text(f"""
+            CREATE TABLE {PG_TABLE} (
+                post_id INTEGER PRIMARY KEY REFERENCES tevkil_posts(id) ON DELETE CASCADE,
+                document tsvector NOT NULL
+            )
+        """))
+        connection.execute(text(f"""
+            CREATE INDEX idx_{PG_TABLE}_document ON {PG_TABLE} USING GIN (document)
+        """))
+    else:
+        # Metin Python tarafında normalize edildiği için unicode61 yeterli
+        connection.execute(text(f"""
+            CREATE VIRTUAL TABLE {FTS_TABLE}
+            USING fts5(title, description, tokenize = 'unicode61 remove_diacritics 2')
+        """))
+
+
+@event.listens_for(TevkilPost.__table__, 'after_create')
+def _posts_table_created(table, connection, **kw):
+    # create_all ile kurulan yeni veritabanı: tablo boş, backfill gerekmez
+    if not sa_inspect(connection).has_table(_index_table(connection)):
+        _create_index(connection)
+
+
+def ensure_search_index():
+    """Arama index tablosunu (yoksa) oluştur ve mevcut ilanlarla doldur (migration 1)"""
+    with db.engine.begin() as connection:
+        if sa_inspect(connection).has_table(_index_table(connection)):
+            return
+        _create_index(connection)
+
+        rows = connection.execute(text("SELECT id, title, description FROM tevkil_posts")).fetchall()
+        for post_id, title, description in rows:
+            _write_entry(connection, post_id, title, description)
+        print(f'🔎 Arama index\'i oluşturuldu: {len(rows)} ilan eklendi')
+
+
+def _write_entry(connection, post_id, title, description):
+    params = {
+        'post_id': post_id,
+        'title': ' '.join(tokenize(title)),
+        'description': ' '.join(tokenize(description)),
+    }
+
+    if _dialect(connection) == 'postgresql':
+        connection.execute(text(f"""
+            INSERT INTO {PG_TABLE} (post_id, document)
+            VALUES (:post_id,
+                    setweight(to_tsvector('simple', :title), 'A') ||
+                    setweight(to_tsvector('simple', :description), 'B'))
+            ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document
+        """), params)
+    else:
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :post_id"), params)
+        connection.execute(text(f"""
+            INSERT INTO {FTS_TABLE} (rowid, title, description)
+            VALUES (:post_id, :title, :description)
+        """), params)
+
+
+def index_post(connection, post_id, title, description):
+    """Tek bir ilanı index'e yaz (varsa üzerine yazar)"""
+    _write_entry(connection, post_id, title, description)
+
+
+def remove_post(connection, post_id):
+    """İlanı index'ten sil"""
+    table = _index_table(connection)
+    column = 'post_id' if table == PG_TABLE else 'rowid'
+    connection.execute(text(f"DELETE FROM {table} WHERE {column} = :post_id"), {'post_id': post_id})
+
+
+def rebuild_search_index():
+    """Tüm ilanları baştan index'le (backfill / onarım)"""
+    connection = db.session.connection()
+    connection.execute(text(f"DELETE FROM {_index_table(connection)}"))
+
+    count = 0
+    rows = db.session.query(TevkilPost.id, TevkilPost.title, TevkilPost.description).yield_per(1000)
+    for post_id, title, description in rows:
+        _write_entry(connection, post_id, title, description)
+        count += 1
+
+    db.session.commit()
+    return count
+
+
+def _build_match_query(search, dialect):
+    """Kullanıcı girdisini FTS sorgusuna çevir (her token ön ek eşleşmesi, AND)"""
+    tokens = tokenize(search)
+    if not tokens:
+        return None
+    if dialect == 'postgresql':
+        return ' & '.join(f'{token}:*' for token in tokens)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_posts(query, search):
+    """
+    İlan sorgusuna tam metin arama filtresi ve sıralaması uygula
+
+    Args:
+        query: TevkilPost sorgusu (filtreler uygulanmış)
+        search: Kullanıcının arama metni
+
+    Returns:
+        tuple: (filtrelenmiş sorgu, rank ifadesi) - rank küçükten büyüğe sıralanır.
+        Arama metninde token yoksa (query, None) döner.
+    """
+    dialect = db.engine.dialect.name
+
+    match = _build_match_query(search, dialect)
+    if match is None:
+        return query, None
+
+    if dialect == 'postgresql':
+        # ts_rank büyük = daha alakalı, negatifini alarak artan sıralamaya çevir
+        matches = text(f"""
+            SELECT post_id AS post_id,
+                   -ts_rank(document, to_tsquery('simple', :match)) AS rank
+            FROM {PG_TABLE}
+            WHERE document @@ to_tsquery('simple', :match)
+        """).bindparams(match=match).columns(post_id=db.Integer, rank=db.Float).subquery('search_matches')
+    else:
+        # bm25() değeri küçük = daha alakalı
+        matches = text(f"""
+            SELECT rowid AS post_id,
+                   bm25({FTS_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS rank
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH :match
+        """).bindparams(match=match).columns(post_id=db.Integer, rank=db.Float).subquery('search_matches')
+
+    query = query.join(matches, matches.c.post_id == TevkilPost.id)
+    return query, matches.c.rank
+
+
+# ============================================
+# ORM EVENTS - Index'i TevkilPost ile senkron tut
+# ============================================
+
+@event.listens_for(TevkilPost, 'after_insert')
+def _post_inserted(mapper, connection, target):
+    index_post(connection, target.id, target.title, target.description)
+
+
+@event.listens_for(TevkilPost, 'after_update')
+def _post_updated(mapper, connection, target):
+    state = db.inspect(target)
+    if state.attrs.title.history.has_changes() or state.attrs.description.history.has_changes():
+        index_post(connection, target.id, target.title, target.description)
+
+
+@event.listens_for(TevkilPost, 'after_delete')
+def _post_deleted(mapper, connection, target):
+    remove_post(connection, target.id)
+
+
+def init_search(app):
+    """Arama CLI komutlarını kaydet"""
+
+    @app.cli.command('search-reindex')
+    def search_reindex():
+        """Rebuild the post full-text search index"""
+        count = rebuild_search_index()
+        print(f'✅ {count} ilan arama index\'ine yazıldı')
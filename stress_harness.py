@@ -0,0 +1,79 @@
+"""
+Stress Harness - Eşzamanlılık ve performans betiklerinin ortak düzeneği
+test_concurrent_counters.py ve test_message_throughput.py tarafından kullanılır:
+    - DATABASE_URL verilmezse geçici SQLite veritabanı (app import edilmeden önce ayarlanır)
+    - Test ayarları: CSRF ve rate limit kapalı
+    - Oturum açmış test client'ı, test kullanıcısı, thread'leri aynı anda başlatma
+
+DATABASE_URL verilirse (ör. PostgreSQL test veritabanı) orada çalışılır - tablolar
+oluşturulur, veriler kalır.
+"""
+import os
+import sys
+import tempfile
+import threading
+
+_temp_db = None
+if not os.getenv('DATABASE_URL'):
+    _temp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    os.environ['DATABASE_URL'] = f'sqlite:///{_temp_db}'
+os.environ.setdefault('FLASK_ENV', 'production')
+
+from app import app, db, limiter
+from models import User
+
+app.config['TESTING'] = True
+app.config['WTF_CSRF_ENABLED'] = False
+limiter.enabled = False
+
+
+def client(user_id):
+    """Kullanıcı adına oturum açmış test client'ı"""
+    test_client = app.test_client()
+    with test_client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return test_client
+
+
+def create_tables():
+    with app.app_context():
+        db.create_all()
+
+
+def new_user(email, full_name):
+    """Şifresi 'test' olan kullanıcı (session'a eklenmez)"""
+    user = User(email=email, full_name=full_name)
+    user.set_password('test')
+    return user
+
+
+def run_parallel(targets):
+    """Her hedefi ayrı thread'de aynı anda başlat; thread'lerde oluşan hataları döndür"""
+    barrier = threading.Barrier(len(targets))
+    errors = []
+
+    def runner(target):
+        barrier.wait()
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=runner, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def main(test):
+    """Testi çalıştır, geçici veritabanını sil, sonucu çıkış kodu olarak döndür"""
+    success = False
+    try:
+        success = test()
+    finally:
+        if _temp_db:
+            os.remove(_temp_db)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,104 @@
+"""
+Eşzamanlılık Testi - Atomik sayaçlar
+Başvuru ve chat mesajı endpoint'lerini paralel thread'lerle zorlar; sonunda
+denormalize sayaçların gerçek satır sayılarıyla birebir aynı olduğunu doğrular:
+    tevkil_posts.applications_count == COUNT(applications)
+    conversations.unread_count_user2 == COUNT(messages)
+
+Kullanım:
+    python test_concurrent_counters.py [thread_sayısı] [thread_başına_mesaj]
+
+Veritabanı ve test client'ı düzeneği stress_harness.py'dedir (varsayılan geçici SQLite).
+"""
+import sys
+
+from stress_harness import app, db, client, create_tables, new_user, run_parallel, main
+from models import TevkilPost, Application, Conversation, Message
+
+# Varsayılanlar; komut satırı argümanları yalnızca betik çalıştırılınca okunur
+THREADS = 20
+MESSAGES_PER_THREAD = 5
+
+
+def _setup():
+    create_tables()
+    with app.app_context():
+        owner = new_user('owner@concurrency.test', 'İlan Sahibi')
+        applicants = [new_user(f'applicant{i}@concurrency.test', f'Başvuran {i}') for i in range(THREADS)]
+        db.session.add(owner)
+        db.session.add_all(applicants)
+        db.session.commit()
+
+        post = TevkilPost(user_id=owner.id, title='Eşzamanlılık testi', description='test',
+                          category='ceza_durusma', city='İstanbul')
+        db.session.add(post)
+        db.session.commit()
+
+        sender = applicants[0]
+        conversation = Conversation(user1_id=sender.id, user2_id=owner.id, post_id=post.id)
+        db.session.add(conversation)
+        db.session.commit()
+        return post.id, conversation.id, [user.id for user in applicants]
+
+
+def concurrency_test():
+    print("=" * 60)
+    print("🧪 ATOMİK SAYAÇ EŞZAMANLILIK TESTİ")
+    print("=" * 60)
+
+    post_id, conversation_id, applicant_ids = _setup()
+    statuses = []
+
+    def apply(user_id):
+        response = client(user_id).post(f'/posts/{post_id}/apply', data={'message': 'Başvuru'})
+        statuses.append(('apply', response.status_code))
+
+    def send(user_id, index):
+        response = client(user_id).post('/chat/send', json={
+            'conversation_id': conversation_id,
+            'message': f'Mesaj {index}'
+        })
+        statuses.append(('send', response.status_code))
+
+    sender_id = applicant_ids[0]
+    targets = [lambda user_id=user_id: apply(user_id) for user_id in applicant_ids]
+    for i in range(THREADS):
+        def send_batch(i=i):
+            for j in range(MESSAGES_PER_THREAD):
+                send(sender_id, i * MESSAGES_PER_THREAD + j)
+        targets.append(send_batch)
+
+    print(f"\n🚀 {THREADS} başvuru + {THREADS}x{MESSAGES_PER_THREAD} mesaj paralel gönderiliyor...")
+    errors = run_parallel(targets)
+
+    failed = [status for status in statuses if status[1] >= 400]
+    with app.app_context():
+        post = db.session.get(TevkilPost, post_id)
+        conversation = db.session.get(Conversation, conversation_id)
+        application_rows = Application.query.filter_by(post_id=post_id).count()
+        message_rows = Message.query.filter_by(conversation_id=conversation_id).count()
+
+        print(f"\n📊 Sonuçlar:")
+        print(f"   İstek hatası: {len(failed)}  |  Thread hatası: {len(errors)}")
+        print(f"   applications_count: {post.applications_count}  (gerçek: {application_rows}, beklenen: {THREADS})")
+        print(f"   unread_count_user2: {conversation.unread_count_user2}  "
+              f"(gerçek: {message_rows}, beklenen: {THREADS * MESSAGES_PER_THREAD})")
+
+        ok = (
+            not errors and not failed
+            and post.applications_count == application_rows == THREADS
+            and conversation.unread_count_user2 == message_rows == THREADS * MESSAGES_PER_THREAD
+        )
+
+    print("\n" + "=" * 60)
+    print("✅ SAYAÇLAR TUTARLI - KAYIP GÜNCELLEME YOK" if ok else "❌ SAYAÇLAR TUTARSIZ!")
+    print("=" * 60)
+    return ok
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        THREADS = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        MESSAGES_PER_THREAD = int(sys.argv[2])
+    main(concurrency_test)
@@ -0,0 +1,105 @@
+"""
+Performans Testi - Mesaj yazma hızı (mesaj başına commit vs grup commit)
+/chat/send endpoint'ine paralel thread'lerle mesaj gönderir ve saniyedeki mesaj
+sayısını iki modda ölçer:
+    önce  : MESSAGE_GROUP_COMMIT kapalı - her mesaj kendi transaction'ında commit edilir
+    sonra : MESSAGE_GROUP_COMMIT açık   - yazıcı thread kuyruktaki mesajları tek commit'te yazar
+Her turdan sonra mesaj satırları ile denormalize sayaçların tutarlı olduğu doğrulanır:
+    conversations.unread_count_user2 == users.unread_messages_count == COUNT(messages)
+
+Kullanım:
+    python test_message_throughput.py [thread_sayısı] [thread_başına_mesaj]
+
+Veritabanı ve test client'ı düzeneği stress_harness.py'dedir (varsayılan geçici SQLite).
+"""
+import sys
+import time
+
+from stress_harness import app, db, client, create_tables, new_user, run_parallel, main
+from app import message_service
+from models import User, Conversation, Message
+
+# Varsayılanlar; komut satırı argümanları yalnızca betik çalıştırılınca okunur
+THREADS = 16
+MESSAGES_PER_THREAD = 25
+
+
+def _setup(label):
+    create_tables()
+    with app.app_context():
+        sender = new_user(f'sender-{label}@throughput.test', f'Gönderen {label}')
+        receiver = new_user(f'receiver-{label}@throughput.test', f'Alıcı {label}')
+        receiver.notify_new_message = False  # Bildirim yazımı ölçümü etkilemesin
+        db.session.add_all([sender, receiver])
+        db.session.commit()
+
+        conversation = Conversation(user1_id=sender.id, user2_id=receiver.id)
+        db.session.add(conversation)
+        db.session.commit()
+        return sender.id, receiver.id, conversation.id
+
+
+def _run(label, group_commit):
+    message_service.group_commit = group_commit
+    sender_id, receiver_id, conversation_id = _setup(label)
+    clients = [client(sender_id) for _ in range(THREADS)]
+    failed = []
+
+    def send_batch(i):
+        for j in range(MESSAGES_PER_THREAD):
+            response = clients[i].post('/chat/send', json={
+                'conversation_id': conversation_id,
+                'message': f'Mesaj {i}-{j}'
+            })
+            if response.status_code != 200:
+                failed.append(response.status_code)
+
+    started = time.perf_counter()
+    failed.extend(run_parallel([lambda i=i: send_batch(i) for i in range(THREADS)]))
+    elapsed = time.perf_counter() - started
+
+    total = THREADS * MESSAGES_PER_THREAD
+    with app.app_context():
+        conversation = db.session.get(Conversation, conversation_id)
+        receiver = db.session.get(User, receiver_id)
+        message_rows = Message.query.filter_by(conversation_id=conversation_id).count()
+        consistent = (
+            not failed
+            and conversation.unread_count_user2 == receiver.unread_messages_count == message_rows == total
+        )
+
+    rate = total / elapsed
+    print(f"\n📊 {label}:")
+    print(f"   {total} mesaj {elapsed:.2f} sn  →  {rate:.0f} mesaj/sn")
+    print(f"   İstek hatası: {len(failed)}  |  Satır: {message_rows}  |  "
+          f"unread: {conversation.unread_count_user2} / {receiver.unread_messages_count}")
+    return rate, consistent
+
+
+def throughput_test():
+    print("=" * 60)
+    print("🧪 MESAJ YAZMA HIZI - MESAJ BAŞINA COMMIT vs GRUP COMMIT")
+    print("=" * 60)
+    print(f"\n🚀 {THREADS} thread x {MESSAGES_PER_THREAD} mesaj")
+
+    before, before_ok = _run('önce (mesaj başına commit)', group_commit=False)
+    after, after_ok = _run('sonra (grup commit)', group_commit=True)
+
+    metrics = message_service.get_metrics()
+    print(f"\n📦 Grup commit: {metrics['messages']} mesaj / {metrics['batches']} batch "
+          f"(en büyük batch: {metrics['max_batch']})")
+    print(f"⚡ Hızlanma: x{after / before:.2f}")
+
+    ok = before_ok and after_ok
+    print("\n" + "=" * 60)
+    print("✅ SAYAÇLAR TUTARLI" if ok else "❌ SAYAÇLAR TUTARSIZ!")
+    print("=" * 60)
+    return ok
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        THREADS = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        MESSAGES_PER_THREAD = int(sys.argv[2])
+    main(throughput_test)
@@ -0,0 +1,127 @@
+"""
+Typing State - "Yazıyor..." göstergesi için sınırlı, kendiliğinden temizlenen durum
+İstemci her tuş vuruşunda `typing` gönderir; burada bunlar birleştirilir:
+    - yazmaya başlama ve durma anında hemen yayın yapılır
+    - yazmaya devam ederken kullanıcı/sohbet başına en fazla THROTTLE saniyede bir
+      "hâlâ yazıyor" yayını yapılır
+    - TTL boyunca yenilenmeyen kayıt düşer ve "durdu" yayını yapılır (istemci
+      durma olayını göndermeden kapansa bile gösterge takılı kalmaz)
+
+Kayıtlar son kullanma sırasına göre bir OrderedDict'te tutulur (TTL sabit olduğundan
+yenilenen kayıt sona taşınır); süresi dolanlar baştan O(1) ile temizlenir, bellek
+yalnızca o an yazan kullanıcı sayısıyla sınırlıdır.
+
+Ayarlar (app.config / env):
+    TYPING_TTL      : Yenilenmeyen "yazıyor" durumunun düşme süresi, saniye
+    TYPING_THROTTLE : Devam eden yazma için yayınlar arası en kısa süre, saniye
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_TTL = 6.0
+DEFAULT_THROTTLE = 3.0
+SWEEP_INTERVAL = 1.0
+
+
+class TypingState:
+    """(sohbet, kullanıcı) başına yazma durumu + süresi dolanların yayınlanması"""
+
+    def __init__(self):
+        self.ttl = DEFAULT_TTL
+        self.throttle = DEFAULT_THROTTLE
+        self.socketio = None
+        self._entries = OrderedDict()  # (conversation_id, user_id) -> {'expires', 'emitted_at', 'user_name'}
+        self._lock = threading.Lock()
+        self._sweeper_running = False
+        self._metrics = {'events': 0, 'emitted': 0, 'coalesced': 0, 'expired': 0}
+
+    def init_app(self, app, socketio=None):
+        self.ttl = float(app.config.get('TYPING_TTL', os.getenv('TYPING_TTL', DEFAULT_TTL)))
+        self.throttle = float(app.config.get('TYPING_THROTTLE', os.getenv('TYPING_THROTTLE', DEFAULT_THROTTLE)))
+        self.socketio = socketio
+
+    def update(self, conversation_id, user_id, user_name, is_typing):
+        """
+        Yazma olayını kaydet
+
+        Returns:
+            bool: Olay yayınlanmalı mı
+        """
+        key = (conversation_id, user_id)
+        now = time.monotonic()
+        with self._lock:
+            self._metrics['events'] += 1
+            expired = self._pop_expired(now)
+            entry = self._entries.get(key)
+
+            if not is_typing:
+                emit = self._entries.pop(key, None) is not None
+            elif entry is None:
+                self._entries[key] = {'expires': now + self.ttl, 'emitted_at': now, 'user_name': user_name}
+                emit = True
+            else:
+                entry['expires'] = now + self.ttl
+                self._entries.move_to_end(key)
+                emit = now - entry['emitted_at'] >= self.throttle
+                if emit:
+                    entry['emitted_at'] = now
+
+            self._metrics['emitted' if emit else 'coalesced'] += 1
+            start_sweeper = bool(self._entries) and not self._sweeper_running
+            if start_sweeper:
+                self._sweeper_running = True
+
+        self._emit_stopped(expired)
+        if start_sweeper and self.socketio is not None:
+            self.socketio.start_background_task(self._sweep)
+        return emit
+
+    def _pop_expired(self, now):
+        expired = []
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry['expires'] > now:
+                break
+            self._entries.popitem(last=False)
+            expired.append((key, entry['user_name']))
+        self._metrics['expired'] += len(expired)
+        return expired
+
+    def _emit_stopped(self, expired):
+        if self.socketio is None:
+            return
+        for (conversation_id, user_id), user_name in expired:
+            self.socketio.emit('user_typing', {
+                'conversation_id': conversation_id,
+                'user_id': user_id,
+                'user_name': user_name,
+                'is_typing': False
+            }, room=f'conversation_{conversation_id}')
+
+    def _sweep(self):
+        # Yalnızca yazan kullanıcı varken çalışır; kayıt kalmayınca kendiliğinden durur
+        while True:
+            self.socketio.sleep(SWEEP_INTERVAL)
+            with self._lock:
+                expired = self._pop_expired(time.monotonic())
+                done = not self._entries
+                if done:
+                    self._sweeper_running = False
+            self._emit_stopped(expired)
+            if done:
+                return
+
+    def get_metrics(self):
+        with self._lock:
+            return {**self._metrics, 'active': len(self._entries), 'ttl': self.ttl, 'throttle': self.throttle}
+
+
+typing_state = TypingState()
+
+
+def init_typing(app, socketio=None):
+    """Yazma durumu ayarlarını yükle"""
+    typing_state.init_app(app, socketio)
+    return typing_state
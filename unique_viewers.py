@@ -0,0 +1,351 @@
+"""
+Unique Viewers - HyperLogLog ile yaklaşık tekil izleyici sayımı
+İlan ve profil başına izleyici kümesi saklamak yerine sabit boyutlu HLL sketch'leri
+tutulur (Redis PFADD/PFCOUNT, Redis yoksa process içi HyperLogLog).
+Tahminler periyodik olarak TevkilPost.unique_viewers ve User.profile_views alanlarına
+yazılır; günlük sketch'ler istatistik sayfaları için günlük tekil sayıları verir.
+
+Process içi depo Redis'teki gibi sınırlıdır: günlük sketch'ler TTL ile düşer, toplam
+sketch sayısı MEMORY_MAX_SKETCHES'i aşınca en uzun süredir kullanılmayanlar atılır
+(Redis: maxmemory-policy allkeys-lru). Atılan sketch sıfırdan başlar; veritabanındaki
+sayı max(mevcut, tahmin) ile yazıldığı için geriye düşmez.
+"""
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import bindparam, case
+from models import db, TevkilPost, User
+from cache_config import tiered_cache
+
+try:
+    import redis
+except ImportError:  # Redis opsiyonel - yoksa process içi sketch'ler kullanılır
+    redis = None
+
+HLL_PRECISION = 12              # 4096 register, ~%1.6 standart hata
+DAILY_RETENTION_DAYS = 90
+MEMORY_MAX_SKETCHES = 20000     # Process içi depoda tutulacak azami sketch
+PRUNE_INTERVAL = 60             # saniye - süresi dolan sketch taraması en sık bu aralıkta
+DAILY_SERIES_CACHE_TIMEOUT = 60  # saniye - ilan sayfasındaki 7 günlük seri
+
+
+class HyperLogLog:
+    """
+    Process içi HyperLogLog
+
+    Az elemanlı sketch'ler seyrek (dict) tutulur, büyüyünce yoğun (bytearray) hale geçer -
+    az görüntülenen binlerce ilan için bellek kullanımı küçük kalır.
+    """
+
+    __slots__ = ('precision', 'm', 'sparse', 'registers')
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.m = 1 << precision
+        self.sparse = {}
+        self.registers = None
+
+    def add(self, value):
+        """Elemanı ekle; register değiştiyse True"""
+        h = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+
+        if self.registers is None:
+            if self.sparse.get(index, 0) >= rank:
+                return False
+            self.sparse[index] = rank
+            if len(self.sparse) > self.m // 8:
+                self._densify()
+            return True
+
+        if self.registers[index] >= rank:
+            return False
+        self.registers[index] = rank
+        return True
+
+    def merge(self, other):
+        """Başka bir sketch'i bu sketch'e birleştir (küme birleşimi)"""
+        for index, rank in other._items():
+            if self.registers is None:
+                if self.sparse.get(index, 0) < rank:
+                    self.sparse[index] = rank
+            elif self.registers[index] < rank:
+                self.registers[index] = rank
+        if self.registers is None and len(self.sparse) > self.m // 8:
+            self._densify()
+        return self
+
+    def count(self):
+        """Tahmini tekil eleman sayısı"""
+        ranks = dict(self._items())
+        zeros = self.m - len(ranks)
+        harmonic = zeros + sum(2.0 ** -rank for rank in ranks.values())
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / harmonic
+        # Küçük kardinalitelerde linear counting daha doğru
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def _items(self):
+        if self.registers is None:
+            return self.sparse.items()
+        return ((index, rank) for index, rank in enumerate(self.registers) if rank)
+
+    def _densify(self):
+        self.registers = bytearray(self.m)
+        for index, rank in self.sparse.items():
+            self.registers[index] = rank
+        self.sparse = {}
+
+
+class MemorySketchStore:
+    """Tek process için sketch deposu"""
+
+    def __init__(self, max_sketches=MEMORY_MAX_SKETCHES):
+        self._lock = threading.Lock()
+        self._sketches = OrderedDict()  # LRU sırasıyla (en yeni sonda)
+        self._expires = {}
+        self._next_prune = datetime.now(timezone.utc)
+        self._dirty = {'post': set(), 'profile': set()}
+        self.max_sketches = max_sketches
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                sketch = self._sketches[key] = HyperLogLog()
+                if ttl:
+                    self._expires[key] = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+                self._prune()
+            else:
+                self._sketches.move_to_end(key)
+            return sketch.add(value)
+
+    def count(self, *keys):
+        with self._lock:
+            sketches = [self._sketches[key] for key in keys if key in self._sketches]
+            if not sketches:
+                return 0
+            if len(sketches) == 1:
+                return sketches[0].count()
+            union = HyperLogLog()
+            for sketch in sketches:
+                union.merge(sketch)
+            return union.count()
+
+    def mark_dirty(self, kind, entity_id):
+        with self._lock:
+            self._dirty[kind].add(entity_id)
+
+    def pop_dirty(self, kind):
+        with self._lock:
+            dirty, self._dirty[kind] = self._dirty[kind], set()
+            return dirty
+
+    def count_each(self, keys):
+        """Her anahtarın ayrı tahmini (birleşim değil)"""
+        return [self.count(key) for key in keys]
+
+    def _prune(self):
+        # self._lock tutulurken çağrılır
+        while len(self._sketches) > self.max_sketches:
+            key, _ = self._sketches.popitem(last=False)
+            self._expires.pop(key, None)
+
+        now = datetime.now(timezone.utc)
+        if now < self._next_prune:
+            return
+        self._next_prune = now + timedelta(seconds=PRUNE_INTERVAL)
+        for key in [key for key, expires in self._expires.items() if expires < now]:
+            self._sketches.pop(key, None)
+            self._expires.pop(key, None)
+
+
+class RedisSketchStore:
+    """Redis HyperLogLog (PFADD/PFCOUNT) deposu - tüm worker'lar aynı sketch'i paylaşır"""
+
+    PREFIX = 'tevkil:hll:'
+
+    def __init__(self, client):
+        self.client = client
+
+    def add(self, key, value, ttl=None):
+        pipe = self.client.pipeline()
+        pipe.pfadd(self.PREFIX + key, value)
+        if ttl:
+            pipe.expire(self.PREFIX + key, ttl)
+        changed, *_ = pipe.execute()
+        return bool(changed)
+
+    def count(self, *keys):
+        return self.client.pfcount(*[self.PREFIX + key for key in keys]) if keys else 0
+
+    def count_each(self, keys):
+        """Her anahtarın ayrı tahmini - tek round trip"""
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.pfcount(self.PREFIX + key)
+        return pipe.execute()
+
+    def mark_dirty(self, kind, entity_id):
+        self.client.sadd(f'{self.PREFIX}dirty:{kind}', entity_id)
+
+    def pop_dirty(self, kind):
+        key = f'{self.PREFIX}dirty:{kind}'
+        pipe = self.client.pipeline()
+        pipe.smembers(key)
+        pipe.delete(key)
+        members, _ = pipe.execute()
+        return {int(member) for member in members}
+
+
+def _day(date):
+    return date.strftime('%Y%m%d')
+
+
+def _materialize_stmt(table, column):
+    """column = max(column, tahmin) - process yeniden başlarsa sayı geriye düşmesin"""
+    current = db.func.coalesce(table.c[column], 0)
+    return table.update().where(
+        table.c.id == bindparam('entity_id')
+    ).values({
+        column: case((current < bindparam('estimate'), bindparam('estimate')), else_=current)
+    })
+
+
+class UniqueViewerTracker:
+    """İlan ve profil tekil izleyici sayacı"""
+
+    def __init__(self):
+        self.app = None
+        self.store = MemorySketchStore()
+
+    def init_app(self, app):
+        self.app = app
+        redis_url = app.config.get('REDIS_URL')
+        if redis_url and redis is not None:
+            try:
+                client = redis.from_url(redis_url, decode_responses=True)
+                client.ping()
+                self.store = RedisSketchStore(client)
+                print('✅ Unique viewers: Redis HyperLogLog')
+            except redis.RedisError as e:
+                print(f'⚠️  Unique viewers Redis bağlantısı kurulamadı, process içi sketch kullanılıyor: {e}')
+
+    def _track(self, kind, entity_id, viewer_key):
+        today = _day(datetime.now(timezone.utc))
+        ttl = DAILY_RETENTION_DAYS * 86400
+        changed = self.store.add(f'{kind}:{entity_id}', viewer_key)
+        self.store.add(f'{kind}:{entity_id}:{today}', viewer_key, ttl=ttl)
+        self.store.add(f'{kind}s:{today}', viewer_key, ttl=ttl)
+        if changed:
+            self.store.mark_dirty(kind, entity_id)
+        return changed
+
+    def track_post_view(self, post_id, viewer_key):
+        """İlan görüntüleyenini sketch'e ekle"""
+        return self._track('post', post_id, viewer_key)
+
+    def track_profile_view(self, user_id, viewer_key):
+        """Profil görüntüleyenini sketch'e ekle"""
+        return self._track('profile', user_id, viewer_key)
+
+    def post_unique_viewers(self, post_id):
+        return self.store.count(f'post:{post_id}')
+
+    def profile_unique_viewers(self, user_id):
+        return self.store.count(f'profile:{user_id}')
+
+    def daily_unique_viewers(self, days=7, kind='post', entity_id=None):
+        """
+        Günlük tekil izleyici sayıları
+
+        Args:
+            days: Kaç günlük (bugün dahil)
+            kind: 'post' veya 'profile'
+            entity_id: Belirli ilan/kullanıcı; None ise platform geneli
+
+        Returns:
+            list: [('2025-01-31', adet), ...] eskiden yeniye
+        """
+        today = datetime.now(timezone.utc).date()
+        dates = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+        keys = [f'{kind}:{entity_id}:{_day(date)}' if entity_id else f'{kind}s:{_day(date)}' for date in dates]
+        return [(date.isoformat(), count) for date, count in zip(dates, self.store.count_each(keys))]
+
+    def cached_daily_unique_viewers(self, days=7, kind='post', entity_id=None):
+        """daily_unique_viewers - sayfa görüntülemesi başına yeniden sayılmasın diye kısa süre cache'li"""
+        return tiered_cache.get_or_set(
+            f'daily_unique_viewers_{kind}_{entity_id}_{days}',
+            lambda: self.daily_unique_viewers(days, kind, entity_id),
+            timeout=DAILY_SERIES_CACHE_TIMEOUT
+        )
+
+    def unique_viewers_between(self, days=7, kind='post', entity_id=None):
+        """Son N günün tekil izleyicisi (günlük sketch'lerin birleşimi - toplamı değil)"""
+        today = datetime.now(timezone.utc).date()
+        keys = [
+            f'{kind}:{entity_id}:{_day(today - timedelta(days=offset))}' if entity_id
+            else f'{kind}s:{_day(today - timedelta(days=offset))}'
+            for offset in range(days)
+        ]
+        return self.store.count(*keys)
+
+    def materialize(self):
+        """
+        Değişen sketch tahminlerini unique_viewers / profile_views alanlarına toplu yaz
+
+        Returns:
+            int: Güncellenen kayıt sayısı
+        """
+        targets = (
+            ('post', TevkilPost.__table__, 'unique_viewers'),
+            ('profile', User.__table__, 'profile_views'),
+        )
+        updated = 0
+        with self.app.app_context():
+            for kind, table, column in targets:
+                dirty = self.store.pop_dirty(kind)
+                if not dirty:
+                    continue
+                params = [
+                    {'entity_id': entity_id, 'estimate': self.store.count(f'{kind}:{entity_id}')}
+                    for entity_id in sorted(dirty)
+                ]
+                try:
+                    with db.engine.begin() as connection:
+                        connection.execute(_materialize_stmt(table, column), params)
+                except Exception as e:
+                    for entity_id in dirty:
+                        self.store.mark_dirty(kind, entity_id)
+                    print(f'❌ Tekil izleyici yazma hatası ({kind}): {e}')
+                    continue
+                updated += len(params)
+        return updated
+
+
+unique_viewers = UniqueViewerTracker()
+
+
+def init_unique_viewers(app, view_counter=None):
+    """
+    Tekil izleyici takibini başlat
+
+    view_counter verilirse tahminler onun flush thread'i ile aynı aralıkta yazılır.
+    """
+    unique_viewers.init_app(app)
+    if view_counter is not None:
+        view_counter.register_flush_hook(unique_viewers.materialize)
+
+    @app.cli.command('unique-viewers-materialize')
+    def unique_viewers_materialize():
+        """Write HyperLogLog unique viewer estimates to posts and profiles"""
+        count = unique_viewers.materialize()
+        print(f'✅ {count} kayıt güncellendi')
+
+    return unique_viewers
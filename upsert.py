@@ -0,0 +1,34 @@
+"""
+Upsert - INSERT ... ON CONFLICT DO UPDATE (SQLite + PostgreSQL)
+Sayaç/özet tabloları (facet, harita kümeleri, günlük aktivite, değerlendirme özeti)
+ve job lease satırları tek ifadede eklenir veya güncellenir; eşzamanlı yazmalar
+satır yoksa bile birbirini ezmez.
+
+Tablolar migration'larla (bkz. migrations.py) ve create_all ile kurulur; burada
+tablo varlığı kontrol edilmez.
+"""
+
+
+def insert(connection, table):
+    """Bağlantının dialect'ine göre on_conflict destekli INSERT"""
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table)
+
+
+def upsert(connection, table, values, index_elements, set_, where=None):
+    """
+    Satırı ekle; unique çakışmada `set_` ile güncelle
+
+    Args:
+        values: Eklenecek satır {kolon: değer}
+        index_elements: Çakışma (unique) kolonları
+        set_: Çakışmada uygulanacak {kolon: ifade}
+        where: Verilirse güncelleme yalnızca bu koşul sağlanınca yapılır
+    """
+    stmt = insert(connection, table).values(**values).on_conflict_do_update(
+        index_elements=list(index_elements), set_=set_, where=where
+    )
+    return connection.execute(stmt)
@@ -0,0 +1,345 @@
+"""
+View Counter - Write-behind ilan görüntüleme sayacı
+post_detail her istekte yazma transaction'ı açmaz; artışlar bellekte (veya Redis'te)
+biriktirilir, aynı izleyicinin tekrar görüntülemeleri elenir ve arka plan thread'i
+birikenleri toplu UPDATE ile veritabanına yazar.
+
+Ayarlar (app.config / env):
+    VIEW_FLUSH_INTERVAL   : Dayanıklılık penceresi, saniye (0 = her görüntülemede yaz)
+    VIEW_FLUSH_MAX_PENDING: Bu kadar ilan birikince pencere beklenmeden yaz
+    VIEW_DEDUP_SECONDS    : Aynı izleyicinin aynı ilanı tekrar sayılmadan görebileceği süre
+"""
+import os
+import time
+import atexit
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, func
+from models import db, TevkilPost
+
+try:
+    import redis
+except ImportError:  # Redis opsiyonel - yoksa bellek tamponu kullanılır
+    redis = None
+
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_PENDING = 500
+DEFAULT_DEDUP_SECONDS = 30 * 60
+
+_posts = TevkilPost.__table__
+
+# Toplu güncelleme: executemany ile tek statement, satır başına bir parametre seti.
+# updated_at açıkça korunur - görüntülenme ilanın "güncellenmesi" sayılmaz (onupdate tetiklenmesin)
+_flush_stmt = _posts.update().where(
+    _posts.c.id == bindparam('post_id')
+).values(
+    view_count=func.coalesce(_posts.c.view_count, 0) + bindparam('increment'),
+    views=func.coalesce(_posts.c.view_count, 0) + bindparam('increment'),
+    last_viewed_at=bindparam('viewed_at'),
+    updated_at=_posts.c.updated_at,
+)
+
+
+class MemoryViewBuffer:
+    """Tek process için bellek tamponu"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}   # post_id -> [artış, son görüntülenme]
+        self._seen = {}      # (post_id, izleyici) -> dedup bitiş zamanı
+        self._oldest = None  # En eski yazılmamış artışın zamanı (flush lag)
+
+    def add(self, post_id, viewer_key, viewed_at, dedup_seconds):
+        now = time.monotonic()
+        with self._lock:
+            if viewer_key:
+                key = (post_id, viewer_key)
+                if self._seen.get(key, 0) > now:
+                    return False
+                self._seen[key] = now + dedup_seconds
+                if len(self._seen) > 50000:
+                    self._seen = {k: v for k, v in self._seen.items() if v > now}
+
+            entry = self._pending.setdefault(post_id, [0, viewed_at])
+            entry[0] += 1
+            entry[1] = viewed_at
+            if self._oldest is None:
+                self._oldest = time.time()
+            return True
+
+    def drain(self):
+        """Bekleyen artışları al ve tamponu sıfırla"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            oldest, self._oldest = self._oldest, None
+        return {post_id: tuple(entry) for post_id, entry in pending.items()}, oldest
+
+    def restore(self, pending, oldest):
+        """Başarısız flush sonrası artışları tampona geri koy"""
+        with self._lock:
+            for post_id, (increment, viewed_at) in pending.items():
+                entry = self._pending.setdefault(post_id, [0, viewed_at])
+                entry[0] += increment
+                entry[1] = max(entry[1], viewed_at)
+            if oldest and (self._oldest is None or oldest < self._oldest):
+                self._oldest = oldest
+
+    def pending(self, post_id):
+        with self._lock:
+            entry = self._pending.get(post_id)
+            return entry[0] if entry else 0
+
+    def size(self):
+        with self._lock:
+            return len(self._pending)
+
+    def oldest(self):
+        return self._oldest
+
+
+class RedisViewBuffer:
+    """
+    Çok process/worker için Redis tamponu
+    Artışlar bir hash'te toplanır; flush sırasında hash RENAME ile atomik olarak devralınır
+    """
+
+    PENDING_KEY = 'tevkil:views:pending'
+    LAST_SEEN_KEY = 'tevkil:views:last_seen'
+    OLDEST_KEY = 'tevkil:views:oldest'
+    SEEN_PREFIX = 'tevkil:views:seen:'
+
+    def __init__(self, client):
+        self.client = client
+
+    def add(self, post_id, viewer_key, viewed_at, dedup_seconds):
+        if viewer_key:
+            seen_key = f'{self.SEEN_PREFIX}{post_id}:{viewer_key}'
+            if not self.client.set(seen_key, 1, nx=True, ex=int(dedup_seconds)):
+                return False
+
+        pipe = self.client.pipeline()
+        pipe.hincrby(self.PENDING_KEY, post_id, 1)
+        pipe.hset(self.LAST_SEEN_KEY, post_id, viewed_at.timestamp())
+        pipe.set(self.OLDEST_KEY, time.time(), nx=True)
+        pipe.execute()
+        return True
+
+    def drain(self):
+        processing = f'{self.PENDING_KEY}:{os.getpid()}:{time.time()}'
+        pipe = self.client.pipeline()
+        pipe.get(self.OLDEST_KEY)
+        pipe.delete(self.OLDEST_KEY)
+        oldest, _ = pipe.execute()
+        try:
+            self.client.rename(self.PENDING_KEY, processing)
+        except redis.ResponseError:  # Bekleyen artış yok
+            return {}, None
+
+        counts = self.client.hgetall(processing)
+        last_seen = self.client.hmget(self.LAST_SEEN_KEY, list(counts.keys())) if counts else []
+        self.client.delete(processing)
+
+        pending = {}
+        for (post_id, increment), seen_at in zip(counts.items(), last_seen):
+            viewed_at = datetime.fromtimestamp(float(seen_at), timezone.utc) if seen_at else datetime.now(timezone.utc)
+            pending[int(post_id)] = (int(increment), viewed_at)
+        return pending, float(oldest) if oldest else None
+
+    def restore(self, pending, oldest):
+        pipe = self.client.pipeline()
+        for post_id, (increment, _) in pending.items():
+            pipe.hincrby(self.PENDING_KEY, post_id, increment)
+        if oldest:
+            pipe.set(self.OLDEST_KEY, oldest, nx=True)
+        pipe.execute()
+
+    def pending(self, post_id):
+        value = self.client.hget(self.PENDING_KEY, post_id)
+        return int(value) if value else 0
+
+    def size(self):
+        return self.client.hlen(self.PENDING_KEY)
+
+    def oldest(self):
+        value = self.client.get(self.OLDEST_KEY)
+        return float(value) if value else None
+
+
+class ViewCounter:
+    """Görüntülemeleri tamponlayıp periyodik olarak toplu yazan sayaç"""
+
+    def __init__(self):
+        self.app = None
+        self.buffer = MemoryViewBuffer()
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL
+        self.max_pending = DEFAULT_MAX_PENDING
+        self.dedup_seconds = DEFAULT_DEDUP_SECONDS
+        self._thread = None
+        self._hooks = []
+        self._batch_listeners = []
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self.metrics = {
+            'recorded': 0,
+            'deduplicated': 0,
+            'flushes': 0,
+            'flushed_views': 0,
+            'flush_failures': 0,
+            'last_flush_at': None,
+            'last_flush_duration_ms': None,
+            'last_flush_lag_seconds': None,
+            'max_flush_lag_seconds': 0.0,
+        }
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = float(app.config.get('VIEW_FLUSH_INTERVAL', os.getenv('VIEW_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)))
+        self.max_pending = int(app.config.get('VIEW_FLUSH_MAX_PENDING', os.getenv('VIEW_FLUSH_MAX_PENDING', DEFAULT_MAX_PENDING)))
+        self.dedup_seconds = int(app.config.get('VIEW_DEDUP_SECONDS', os.getenv('VIEW_DEDUP_SECONDS', DEFAULT_DEDUP_SECONDS)))
+
+        redis_url = app.config.get('REDIS_URL')
+        if redis_url and redis is not None:
+            try:
+                client = redis.from_url(redis_url, decode_responses=True)
+                client.ping()
+                self.buffer = RedisViewBuffer(client)
+                print('✅ View counter: Redis tamponu')
+            except redis.RedisError as e:
+                print(f'⚠️  View counter Redis bağlantısı kurulamadı, bellek tamponu kullanılıyor: {e}')
+
+        # Kapanışta bekleyen artışları kaybetme
+        atexit.register(self.flush)
+
+    def record_view(self, post_id, viewer_key=None):
+        """
+        Görüntülemeyi tampona ekle
+
+        Args:
+            post_id: İlan ID
+            viewer_key: İzleyici anahtarı (örn. 'user:5', 'ip:1.2.3.4') - aynı anahtar
+                        VIEW_DEDUP_SECONDS içinde tekrar sayılmaz
+
+        Returns:
+            bool: Görüntüleme sayıldıysa True
+        """
+        counted = self.buffer.add(post_id, viewer_key, datetime.now(timezone.utc), self.dedup_seconds)
+        if not counted:
+            self.metrics['deduplicated'] += 1
+            return False
+        self.metrics['recorded'] += 1
+
+        if self.flush_interval <= 0:
+            self.flush()
+        else:
+            self._ensure_thread()
+            if self.buffer.size() >= self.max_pending:
+                self._wakeup.set()
+        return True
+
+    def pending_views(self, post_id):
+        """Henüz veritabanına yazılmamış görüntüleme sayısı"""
+        return self.buffer.pending(post_id)
+
+    def register_batch_listener(self, listener):
+        """
+        Flush transaction'ı içinde çağrılacak fonksiyon ekle
+
+        listener(connection, pending) - pending: {post_id: (artış, son görüntülenme)}.
+        Artışlarla aynı transaction'da yazar (örn. günlük aktivite özeti).
+        """
+        self._batch_listeners.append(listener)
+
+    def register_flush_hook(self, hook):
+        """Her flush sonrası çağrılacak fonksiyon ekle (örn. tekil izleyici tahminlerini yazma)"""
+        self._hooks.append(hook)
+
+    def flush(self):
+        """
+        Bekleyen artışları tek transaction'da toplu UPDATE ile yaz
+
+        Returns:
+            int: Yazılan toplam görüntüleme sayısı
+        """
+        total = self._flush_views()
+        for hook in self._hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f'❌ View counter flush hook hatası: {e}')
+        return total
+
+    def _flush_views(self):
+        with self._flush_lock:
+            pending, oldest = self.buffer.drain()
+            if not pending:
+                return 0
+
+            started = time.time()
+            params = [
+                {'post_id': post_id, 'increment': increment, 'viewed_at': viewed_at.replace(tzinfo=None)}
+                for post_id, (increment, viewed_at) in sorted(pending.items())
+            ]
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(_flush_stmt, params)
+                        for listener in self._batch_listeners:
+                            listener(connection, pending)
+            except Exception as e:
+                self.buffer.restore(pending, oldest)
+                self.metrics['flush_failures'] += 1
+                print(f'❌ View counter flush hatası: {e}')
+                return 0
+
+            finished = time.time()
+            total = sum(increment for increment, _ in pending.values())
+            lag = finished - oldest if oldest else 0.0
+            self.metrics['flushes'] += 1
+            self.metrics['flushed_views'] += total
+            self.metrics['last_flush_at'] = datetime.fromtimestamp(finished, timezone.utc).isoformat()
+            self.metrics['last_flush_duration_ms'] = round((finished - started) * 1000, 2)
+            self.metrics['last_flush_lag_seconds'] = round(lag, 3)
+            self.metrics['max_flush_lag_seconds'] = round(max(self.metrics['max_flush_lag_seconds'], lag), 3)
+            return total
+
+    def get_metrics(self):
+        """Sayaç ve flush gecikmesi metrikleri"""
+        oldest = self.buffer.oldest()
+        metrics = dict(self.metrics)
+        metrics['pending_posts'] = self.buffer.size()
+        metrics['current_lag_seconds'] = round(time.time() - oldest, 3) if oldest else 0.0
+        metrics['flush_interval_seconds'] = self.flush_interval
+        metrics['backend'] = 'redis' if isinstance(self.buffer, RedisViewBuffer) else 'memory'
+        return metrics
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._flush_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+view_counter = ViewCounter()
+
+
+def init_view_counter(app):
+    """View counter'ı başlat ve CLI komutlarını kaydet"""
+    view_counter.init_app(app)
+
+    @app.cli.command('views-flush')
+    def views_flush():
+        """Write buffered post views to the database"""
+        count = view_counter.flush()
+        print(f'✅ {count} görüntüleme yazıldı')
+        print(view_counter.get_metrics())
+
+    return view_counter